@@ -1,8 +1,11 @@
 from flask import Flask
 from dotenv import load_dotenv
 import os
+import time
+import click
 import google.generativeai as genai
 from app.email_service import init_app as init_mail
+from app.server_session import init_app as init_server_session
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_migrate import Migrate
@@ -40,11 +43,14 @@ def create_app():
     openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
     app.config['OPENROUTER_API_KEY'] = openrouter_api_key
     
+    # Store session data server-side; the cookie only carries a signed session id
+    init_server_session(app)
+    
     # Initialize SQLAlchemy with the app
     db.init_app(app)
     
-    # Initialize Flask-Migrate
-    migrate = Migrate(app, db)
+    # Initialize Flask-Migrate (migration scripts live alongside the package)
+    migrate = Migrate(app, db, directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations'))
     
     # Initialize login manager
     login_manager.init_app(app)
@@ -77,6 +83,50 @@ def create_app():
     def load_user(user_id):
         return User.query.get(int(user_id))
     
+    # CLI: rebuild the daily rollup table from raw vitals
+    @app.cli.command('backfill-rollups')
+    def backfill_rollups_command():
+        """Rebuild daily vitals rollups from raw vitals data."""
+        from app.models import backfill_daily_rollups
+        written = backfill_daily_rollups()
+        print(f"Backfilled {written} daily rollup rows.")
+    
+    # CLI: fill a scratch database with synthetic vitals for load testing
+    @app.cli.command('generate-vitals')
+    @click.argument('rows', type=int)
+    @click.option('--users', default=100, help='Number of distinct user ids.')
+    @click.option('--days', default=365, help='Spread rows over this many past days.')
+    def generate_vitals_command(rows, users, days):
+        """Insert ROWS synthetic vitals rows."""
+        from app.models import generate_synthetic_vitals
+        start = time.perf_counter()
+        written = generate_synthetic_vitals(rows, users=users, days=days)
+        print(f"Inserted {written} vitals rows in {time.perf_counter() - start:.1f}s.")
+    
+    # CLI: check query plans and read latency for the hot vitals queries
+    @app.cli.command('explain-vitals')
+    @click.option('--days', default=7, help='Cutoff used by the queries.')
+    @click.option('--user-id', default=1, help='User for the per-user query.')
+    def explain_vitals_command(days, user_id):
+        """Print EXPLAIN output and timings; exit 1 if a query stops using its index."""
+        from app.models import VitalsData, recent_vitals_query, check_vitals_query_plans
+        print(f"vitals_data rows: {VitalsData.query.count()}")
+        failed = False
+        for label, plan, problems in check_vitals_query_plans(days=days, user_id=user_id):
+            print(f"\n-- {label} ({days} days)")
+            for line in plan:
+                print(f"   {line}")
+            for problem in problems:
+                print(f"   PLAN REGRESSION: {problem}")
+            failed = failed or bool(problems)
+        for label, query in (('all users', recent_vitals_query(days=days)),
+                             (f'user {user_id}', recent_vitals_query(days=days, user_id=user_id))):
+            start = time.perf_counter()
+            count = len(query.all())
+            print(f"\nrecent vitals ({label}): {count} rows in {(time.perf_counter() - start) * 1000:.1f} ms")
+        if failed:
+            raise SystemExit(1)
+    
     # Create database tables if they don't exist
     with app.app_context():
         db.create_all()
@@ -0,0 +1,82 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from app.gemini_service import (
+    get_health_insights,
+    get_personalized_recommendations,
+    generate_fallback_insights,
+    generate_fallback_recommendations
+)
+
+# Bounded pool shared by all requests in this worker
+AI_POOL_SIZE = int(os.getenv("AI_POOL_SIZE", "8"))
+AI_CALL_DEADLINE = float(os.getenv("AI_CALL_DEADLINE", "20"))
+
+_executor = ThreadPoolExecutor(max_workers=AI_POOL_SIZE, thread_name_prefix="ai-call")
+
+
+def _timed_call(func, args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def run_ai_calls(calls, deadline=AI_CALL_DEADLINE, label="AI calls"):
+    """
+    Run independent AI calls in parallel, each with its own deadline.
+
+    Args:
+        calls (dict): name -> (func, args, fallback_func, fallback_args)
+        deadline (float): seconds each call may take, measured from submission
+        label (str): prefix for the timing log line
+
+    Returns:
+        dict: name -> result (the fallback result for calls that failed or
+        missed their deadline)
+    """
+    start = time.perf_counter()
+    futures = {
+        name: _executor.submit(_timed_call, func, args)
+        for name, (func, args, _, _) in calls.items()
+    }
+
+    results = {}
+    summed = 0.0
+    for name, future in futures.items():
+        _, _, fallback_func, fallback_args = calls[name]
+        remaining = max(0.0, deadline - (time.perf_counter() - start))
+        try:
+            results[name], elapsed = future.result(timeout=remaining)
+            summed += elapsed
+        except FutureTimeoutError:
+            print(f"{label}: {name} missed its {deadline:.1f}s deadline, using fallback")
+            future.cancel()
+            summed += deadline
+            results[name] = fallback_func(*fallback_args)
+        except Exception as e:
+            print(f"{label}: {name} failed ({str(e)}), using fallback")
+            results[name] = fallback_func(*fallback_args)
+
+    wall = time.perf_counter() - start
+    print(f"{label}: wall time {wall:.2f}s vs summed time {summed:.2f}s")
+    return results
+
+
+def get_insights_and_recommendations(latest_vitals, recent_vitals, deadline=AI_CALL_DEADLINE):
+    """Generate dashboard insights and recommendations concurrently"""
+    results = run_ai_calls({
+        "insights": (get_health_insights, (latest_vitals, recent_vitals),
+                     generate_fallback_insights, (latest_vitals, recent_vitals)),
+        "recommendations": (get_personalized_recommendations, (latest_vitals,),
+                            generate_fallback_recommendations, (latest_vitals,))
+    }, deadline=deadline, label="Dashboard AI")
+    return results["insights"], results["recommendations"]
+
+
+def get_insights_with_deadline(latest_vitals, recent_vitals, deadline=AI_CALL_DEADLINE):
+    """Generate health insights, falling back if the deadline is missed"""
+    results = run_ai_calls({
+        "insights": (get_health_insights, (latest_vitals, recent_vitals),
+                     generate_fallback_insights, (latest_vitals, recent_vitals))
+    }, deadline=deadline, label="AI goal")
+    return results["insights"]
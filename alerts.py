@@ -0,0 +1,154 @@
+import os
+import json
+import queue
+import secrets
+import operator
+import threading
+from collections import deque
+
+# Seconds between SSE heartbeat comments when no alert is published
+ALERT_HEARTBEAT_INTERVAL = float(os.getenv("ALERT_HEARTBEAT_INTERVAL", "15"))
+# Recent events kept so reconnecting clients can resume with Last-Event-ID
+ALERT_REPLAY_SIZE = int(os.getenv("ALERT_REPLAY_SIZE", "100"))
+ALERT_SUBSCRIBER_QUEUE_SIZE = 50
+
+
+# Declarative alert rules, evaluated once when vitals are written. Each rule
+# fires when every (operator, threshold) condition holds for the field value;
+# new rules only add an entry here, not request-time work.
+ALERT_RULES = [
+    {'type': 'heart_rate', 'field': 'heart_rate', 'default': 0,
+     'conditions': [('>', 100)],
+     'message': "Elevated heart rate detected: {value} bpm"},
+    {'type': 'heart_rate', 'field': 'heart_rate', 'default': 0,
+     'conditions': [('<', 60), ('>', 0)],
+     'message': "Low heart rate detected: {value} bpm"},
+    {'type': 'sleep_hours', 'field': 'sleep_hours', 'default': 0,
+     'conditions': [('<', 6), ('>', 0)],
+     'message': "Sleep duration below recommended levels: {value} hours"},
+    {'type': 'mood', 'field': 'mood', 'default': 5,
+     'conditions': [('<=', 2)],
+     'message': "Mood score indicates potential concern: {value}/5"},
+    {'type': 'steps', 'field': 'steps', 'default': 0,
+     'conditions': [('<', 5000), ('>', 0)],
+     'message': "Step count below daily target: {value} steps"},
+]
+
+_OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq
+}
+
+
+def build_alerts(latest, rules=ALERT_RULES):
+    """Create alerts for a vitals entry by evaluating the alert rules"""
+    alerts = []
+    if not latest:
+        return alerts
+
+    for rule in rules:
+        value = latest.get(rule['field'], rule['default'])
+        if value is None:
+            continue
+        if all(_OPERATORS[op](value, threshold) for op, threshold in rule['conditions']):
+            alerts.append({
+                'date': latest.get('date', ''),
+                'type': rule['type'],
+                'message': rule['message'].format(value=latest.get(rule['field'])),
+                'data': {rule['field']: latest.get(rule['field'])}
+            })
+
+    return alerts
+
+
+class AlertHub:
+    """
+    In-process fan-out of alert events to Server-Sent Events subscribers.
+
+    Each subscriber gets its own bounded queue, so a slow client never blocks
+    publishers. Recent events are kept for replay after a reconnect.
+
+    Event ids are "<epoch>-<sequence>". The epoch is random per hub, so ids
+    from another worker process or from before a restart never match this
+    hub's sequence; a Last-Event-ID from another epoch replays nothing.
+    """
+
+    def __init__(self, replay_size=ALERT_REPLAY_SIZE, epoch=None):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._recent = deque(maxlen=replay_size)
+        self._next_id = 1
+        self.epoch = epoch or secrets.token_hex(4)
+
+    def _sequence(self, event_id):
+        """This hub's sequence number for an event id, or None if it is not one of ours"""
+        epoch, _, sequence = str(event_id or '').rpartition('-')
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        return int(sequence)
+
+    def publish(self, payload):
+        """Send a payload to every subscriber; returns the event id"""
+        with self._lock:
+            event = (f"{self.epoch}-{self._next_id}", json.dumps(payload, default=str))
+            self._next_id += 1
+            self._recent.append(event)
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # Drop the oldest pending event for a client that is not keeping up
+                try:
+                    subscriber.get_nowait()
+                    subscriber.put_nowait(event)
+                except (queue.Empty, queue.Full):
+                    pass
+        return event[0]
+
+    def subscribe(self, last_event_id=None):
+        subscriber = queue.Queue(maxsize=ALERT_SUBSCRIBER_QUEUE_SIZE)
+        last_sequence = self._sequence(last_event_id)
+        with self._lock:
+            if last_sequence is not None:
+                missed = [event for event in self._recent if self._sequence(event[0]) > last_sequence]
+                for event in missed[-ALERT_SUBSCRIBER_QUEUE_SIZE:]:
+                    subscriber.put_nowait(event)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def stream(self, last_event_id=None, heartbeat=ALERT_HEARTBEAT_INTERVAL):
+        """Generator of SSE frames for one client; ends when the client disconnects"""
+        subscriber = self.subscribe(last_event_id)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event_id, data = subscriber.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield f"id: {event_id}\nevent: alerts\ndata: {data}\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+
+alert_hub = AlertHub()
+
+
+def publish_vitals_alerts(vitals, alerts=None):
+    """Push the alerts for a newly saved vitals entry to SSE subscribers"""
+    if alerts is None:
+        alerts = build_alerts(vitals)
+    return alert_hub.publish({"alerts": alerts, "vitals_id": vitals.get('id')})
@@ -0,0 +1,216 @@
+import os
+import json
+import uuid
+import datetime
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from app.models import db, CalorieJob
+from app.food_recognition import recognize_food_from_image, get_nutrition_data, get_food_insights
+from app.nutritionix_service import get_nutritionix_batch
+
+# Worker pool that runs calorie_check analyses off the request thread
+CALORIE_JOB_WORKERS = int(os.getenv("CALORIE_JOB_WORKERS", "4"))
+# A running job not updated for this long lost its worker (restart or crash)
+CALORIE_JOB_TIMEOUT = int(os.getenv("CALORIE_JOB_TIMEOUT", "300"))
+# A job still queued this long after submission was lost before it started
+CALORIE_JOB_QUEUE_TIMEOUT = int(os.getenv("CALORIE_JOB_QUEUE_TIMEOUT", "3600"))
+
+# Pipeline stages reported by the status endpoint, in order
+STAGES = ['recognition', 'nutrition', 'insights']
+# Statuses a job never leaves
+FINISHED_STATUSES = ('done', 'failed')
+
+_executor = ThreadPoolExecutor(max_workers=CALORIE_JOB_WORKERS, thread_name_prefix="calorie-job")
+
+
+def empty_nutrition_totals():
+    return {
+        'calories': 0,
+        'protein': 0,
+        'fat': 0,
+        'carbohydrates': 0,
+        'fiber': 0,
+        'sugar': 0
+    }
+
+
+def lookup_meal_nutrition(food_items):
+    """
+    Look up nutrition for every item of a meal.
+
+    Returns:
+        tuple: (nutrition_data list, total_nutrition dict)
+    """
+    nutrition_data = []
+    total_nutrition = empty_nutrition_totals()
+    # One Nutritionix request for the whole meal
+    nutritionix_results = get_nutritionix_batch(food_items)
+    # Items Nutritionix could not resolve fall back to the local database in parallel
+    unresolved = [item for item, foods in zip(food_items, nutritionix_results) if not foods]
+    fallback_data = {}
+    if unresolved:
+        with ThreadPoolExecutor(max_workers=min(len(unresolved), 8)) as pool:
+            fallback_data = dict(zip(unresolved, pool.map(get_nutrition_data, unresolved)))
+    for item, foods in zip(food_items, nutritionix_results):
+        if foods:
+            item_data = [{
+                'food_item': food.get('food_name', item),
+                'calories': food.get('nf_calories', 0),
+                'protein': food.get('nf_protein', 0),
+                'fat': food.get('nf_total_fat', 0),
+                'carbohydrates': food.get('nf_total_carbohydrate', 0),
+                'fiber': food.get('nf_dietary_fiber', 0),
+                'sugar': food.get('nf_sugars', 0)
+            } for food in foods]
+        else:
+            data = fallback_data.get(item)
+            if not data:
+                print(f"[WARN] No nutrition data for: {item}")
+                continue
+            item_data = [data]
+        for data in item_data:
+            nutrition_data.append(data)
+            try:
+                total_nutrition['calories'] += float(data.get('calories', 0))
+                total_nutrition['protein'] += float(data.get('protein', 0))
+                total_nutrition['fat'] += float(data.get('fat', 0))
+                total_nutrition['carbohydrates'] += float(data.get('carbohydrates', 0))
+                total_nutrition['fiber'] += float(data.get('fiber', 0))
+                total_nutrition['sugar'] += float(data.get('sugar', 0))
+            except Exception as agg_err:
+                print(f"[ERROR] Aggregating nutrition for {item}: {agg_err}")
+    return nutrition_data, total_nutrition
+
+
+class JobFinished(Exception):
+    """The job was already finished (e.g. failed as stale) by someone else"""
+
+
+def _update_job(job_id, **fields):
+    """
+    Update an unfinished job in one conditional UPDATE, so a job that is
+    already done or failed is never overwritten. Raises JobFinished otherwise.
+    """
+    stages = fields.pop('stage_states', None)
+    if stages is not None:
+        fields['stages'] = json.dumps(stages)
+    updated = (CalorieJob.query
+               .filter(CalorieJob.id == job_id, CalorieJob.status.notin_(FINISHED_STATUSES))
+               .update(fields, synchronize_session=False))
+    db.session.commit()
+    if not updated:
+        raise JobFinished(job_id)
+
+
+def _run_job(app, job_id, file_path, image_path, manual_food):
+    """Run the analysis stages for one job inside an application context"""
+    with app.app_context():
+        stage_states = {stage: 'pending' for stage in STAGES}
+        try:
+            _update_job(job_id, status='running')
+            food_items = []
+            raw_api_output = None
+
+            # Stage 1: image recognition (skipped for manual entries)
+            if file_path:
+                stage_states['recognition'] = 'running'
+                _update_job(job_id, stage='recognition', stage_states=stage_states)
+                try:
+                    food_items = recognize_food_from_image(file_path)
+                    if hasattr(recognize_food_from_image, 'last_raw_output'):
+                        raw_api_output = recognize_food_from_image.last_raw_output
+                except Exception as e:
+                    raw_api_output = str(e)
+                print(f"Recognized food items: {food_items}")
+                stage_states['recognition'] = 'done'
+            else:
+                food_items = [item.strip() for item in manual_food.split(',') if item.strip()]
+                stage_states['recognition'] = 'skipped'
+            food_items = [item for item in food_items if item and "Unable to recognize" not in item]
+
+            # Stage 2: nutrition lookup
+            stage_states['nutrition'] = 'running'
+            _update_job(job_id, stage='nutrition', stage_states=stage_states)
+            nutrition_data, total_nutrition = lookup_meal_nutrition(food_items)
+            stage_states['nutrition'] = 'done'
+
+            # Stage 3: AI food insights
+            stage_states['insights'] = 'running'
+            _update_job(job_id, stage='insights', stage_states=stage_states)
+            food_insights = get_food_insights([d['food_item'] for d in nutrition_data]) if nutrition_data else ""
+            stage_states['insights'] = 'done'
+
+            result = {
+                'food_items': food_items,
+                'nutrition_data': nutrition_data,
+                'total_nutrition': total_nutrition,
+                'food_insights': food_insights,
+                'image_path': image_path,
+                'raw_api_output': raw_api_output
+            }
+            _update_job(job_id, status='done', stage=None, stage_states=stage_states,
+                        result=json.dumps(result, default=float))
+        except JobFinished:
+            print(f"[WARN] Calorie job {job_id} was already finished; dropping its result")
+        except Exception as e:
+            print(f"[ERROR] Calorie job {job_id} failed: {str(e)}")
+            traceback.print_exc()
+            db.session.rollback()
+            try:
+                _update_job(job_id, status='failed', stage_states=stage_states, error=str(e))
+            except JobFinished:
+                pass
+        finally:
+            db.session.remove()
+
+
+def submit_calorie_job(file_path=None, image_path=None, manual_food=''):
+    """Create a job row and queue the analysis; returns the job id at once"""
+    job_id = uuid.uuid4().hex
+    job = CalorieJob(id=job_id, status='queued',
+                     stages=json.dumps({stage: 'pending' for stage in STAGES}))
+    db.session.add(job)
+    db.session.commit()
+    _executor.submit(_run_job, current_app._get_current_object(), job_id, file_path, image_path, manual_food)
+    return job_id
+
+
+def _fail_if_stale(job):
+    """
+    Mark a job failed when its worker was lost. Jobs run on an in-process
+    pool, so one interrupted by a restart or crash would otherwise stay
+    unfinished forever. A running job is stale after CALORIE_JOB_TIMEOUT
+    without progress; a queued one may be waiting behind other jobs, so it
+    gets CALORIE_JOB_QUEUE_TIMEOUT from submission. The update only applies
+    if the job has not moved on meanwhile, and a worker that later reaches a
+    failed job drops its result (see _update_job).
+    """
+    if job.status == 'running':
+        since, timeout = job.updated_at or job.created_at, CALORIE_JOB_TIMEOUT
+    elif job.status == 'queued':
+        since, timeout = job.created_at, CALORIE_JOB_QUEUE_TIMEOUT
+    else:
+        return
+    if not since or datetime.datetime.utcnow() - since <= datetime.timedelta(seconds=timeout):
+        return
+    failed = (CalorieJob.query
+              .filter(CalorieJob.id == job.id, CalorieJob.status == job.status,
+                      CalorieJob.updated_at == job.updated_at)
+              .update({'status': 'failed',
+                       'error': "The analysis did not finish (the server restarted or it timed out). "
+                                "Please try again."},
+                      synchronize_session=False))
+    db.session.commit()
+    db.session.refresh(job)
+    if failed:
+        print(f"[WARN] Calorie job {job.id} marked failed after {timeout}s without progress")
+
+
+def get_calorie_job(job_id):
+    """Return the job as a dict, or None if it does not exist"""
+    job = CalorieJob.query.get(job_id) if job_id else None
+    if job is None:
+        return None
+    _fail_if_stale(job)
+    return job.to_dict()
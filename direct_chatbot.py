@@ -1,7 +1,11 @@
 import os
+import re
 import random
 import time
 from dotenv import load_dotenv
+from app.openai_service import stream_chatbot_response_gpt
+from app.semantic_cache import chat_cache
+from app.resilience import provider, CircuitOpenError
 
 # Load environment variables
 load_dotenv()
@@ -70,87 +74,181 @@ HEALTH_RESPONSES = {
     ]
 }
 
+# Keywords used to pick a canned response when the Gemini API is unavailable
+INTENT_CATEGORIES = {
+    "sleep": ["sleep", "insomnia", "tired", "rest", "bed", "nap", "snore", "dream", "night", "wake up", "waking up", "rem", "melatonin"],
+    "heart rate": ["heart", "pulse", "bpm", "heartbeat", "cardiovascular", "cardiac", "blood pressure", "hypertension", "arrhythmia"],
+    "stress": ["stress", "anxiety", "worried", "tension", "relax", "meditation", "calm", "panic", "overwhelm", "burnout", "mental health"],
+    "steps": ["steps", "walking", "walk", "pedometer", "10000", "distance", "miles", "kilometers", "fitbit", "activity tracker"],
+    "diet": ["diet", "nutrition", "food", "eat", "meal", "calorie", "protein", "carb", "fat", "vitamin", "mineral", "weight loss", "vegetarian", "vegan"],
+    "exercise": ["exercise", "workout", "fitness", "training", "gym", "cardio", "strength", "weight lifting", "running", "jogging", "swimming"],
+    "water": ["water", "hydration", "drink", "thirsty", "fluid", "dehydration", "h2o", "beverage"],
+    "weight": ["weight", "bmi", "body mass", "obesity", "overweight", "underweight", "lose weight", "gain weight", "metabolism"],
+    "vitamins": ["vitamin", "supplement", "mineral", "deficiency", "nutrient"],
+    "mental health": ["mental health", "depression", "anxiety", "therapy", "counseling", "psychologist", "psychiatrist", "mood", "emotion"],
+    "medical": ["doctor", "physician", "hospital", "clinic", "diagnosis", "treatment", "symptom", "disease", "condition", "medication", "prescription"],
+    "aging": ["aging", "longevity", "lifespan", "elderly", "senior", "anti-aging"],
+    "pregnancy": ["pregnancy", "pregnant", "baby", "trimester", "birth", "prenatal", "postnatal"],
+    "covid": ["covid", "coronavirus", "pandemic", "virus", "vaccination", "vaccine", "booster", "mask"],
+    "diabetes": ["diabetes", "blood sugar", "glucose", "insulin", "type 1", "type 2", "a1c"],
+    "allergies": ["allergy", "allergic", "histamine", "pollen", "dust", "pet allergy", "food allergy"]
+}
+
+# Substring cues that an unmatched message is still a question
+QUESTION_WORDS = re.compile("how|what|why|when|where|who|which|can|should|could|would")
+
+
+def _trie_pattern(words):
+    """Regex alternation of words factored into a prefix trie, longest match first"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # A word ending here is tried only after the longer words through this node
+        return '(?:' + body + ')?' if '' in node else body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    Scores categories by how many of their keywords occur in a text, in a single
+    pass of one precompiled regex. A keyword counts once however often it occurs,
+    and matches may overlap or sit inside other words, as with substring checks.
+    """
+
+    def __init__(self, categories):
+        self.categories = list(categories)
+        self._categories_of = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                self._categories_of.setdefault(keyword, []).append(category)
+        keywords = list(self._categories_of)
+        # The lookahead tries every start position and takes the longest keyword
+        # there; the shorter keywords matching at that position are its prefixes
+        self._prefixes = {keyword: [other for other in keywords if keyword.startswith(other)]
+                          for keyword in keywords}
+        self._pattern = re.compile("(?=(" + _trie_pattern(keywords) + "))")
+
+    def matches(self, text):
+        """Set of keywords found in text (expected lowercase)"""
+        found = set()
+        for match in self._pattern.finditer(text):
+            found.update(self._prefixes[match.group(1)])
+        return found
+
+    def scores(self, text):
+        """Keyword count per category, in category order"""
+        scores = dict.fromkeys(self.categories, 0)
+        for keyword in self.matches(text):
+            for category in self._categories_of[keyword]:
+                scores[category] += 1
+        return scores
+
+
+intent_matcher = KeywordMatcher(INTENT_CATEGORIES)
+
+# Semantic cache namespace for AI answers from this module
+CHAT_CACHE_NAMESPACE = "direct_chatbot"
+
+# Safety settings sent with every Gemini chatbot request
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"}
+]
+
+
+def build_chat_prompt(user_question, health_data=None):
+    """Gemini prompt for a chatbot question, with the user's latest vitals as context"""
+    # Create a more conversational prompt
+    current_date = time.strftime("%Y-%m-%d")
+    prompt = f"""You are a helpful health assistant in the Health Tracker application. 
+    Today is {current_date}. Answer the following question in a clear, helpful way. 
+    Format your response with markdown using **bold** for important points and organize with numbered lists where appropriate.
+    Keep your response conversational, informative, and concise.
+
+    User question: {user_question}
+    """
+
+    # Add health data context if available
+    if health_data:
+        health_context = []
+        if 'heart_rate' in health_data and health_data['heart_rate']:
+            health_context.append(f"Heart rate: {health_data['heart_rate']} bpm")
+        if 'sleep_hours' in health_data and health_data['sleep_hours']:
+            health_context.append(f"Sleep: {health_data['sleep_hours']} hours")
+        if 'steps' in health_data and health_data['steps']:
+            health_context.append(f"Steps: {health_data['steps']}")
+        if 'mood' in health_data and health_data['mood']:
+            mood_value = health_data.get('mood', 0)
+            mood_text = "excellent" if mood_value >= 5 else "good" if mood_value >= 4 else "fair" if mood_value >= 3 else "poor"
+            health_context.append(f"Mood: {mood_text} ({mood_value}/5)")
+
+        if health_context:
+            prompt += f"\n\nUser's health data: {', '.join(health_context)}"
+            prompt += "\n\nIncorporate this health data into your response where relevant to provide personalized advice."
+
+    # Add instructions to make responses more dynamic
+    prompt += """
+
+    Guidelines for your response:
+    1. Be conversational and engaging
+    2. Provide evidence-based information
+    3. Tailor advice to the user's specific question
+    4. Avoid generic responses that don't directly address the question
+    5. If the question is unclear, acknowledge that and provide helpful information
+    6. Include specific, actionable advice where appropriate
+    """
+    
+    return prompt
+
+def _chat_model():
+    # Try different models if available
+    try:
+        return genai.GenerativeModel('gemini-1.5-pro')
+    except:
+        try:
+            return genai.GenerativeModel('gemini-pro')
+        except:
+            return genai.GenerativeModel('gemini-1.0-pro')
+
 def get_direct_chatbot_response(user_question, health_data=None):
     """
     An enhanced chatbot implementation that handles a wide range of user questions.
     """
-    time.sleep(0.5)
-    # Compose the Gemini prompt
-    prompt = (
-        "You are a health assistant chatbot. Only respond to user queries that are related to health, wellness, fitness, medical advice, mental well-being, nutrition, or healthy lifestyle. "
-        "If a user asks a question that is not related to health, politely respond: 'I'm here to assist you with health-related questions. Please ask me something about your health or wellness.'\n"
-        f"User: {user_question}"
-    )
-    # Add a small delay to simulate processing
-    time.sleep(0.5)
+    # Recurring questions are answered from the semantic cache
+    cached = chat_cache.get(CHAT_CACHE_NAMESPACE, user_question, health_data)
+    if cached:
+        print(f"Chatbot cache hit ({chat_cache.report()})")
+        return cached
     
     # Try to use Gemini API if available
     if GEMINI_AVAILABLE:
         try:
-            # Create a more conversational prompt
-            current_date = time.strftime("%Y-%m-%d")
-            prompt = f"""You are a helpful health assistant in the Health Tracker application. 
-            Today is {current_date}. Answer the following question in a clear, helpful way. 
-            Format your response with markdown using **bold** for important points and organize with numbered lists where appropriate.
-            Keep your response conversational, informative, and concise.
-            
-            User question: {user_question}
-            """
-            
-            # Add health data context if available
-            if health_data:
-                health_context = []
-                if 'heart_rate' in health_data and health_data['heart_rate']:
-                    health_context.append(f"Heart rate: {health_data['heart_rate']} bpm")
-                if 'sleep_hours' in health_data and health_data['sleep_hours']:
-                    health_context.append(f"Sleep: {health_data['sleep_hours']} hours")
-                if 'steps' in health_data and health_data['steps']:
-                    health_context.append(f"Steps: {health_data['steps']}")
-                if 'mood' in health_data and health_data['mood']:
-                    mood_value = health_data.get('mood', 0)
-                    mood_text = "excellent" if mood_value >= 5 else "good" if mood_value >= 4 else "fair" if mood_value >= 3 else "poor"
-                    health_context.append(f"Mood: {mood_text} ({mood_value}/5)")
-                
-                if health_context:
-                    prompt += f"\n\nUser's health data: {', '.join(health_context)}"
-                    prompt += "\n\nIncorporate this health data into your response where relevant to provide personalized advice."
-            
-            # Add instructions to make responses more dynamic
-            prompt += """
-            
-            Guidelines for your response:
-            1. Be conversational and engaging
-            2. Provide evidence-based information
-            3. Tailor advice to the user's specific question
-            4. Avoid generic responses that don't directly address the question
-            5. If the question is unclear, acknowledge that and provide helpful information
-            6. Include specific, actionable advice where appropriate
-            """
-            
-            # Try different models if available
-            try:
-                model = genai.GenerativeModel('gemini-1.5-pro')
-            except:
-                try:
-                    model = genai.GenerativeModel('gemini-pro')
-                except:
-                    model = genai.GenerativeModel('gemini-1.0-pro')
-            
-            # Generate response with safety settings
-            safety_settings = [
-                {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-                {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-                {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-                {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"}
-            ]
+            prompt = build_chat_prompt(user_question, health_data)
+            model = _chat_model()
             
+            gemini = provider("gemini")
             try:
-                response = model.generate_content(prompt, safety_settings=safety_settings)
+                response = gemini.generate_content(model, prompt, safety_settings=SAFETY_SETTINGS)
+            except (CircuitOpenError, TimeoutError):
+                raise
             except:
                 # Try without safety settings if they're not supported
-                response = model.generate_content(prompt)
+                response = gemini.generate_content(model, prompt)
             
             if response and hasattr(response, 'text') and response.text.strip():
+                chat_cache.set(CHAT_CACHE_NAMESPACE, user_question, response.text, health_data)
                 return response.text
             
             # If we get here, the API didn't return a valid response
@@ -160,39 +258,83 @@ def get_direct_chatbot_response(user_question, health_data=None):
             print(f"Error using Gemini API: {str(e)}")
             # Continue to fallback responses
     
-    # Enhanced keyword detection for more accurate categorization
-    categories = {
-        "sleep": ["sleep", "insomnia", "tired", "rest", "bed", "nap", "snore", "dream", "night", "wake up", "waking up", "rem", "melatonin"],
-        "heart rate": ["heart", "pulse", "bpm", "heartbeat", "cardiovascular", "cardiac", "blood pressure", "hypertension", "arrhythmia"],
-        "stress": ["stress", "anxiety", "worried", "tension", "relax", "meditation", "calm", "panic", "overwhelm", "burnout", "mental health"],
-        "steps": ["steps", "walking", "walk", "pedometer", "10000", "distance", "miles", "kilometers", "fitbit", "activity tracker"],
-        "diet": ["diet", "nutrition", "food", "eat", "meal", "calorie", "protein", "carb", "fat", "vitamin", "mineral", "weight loss", "vegetarian", "vegan"],
-        "exercise": ["exercise", "workout", "fitness", "training", "gym", "cardio", "strength", "weight lifting", "running", "jogging", "swimming"],
-        "water": ["water", "hydration", "drink", "thirsty", "fluid", "dehydration", "h2o", "beverage"],
-        "weight": ["weight", "bmi", "body mass", "obesity", "overweight", "underweight", "lose weight", "gain weight", "metabolism"],
-        "vitamins": ["vitamin", "supplement", "mineral", "deficiency", "nutrient"],
-        "mental health": ["mental health", "depression", "anxiety", "therapy", "counseling", "psychologist", "psychiatrist", "mood", "emotion"],
-        "medical": ["doctor", "physician", "hospital", "clinic", "diagnosis", "treatment", "symptom", "disease", "condition", "medication", "prescription"],
-        "aging": ["aging", "longevity", "lifespan", "elderly", "senior", "anti-aging"],
-        "pregnancy": ["pregnancy", "pregnant", "baby", "trimester", "birth", "prenatal", "postnatal"],
-        "covid": ["covid", "coronavirus", "pandemic", "virus", "vaccination", "vaccine", "booster", "mask"],
-        "diabetes": ["diabetes", "blood sugar", "glucose", "insulin", "type 1", "type 2", "a1c"],
-        "allergies": ["allergy", "allergic", "histamine", "pollen", "dust", "pet allergy", "food allergy"]
-    }
+    return get_fallback_response(user_question, health_data)
+
+def stream_direct_chatbot_response(user_question, health_data=None, recent_data=None):
+    """
+    Yield the chatbot answer in chunks as the model generates it.
     
-    # Determine the most relevant category based on keyword matches
-    category_scores = {category: 0 for category in categories}
-    for category, keywords in categories.items():
-        for keyword in keywords:
-            if keyword in user_question.lower():
-                category_scores[category] += 1
+    Streams from Gemini, then from OpenRouter; if neither produces any text the
+    canned fallback answer is yielded whole. Once text has been sent, a provider
+    error ends the stream instead of starting a second answer. Each Gemini
+    chunk is held to the provider timeout and the outcome is recorded on its
+    breaker; closing the generator closes the upstream stream.
+    """
+    cached = chat_cache.get(CHAT_CACHE_NAMESPACE, user_question, health_data)
+    if cached:
+        print(f"Chatbot cache hit ({chat_cache.report()})")
+        yield cached
+        return
+    
+    if GEMINI_AVAILABLE:
+        sent = []
+        chunks = None
+        try:
+            chunks = provider("gemini").generate_content(_chat_model(),
+                                                         build_chat_prompt(user_question, health_data),
+                                                         safety_settings=SAFETY_SETTINGS, stream=True)
+            for chunk in chunks:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunk without text parts (e.g. blocked by a safety filter)
+                    continue
+                if text:
+                    sent.append(text)
+                    yield text
+            if sent:
+                chat_cache.set(CHAT_CACHE_NAMESPACE, user_question, "".join(sent), health_data)
+                return
+            print("Gemini stream returned no text, trying OpenRouter")
+        except Exception as e:
+            print(f"Error streaming from Gemini API: {str(e)}")
+            if sent:
+                return
+        finally:
+            if chunks is not None:
+                chunks.close()
+    
+    sent = []
+    stream = stream_chatbot_response_gpt(user_question, health_data, recent_data)
+    try:
+        for text in stream:
+            sent.append(text)
+            yield text
+        if sent:
+            chat_cache.set(CHAT_CACHE_NAMESPACE, user_question, "".join(sent), health_data)
+            return
+        print("OpenRouter stream returned no text, using fallback")
+    except Exception as e:
+        print(f"Error streaming from OpenRouter API: {str(e)}")
+        if sent:
+            return
+    finally:
+        stream.close()
+    
+    yield get_fallback_response(user_question, health_data)
+
+def get_fallback_response(user_question, health_data=None):
+    """Canned answer picked by keyword intent, used when no AI service answers"""
+    # Score every category in one pass over the question
+    question = user_question.lower()
+    category_scores = intent_matcher.scores(question)
     
     # Get the category with the highest score
     if max(category_scores.values()) > 0:
         response_category = max(category_scores.items(), key=lambda x: x[1])[0]
     else:
         # If no category matches, use NLP techniques to determine intent
-        if any(word in user_question.lower() for word in ["how", "what", "why", "when", "where", "who", "which", "can", "should", "could", "would"]):
+        if QUESTION_WORDS.search(question):
             # It's likely a specific question, use a more detailed default response
             response_category = "specific_question"
         else:
@@ -201,13 +343,13 @@ def get_direct_chatbot_response(user_question, health_data=None):
     # Add more dynamic responses for specific questions that don't fit categories
     if response_category == "specific_question":
         # Generate a more specific response based on question type
-        if "how" in user_question.lower():
+        if "how" in question:
             return f"That's a great question about how to approach your health. While I don't have a pre-defined answer for '{user_question}', I can suggest that you consider consulting with a healthcare professional for personalized advice. In general, making gradual changes to your lifestyle, staying consistent, and tracking your progress are key principles for most health improvements."
         
-        if "what" in user_question.lower():
+        if "what" in question:
             return f"You've asked about '{user_question}'. This is an important topic in health and wellness. The latest research suggests that individual factors like genetics, lifestyle, and environment all play roles in this area. I recommend looking into peer-reviewed studies or speaking with a specialist who can provide guidance specific to your situation."
         
-        if "why" in user_question.lower():
+        if "why" in question:
             return f"Understanding why certain health phenomena occur is fascinating. Regarding '{user_question}', there are often multiple factors involved including genetics, environment, lifestyle choices, and sometimes random chance. Health science is constantly evolving, so what we know today might be refined tomorrow as researchers learn more."
         
         # Default for other question types
@@ -1,4 +1,7 @@
 import os
+import time
+import datetime
+import threading
 from flask import current_app
 import smtplib
 from email.mime.text import MIMEText
@@ -8,71 +11,297 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+# SMTP settings - point MAIL_SERVER/MAIL_PORT at a local server such as
+# `python -m aiosmtpd -n -l localhost:8025` (with MAIL_USE_TLS=0) for testing
+MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
+MAIL_PORT = int(os.environ.get('MAIL_PORT', '587'))
+MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', '1') not in ('0', 'false', 'False')
+
+# Outbox worker settings
+OUTBOX_WORKERS = int(os.environ.get('MAIL_OUTBOX_WORKERS', '2'))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('MAIL_OUTBOX_MAX_ATTEMPTS', '5'))
+OUTBOX_POLL_INTERVAL = float(os.environ.get('MAIL_OUTBOX_POLL_INTERVAL', '5'))
+OUTBOX_BACKOFF_BASE = float(os.environ.get('MAIL_OUTBOX_BACKOFF_BASE', '30'))
+# A row left in 'sending' longer than this (worker died mid-delivery) is claimed again
+OUTBOX_LEASE_SECONDS = float(os.environ.get('MAIL_OUTBOX_LEASE_SECONDS', '300'))
+SMTP_IDLE_TIMEOUT = float(os.environ.get('MAIL_SMTP_IDLE_TIMEOUT', '60'))
+
+# Wakeups are counted so each worker sees every one, however many workers wait
+_outbox_condition = threading.Condition()
+_outbox_generation = 0
+_outbox_threads = []
+
+def _get_credentials():
+    """Read SMTP credentials from environment variables"""
+    sender_email = os.environ.get('MAIL_USERNAME')
+    sender_password = os.environ.get('MAIL_PASSWORD')
+
+    # Remove any spaces from the app password (Google app passwords often have spaces for readability)
+    if sender_password:
+        sender_password = sender_password.replace(' ', '')
+
+    return sender_email, sender_password
+
+def _build_message(sender_email, to_email, subject, html_content):
+    """Create a multipart HTML message"""
+    msg = MIMEMultipart()
+    msg['From'] = f"Health Tracker <{sender_email}>"
+    msg['To'] = to_email
+    msg['Subject'] = subject
+
+    # Attach HTML content
+    msg.attach(MIMEText(html_content, 'html'))
+    return msg
+
+class SMTPConnection:
+    """
+    An authenticated SMTP connection that is reused across messages.
+    It reconnects when the server drops it and closes itself when idle.
+    """
+
+    def __init__(self, sender_email, sender_password, host=MAIL_SERVER, port=MAIL_PORT, use_tls=MAIL_USE_TLS):
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.server = None
+        self.last_used = 0.0
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.use_tls:
+            server.starttls()  # Secure the connection
+        if self.sender_password:
+            server.login(self.sender_email, self.sender_password)
+        self.server = server
+
+    def send(self, msg):
+        if self.server is None:
+            self._connect()
+        try:
+            self.server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Server closed the idle connection; reconnect once and retry
+            self.server = None
+            self._connect()
+            self.server.send_message(msg)
+        self.last_used = time.time()
+
+    def close_if_idle(self):
+        if self.server is not None and time.time() - self.last_used > SMTP_IDLE_TIMEOUT:
+            self.close()
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                pass
+            self.server = None
+
 def init_app(app):
     """Initialize the email service"""
     # Get email settings from environment variables
     sender_email = os.environ.get('MAIL_USERNAME', '')
-    
+
     print("Direct SMTP email service initialized with:")
-    print(f"SMTP Server: smtp.gmail.com")
+    print(f"SMTP Server: {MAIL_SERVER}:{MAIL_PORT}")
     print(f"Sender Email: {sender_email}")
     print(f"Ready to send emails: {'Yes' if sender_email else 'No - missing configuration'}")
 
+    start_outbox_workers(app)
+
 def send_health_notification(to_email, subject, html_content):
     """
     Send an email notification with health insights using direct SMTP
-    
+
     Args:
         to_email (str): Recipient's email address
         subject (str): Email subject
         html_content (str): HTML content of the email
-    
+
     Returns:
         bool: True if email was sent successfully, False otherwise
     """
     try:
-        # Get credentials from environment variables
-        sender_email = os.environ.get('MAIL_USERNAME')
-        sender_password = os.environ.get('MAIL_PASSWORD')
-        
-        # Remove any spaces from the app password (Google app passwords often have spaces for readability)
-        if sender_password:
-            sender_password = sender_password.replace(' ', '')
-        
+        sender_email, sender_password = _get_credentials()
+
         if not sender_email or not sender_password:
             print("Error: Missing email credentials in environment variables")
             return False
-        
-        # Create a multipart message
-        msg = MIMEMultipart()
-        msg['From'] = f"Health Tracker <{sender_email}>"
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        
-        # Attach HTML content
-        msg.attach(MIMEText(html_content, 'html'))
-        
-        # Connect to Gmail SMTP server
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()  # Secure the connection
-        
-        # Login to the server
-        server.login(sender_email, sender_password)
-        
-        # Send email
-        server.send_message(msg)
-        
-        # Close connection
-        server.quit()
-        
+
+        msg = _build_message(sender_email, to_email, subject, html_content)
+
+        connection = SMTPConnection(sender_email, sender_password)
+        connection.send(msg)
+        connection.close()
+
         print(f"\n==== EMAIL SENT SUCCESSFULLY ====\n")
         print(f"From: {sender_email}")
         print(f"To: {to_email}")
         print(f"Subject: {subject}")
         print(f"==== END EMAIL NOTIFICATION ====\n")
-        
+
         return True
-        
+
     except Exception as e:
         print(f"Error sending email: {str(e)}")
         return False
+
+def queue_health_notification(to_email, subject, html_content):
+    """
+    Add an email to the outbox so it is delivered by the background workers
+
+    Returns:
+        bool: True if the email was queued, False otherwise
+    """
+    from app.models import db, EmailOutbox
+
+    sender_email, sender_password = _get_credentials()
+    if not sender_email or not sender_password:
+        # Nothing could deliver the row, so report the failure now
+        print("Error: Missing email credentials in environment variables")
+        return False
+
+    try:
+        db.session.add(EmailOutbox(to_email=to_email, subject=subject, html_content=html_content))
+        db.session.commit()
+        _wake_outbox_workers()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error queueing email: {str(e)}")
+        return False
+
+def _wake_outbox_workers():
+    global _outbox_generation
+    with _outbox_condition:
+        _outbox_generation += 1
+        _outbox_condition.notify_all()
+
+def _wait_for_outbox(seen, timeout=None):
+    """Wait until a wakeup newer than seen arrives or the poll interval passes; returns the latest wakeup"""
+    with _outbox_condition:
+        _outbox_condition.wait_for(lambda: _outbox_generation != seen,
+                                   OUTBOX_POLL_INTERVAL if timeout is None else timeout)
+        return _outbox_generation
+
+def _claim_next_email():
+    """
+    Atomically mark the next due outbox row as sending and return it.
+
+    Rows whose 'sending' lease has expired are claimed again; the attempt is
+    counted at claim time so a row that keeps killing its worker still ends
+    up failed after OUTBOX_MAX_ATTEMPTS.
+    """
+    from app.models import db, EmailOutbox
+
+    now = datetime.datetime.utcnow()
+    lease_expired = now - datetime.timedelta(seconds=OUTBOX_LEASE_SECONDS)
+    candidates = (EmailOutbox.query
+                  .filter(db.or_(
+                      db.and_(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= now),
+                      db.and_(EmailOutbox.status == 'sending',
+                              db.or_(EmailOutbox.claimed_at.is_(None), EmailOutbox.claimed_at <= lease_expired))))
+                  .order_by(EmailOutbox.id)
+                  .limit(5)
+                  .all())
+    for email in candidates:
+        # Conditional update on the state just read, so two workers never send the same row
+        unchanged = [EmailOutbox.id == email.id, EmailOutbox.status == email.status,
+                     EmailOutbox.claimed_at.is_(None) if email.claimed_at is None
+                     else EmailOutbox.claimed_at == email.claimed_at]
+        if email.status == 'sending' and (email.attempts or 0) >= OUTBOX_MAX_ATTEMPTS:
+            EmailOutbox.query.filter(*unchanged).update(
+                {'status': 'failed', 'last_error': 'Delivery lease expired'}, synchronize_session=False)
+            db.session.commit()
+            print(f"Outbox email {email.id} failed permanently: delivery lease expired")
+            continue
+        if email.status == 'sending':
+            print(f"Outbox email {email.id} lease expired, claiming it again")
+        claimed = (EmailOutbox.query
+                   .filter(*unchanged)
+                   .update({'status': 'sending', 'claimed_at': now,
+                            'attempts': db.func.coalesce(EmailOutbox.attempts, 0) + 1},
+                           synchronize_session=False))
+        db.session.commit()
+        if claimed:
+            db.session.refresh(email)
+            return email
+    return None
+
+def _deliver(connection, email):
+    """Send one claimed outbox row and record the outcome"""
+    from app.models import db
+
+    try:
+        msg = _build_message(connection.sender_email, email.to_email, email.subject, email.html_content)
+        connection.send(msg)
+        email.status = 'sent'
+        email.sent_at = datetime.datetime.utcnow()
+        email.last_error = None
+        print(f"Outbox email {email.id} sent to {email.to_email}")
+    except Exception as e:
+        connection.close()
+        email.last_error = str(e)
+        if email.attempts >= OUTBOX_MAX_ATTEMPTS:
+            email.status = 'failed'
+            print(f"Outbox email {email.id} failed permanently: {str(e)}")
+        else:
+            # Exponential backoff before the next attempt
+            delay = OUTBOX_BACKOFF_BASE * (2 ** (email.attempts - 1))
+            email.status = 'pending'
+            email.next_attempt_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=delay)
+            print(f"Outbox email {email.id} failed (attempt {email.attempts}), retrying in {delay:.0f}s: {str(e)}")
+    email.claimed_at = None
+    db.session.commit()
+
+def drain_outbox(connection):
+    """Deliver due outbox rows over one connection until none is left; returns how many were tried"""
+    delivered = 0
+    email = _claim_next_email()
+    while email is not None:
+        _deliver(connection, email)
+        delivered += 1
+        email = _claim_next_email()
+    return delivered
+
+def _outbox_worker(app, stop=None):
+    """Worker loop: drain the outbox, reusing one SMTP connection, until stop is set"""
+    from app.models import db
+
+    connection = None
+    seen = _outbox_generation
+    while stop is None or not stop.is_set():
+        try:
+            with app.app_context():
+                sender_email, sender_password = _get_credentials()
+                if not sender_email or not sender_password:
+                    seen = _wait_for_outbox(seen)
+                    continue
+                if connection is None or connection.sender_email != sender_email:
+                    connection = SMTPConnection(sender_email, sender_password)
+
+                try:
+                    drain_outbox(connection)
+                finally:
+                    # A failed commit must not leave the next loop with a broken session
+                    db.session.remove()
+
+            connection.close_if_idle()
+        except Exception as e:
+            print(f"Outbox worker error: {str(e)}")
+
+        # Returns at once if a row was queued while this worker was draining
+        seen = _wait_for_outbox(seen)
+
+def start_outbox_workers(app, workers=OUTBOX_WORKERS):
+    """Start the background threads that deliver queued emails"""
+    if _outbox_threads or workers <= 0:
+        return
+    for i in range(workers):
+        thread = threading.Thread(target=_outbox_worker, args=(app,), name=f"email-outbox-{i}", daemon=True)
+        thread.start()
+        _outbox_threads.append(thread)
+    print(f"Started {workers} email outbox worker(s)")
@@ -3,6 +3,8 @@ import os
 import csv
 import difflib
 from app.usda_api import get_usda_nutrition
+from app.nutrition_cache import cached_lookup
+from app.resilience import CircuitOpenError
 
 # Path to the CSV file
 CSV_PATH = os.path.join(os.path.dirname(__file__), 'static', 'data', 'food_nutrition.csv')
@@ -52,30 +54,41 @@ def get_nutrition_data(food_item):
     Uses exact and fuzzy matching for best results.
     If not found locally, queries the USDA API.
     Returns a dict with nutrition info or None if not found.
+    Each source is cached under its own provider ("csv", "usda"), including
+    misses; a miss caused by a USDA or file error (or the USDA circuit being
+    open) is not cached.
     """
     try:
-        df = pd.read_csv(CSV_PATH)
-        food_item_clean = food_item.lower().strip()
-        # Exact match (case-insensitive)
-        matches = df[df['food_item'].str.lower().str.strip() == food_item_clean]
-        if not matches.empty:
-            return matches.iloc[0].to_dict()
-        # Fuzzy match if exact fails
-        close_matches = difflib.get_close_matches(food_item_clean, df['food_item'].str.lower().tolist(), n=1, cutoff=0.8)
-        if close_matches:
-            match = df[df['food_item'].str.lower() == close_matches[0]]
-            if not match.empty:
-                return match.iloc[0].to_dict()
-        # Not found locally, try USDA API
-        usda_data = get_usda_nutrition(food_item)
-        if usda_data:
-            return usda_data
-        print(f"[WARN] Nutrition data not found for: {food_item}")
+        nutrition_data = cached_lookup("csv", food_item, _lookup_csv_nutrition)
+        if nutrition_data is None:
+            # Not found locally, try USDA API
+            nutrition_data = get_usda_nutrition(food_item)
+        if nutrition_data is None:
+            print(f"[WARN] Nutrition data not found for: {food_item}")
+        return nutrition_data
+    except CircuitOpenError as e:
+        print(f"[WARN] Nutrition data not found for: {food_item} ({e})")
         return None
     except Exception as e:
         print(f"Error getting nutrition data for {food_item}: {str(e)}")
         return None
 
+def _lookup_csv_nutrition(food_item):
+    # Errors propagate so cached_lookup does not store them as misses
+    df = pd.read_csv(CSV_PATH)
+    food_item_clean = food_item.lower().strip()
+    # Exact match (case-insensitive)
+    matches = df[df['food_item'].str.lower().str.strip() == food_item_clean]
+    if not matches.empty:
+        return matches.iloc[0].to_dict()
+    # Fuzzy match if exact fails
+    close_matches = difflib.get_close_matches(food_item_clean, df['food_item'].str.lower().tolist(), n=1, cutoff=0.8)
+    if close_matches:
+        match = df[df['food_item'].str.lower() == close_matches[0]]
+        if not match.empty:
+            return match.iloc[0].to_dict()
+    return None
+
 def get_all_food_items():
     """Get a list of all food items in the database"""
     ensure_nutrition_data_exists()
@@ -1,21 +1,69 @@
 import os
 import json
+import time
 from app.gemini_service import genai
-from PIL import Image
+from app.nutrition_index import get_nutrition_index
+from app.recognition_cache import recognition_cache
+from app.single_flight import single_flight, prompt_key
+from app.resilience import provider
+from PIL import Image, ImageOps
 import io
 import base64
 import joblib
-import requests
 from dotenv import load_dotenv
 load_dotenv()
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+FOOD_INSIGHTS_MODEL = "openai/gpt-3.5-turbo"  # Switched to a free/available model
 
 # --- ML Model Loading ---
 MODEL_PATH = os.path.join(os.path.dirname(__file__), 'calorie_predictor.pkl')
 calorie_model = None
 if os.path.exists(MODEL_PATH):
     calorie_model = joblib.load(MODEL_PATH)
+# The model only ever sees the CSV averages, so its one estimate is computed once
+_average_estimate = None
+
+# --- Image preprocessing before upload ---
+IMAGE_MAX_EDGE = int(os.getenv("FOOD_IMAGE_MAX_EDGE", "1024"))
+IMAGE_UPLOAD_FORMAT = os.getenv("FOOD_IMAGE_UPLOAD_FORMAT", "JPEG").upper()  # JPEG or WEBP
+IMAGE_UPLOAD_QUALITY = int(os.getenv("FOOD_IMAGE_UPLOAD_QUALITY", "85"))
+IMAGE_MIME_TYPES = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'WEBP': 'image/webp'}
+
+def prepare_image_for_upload(image_bytes):
+    """
+    Detect the real image format, downscale to IMAGE_MAX_EDGE, drop EXIF and
+    re-encode compactly. Returns (bytes, mime_type); the original bytes are
+    kept when they carry no EXIF, are already smaller and are in a format
+    Gemini accepts. An image already in an accepted format is also
+    re-encoded in that format, in case it compresses better there.
+    """
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            source_format = img.format
+            has_exif = 'exif' in img.info
+            # Apply the EXIF orientation before the metadata is dropped
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((IMAGE_MAX_EDGE, IMAGE_MAX_EDGE))
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            formats = [IMAGE_UPLOAD_FORMAT]
+            if source_format in IMAGE_MIME_TYPES and source_format != IMAGE_UPLOAD_FORMAT:
+                formats.append(source_format)
+            encodings = []
+            for fmt in formats:
+                output = io.BytesIO()
+                img.save(output, format=fmt, quality=IMAGE_UPLOAD_QUALITY, optimize=True)
+                encodings.append((len(output.getvalue()), fmt, output.getvalue()))
+            size, encoded_format, encoded = min(encodings)
+    except Exception as e:
+        print(f"[WARN] Could not preprocess image, sending original: {str(e)}")
+        return image_bytes, 'image/jpeg'
+
+    if source_format in IMAGE_MIME_TYPES and not has_exif and len(image_bytes) <= size:
+        return image_bytes, IMAGE_MIME_TYPES[source_format]
+    print(f"[DEBUG] Image {source_format} {len(image_bytes)} bytes -> {encoded_format} {size} bytes")
+    return encoded, IMAGE_MIME_TYPES.get(encoded_format, 'image/jpeg')
 
 def recognize_food_from_image(image_data):
     """
@@ -32,14 +80,22 @@ def recognize_food_from_image(image_data):
         # Open image as bytes
         with open(image_data, 'rb') as img_file:
             image_bytes = img_file.read()
+        # Identical or near-identical photos reuse the earlier recognition
+        cached_items, image_sha, image_hash = recognition_cache.lookup(image_bytes)
+        if cached_items is not None:
+            print(f"[DEBUG] Recognition cache hit: {cached_items} ({recognition_cache.report()})")
+            return cached_items
+        upload_bytes, mime_type = prepare_image_for_upload(image_bytes)
         prompt = """
         Analyze this food image and identify all food items present. Return ONLY a JSON array of food item names, nothing else. Example: [\"apple\", \"banana\", \"chicken sandwich\"] Be specific but concise with food names.
         """
         model = genai.GenerativeModel('gemini-1.5-flash')
-        response = model.generate_content([
+        model_start = time.perf_counter()
+        response = provider("gemini_vision").generate_content(model, [
             prompt,
-            {"mime_type": "image/jpeg", "data": image_bytes}
+            {"mime_type": mime_type, "data": upload_bytes}
         ])
+        model_seconds = time.perf_counter() - model_start
         text_response = response.text.strip()
         print(f"[DEBUG] Gemini API raw response: {text_response}")
         # Clean up Gemini output
@@ -53,6 +109,7 @@ def recognize_food_from_image(image_data):
             food_items = json.loads(text_response)
             if isinstance(food_items, list) and all(isinstance(f, str) for f in food_items):
                 print(f"[DEBUG] Recognized food items: {food_items}")
+                recognition_cache.store(image_sha, image_hash, food_items, model_seconds)
                 return food_items
             else:
                 print(f"[ERROR] Gemini did not return a valid list: {food_items}")
@@ -66,6 +123,33 @@ def recognize_food_from_image(image_data):
         traceback.print_exc()
         return ["Unable to recognize food items"]
 
+def _request_food_insights(prompt):
+    """Send the food insights prompt to OpenRouter and return the answer text"""
+    headers = {
+        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    data = {
+        "model": FOOD_INSIGHTS_MODEL,
+        "messages": [
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 512,
+        "temperature": 0.7
+    }
+    print(f"[OpenRouter] Sending prompt to model: {data['model']}")
+    response = provider("openrouter").post(
+        "https://openrouter.ai/api/v1/chat/completions",
+        headers=headers,
+        json=data
+    )
+    if response.status_code == 200:
+        result = response.json()
+        print(f"[OpenRouter] Raw response: {result}")
+        return result['choices'][0]['message']['content']
+    print(f"[OpenRouter] API error: {response.status_code} {response.text}")
+    return "Unable to generate health insights for these food items."
+
 def get_food_insights(food_items):
     """
     Get health insights about the food items using OpenRouter API (GPT-3.5 Turbo model)
@@ -82,31 +166,9 @@ def get_food_insights(food_items):
         prompt = f"""
         Analyze the following food items from a health perspective: {', '.join(food_items)}\n\nProvide a brief health assessment covering:\n1. Overall nutritional value\n2. Potential health benefits\n3. Any concerns or recommendations\n4. Suggestions for healthier alternatives if needed\n\nKeep your response concise but informative, around 150-200 words.\n"""
 
-        headers = {
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        data = {
-            "model": "openai/gpt-3.5-turbo",  # Switched to a free/available model
-            "messages": [
-                {"role": "user", "content": prompt}
-            ],
-            "max_tokens": 512,
-            "temperature": 0.7
-        }
-        print(f"[OpenRouter] Sending prompt to model: {data['model']}")
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            json=data
-        )
-        if response.status_code == 200:
-            result = response.json()
-            print(f"[OpenRouter] Raw response: {result}")
-            return result['choices'][0]['message']['content']
-        else:
-            print(f"[OpenRouter] API error: {response.status_code} {response.text}")
-            return "Unable to generate health insights for these food items."
+        # Identical concurrent requests share one upstream call
+        return single_flight.do(prompt_key("food_insights", prompt, FOOD_INSIGHTS_MODEL),
+                                _request_food_insights, prompt)
     except Exception as e:
         print(f"[OpenRouter] Error getting food insights: {str(e)}")
         import traceback
@@ -118,61 +180,20 @@ def get_nutrition_data(food_item):
     Get nutrition data for a food item from the CSV database or ML model
     """
     try:
-        import pandas as pd
-        import os
-        # Path to the CSV file
-        csv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 
-                               'static', 'data', 'food_nutrition.csv')
-        if not os.path.exists(csv_path):
-            print(f"CSV file not found at: {csv_path}")
+        # The CSV is parsed and indexed once per process
+        index = get_nutrition_index()
+        if index is None:
             return default_nutrition_values(food_item)
-        df = pd.read_csv(csv_path)
-        food_item_lower = food_item.lower()
-        matches = df[df['Description'].str.lower().str.contains(food_item_lower, na=False)]
-        if len(matches) == 0:
-            matches = df[df['Category'].str.lower().str.contains(food_item_lower, na=False)]
-        if len(matches) == 0 and ' ' in food_item_lower:
-            words = food_item_lower.split()
-            for word in words:
-                if len(word) > 3:
-                    word_matches = df[df['Description'].str.lower().str.contains(word, na=False)]
-                    if len(word_matches) > 0:
-                        matches = word_matches
-                        break
-        if len(matches) == 0:
+        match = index.lookup(food_item)
+        if match is None:
             # Try ML model prediction if available
             if calorie_model is not None:
-                # For demo, use average macros for unknown food (could be improved by user input)
-                # In a real app, ask user for macros or estimate from context
-                avg_protein = df['Data.Protein'].mean()
-                avg_fat = df['Data.Fat.Total Lipid'].mean()
-                avg_carbs = df['Data.Carbohydrate'].mean()
-                avg_fiber = df['Data.Fiber'].mean()
-                avg_sugar = df['Data.Sugar Total'].mean()
-                features = [[avg_protein, avg_fat, avg_carbs, avg_fiber, avg_sugar]]
-                calories_pred = float(calorie_model.predict(features)[0])
-                return {
-                    'food_item': food_item,
-                    'calories': calories_pred,
-                    'protein': avg_protein,
-                    'fat': avg_fat,
-                    'carbohydrates': avg_carbs,
-                    'fiber': avg_fiber,
-                    'sugar': avg_sugar
-                }
+                return dict(_predict_average_nutrition(index), food_item=food_item)
             else:
                 print(f"No nutrition data found for: {food_item}")
                 return default_nutrition_values(food_item)
-        food_data = matches.iloc[0]
-        nutrition_data = {
-            'food_item': food_item,
-            'calories': float(food_data.get('Data.Kilocalories', 0)),
-            'protein': float(food_data.get('Data.Protein', 0)),
-            'fat': float(food_data.get('Data.Fat.Total Lipid', 0)),
-            'carbohydrates': float(food_data.get('Data.Carbohydrate', 0)),
-            'fiber': float(food_data.get('Data.Fiber', 0)),
-            'sugar': float(food_data.get('Data.Sugar Total', 0))
-        }
+        nutrition_data = {'food_item': food_item}
+        nutrition_data.update(match)
         return nutrition_data
     except Exception as e:
         print(f"Error getting nutrition data: {str(e)}")
@@ -180,6 +201,26 @@ def get_nutrition_data(food_item):
         traceback.print_exc()
         return default_nutrition_values(food_item)
 
+def _predict_average_nutrition(index):
+    """
+    Calorie model estimate for an unknown food. For demo, it uses the average
+    macros of the CSV (could be improved by user input); in a real app, ask
+    the user for macros or estimate from context.
+    """
+    global _average_estimate
+    if _average_estimate is None:
+        avg = index.averages
+        features = [[avg['protein'], avg['fat'], avg['carbohydrates'], avg['fiber'], avg['sugar']]]
+        _average_estimate = {
+            'calories': float(calorie_model.predict(features)[0]),
+            'protein': avg['protein'],
+            'fat': avg['fat'],
+            'carbohydrates': avg['carbohydrates'],
+            'fiber': avg['fiber'],
+            'sugar': avg['sugar']
+        }
+    return _average_estimate
+
 def default_nutrition_values(food_item):
     """Return default nutrition values for a food item"""
     return {
@@ -3,6 +3,14 @@ from wtforms import IntegerField, FloatField, SelectField, SubmitField, StringFi
 from wtforms.validators import DataRequired, NumberRange, Length, Regexp, Email, EqualTo, ValidationError, Optional
 from app.models import User
 
+# Accepted value ranges for vitals, shared with the bulk ingestion API
+VITALS_RANGES = {
+    'heart_rate': (40, 220),
+    'sleep_hours': (0, 24),
+    'steps': (0, 100000),
+    'mood': (1, 5)
+}
+
 class VitalsForm(FlaskForm):
     name = StringField('Your Name', 
                       validators=[DataRequired(), 
@@ -20,17 +28,17 @@ class VitalsForm(FlaskForm):
     
     heart_rate = IntegerField('Heart Rate (BPM)', 
                              validators=[DataRequired(), 
-                                        NumberRange(min=40, max=220, 
+                                        NumberRange(*VITALS_RANGES['heart_rate'], 
                                                    message="Heart rate should be between 40-220 BPM")])
     
     sleep_hours = FloatField('Sleep Hours', 
                             validators=[DataRequired(), 
-                                       NumberRange(min=0, max=24, 
+                                       NumberRange(*VITALS_RANGES['sleep_hours'], 
                                                   message="Sleep hours should be between 0-24")])
     
     steps = IntegerField('Steps Today', 
                         validators=[DataRequired(), 
-                                   NumberRange(min=0, max=100000, 
+                                   NumberRange(*VITALS_RANGES['steps'], 
                                               message="Steps should be between 0-100,000")])
     
     mood = SelectField('Current Mood', 
@@ -6,6 +6,12 @@ import pandas as pd
 from scipy import stats
 from datetime import datetime, timedelta
 import json
+import threading
+import time
+from app.response_cache import response_cache, make_cache_key
+from app.single_flight import single_flight, prompt_key
+from app.resilience import provider
+from app.vitals_analytics import METRICS as VITALS_METRICS, vitals_matrix, vitals_stats
 
 # Load environment variables
 load_dotenv()
@@ -22,17 +28,204 @@ try:
 except Exception as e:
     print(f"Error configuring Gemini API: {str(e)}")
 
+# Model discovery cache - genai.list_models() is a network round trip, so the
+# resolved model name is kept in memory and in a small JSON file that all
+# worker processes share
+PREFERRED_MODELS = ["gemini-pro", "gemini-1.0-pro", "gemini-1.5-pro"]
+MODEL_CACHE_TTL = int(os.getenv("GEMINI_MODEL_CACHE_TTL", "3600"))
+MODEL_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'gemini_model.json')
+
+_model_cache = {"name": None, "resolved_at": 0.0}
+_model_cache_lock = threading.Lock()
+_model_refresh_running = False
+model_cache_stats = {"hits": 0, "misses": 0, "refreshes": 0}
+
+def _count_model_cache(outcome):
+    """Bump a model_cache_stats counter; request threads and the refresh thread share it"""
+    with _model_cache_lock:
+        model_cache_stats[outcome] += 1
+
+def _discover_model():
+    """
+    Pick a Gemini model with a single genai.list_models() call, made through
+    the Gemini circuit breaker (CircuitOpenError while it is open)
+    """
+    models = provider("gemini").call(lambda: list(genai.list_models()))
+    available_models = [m.name for m in models]
+    print(f"Available Gemini models: {available_models}")
+    
+    # Try to find a suitable model
+    for model_option in PREFERRED_MODELS:
+        if model_option in str(available_models):
+            return model_option
+    
+    # If no specific model found, use the first text model available
+    for model in models:
+        if "generateContent" in model.supported_generation_methods:
+            return model.name
+    
+    return None
+
+def _load_model_cache_file():
+    """Read the model cache shared by all worker processes"""
+    try:
+        with open(MODEL_CACHE_FILE, 'r') as f:
+            data = json.load(f)
+        if data.get("name"):
+            return {"name": data["name"], "resolved_at": float(data.get("resolved_at", 0))}
+    except (OSError, ValueError, TypeError):
+        pass
+    return None
+
+def _store_model_cache(model_name):
+    """Update the in-memory cache and the shared cache file"""
+    entry = {"name": model_name, "resolved_at": time.time()}
+    with _model_cache_lock:
+        _model_cache.update(entry)
+    try:
+        os.makedirs(os.path.dirname(MODEL_CACHE_FILE), exist_ok=True)
+        tmp_path = f"{MODEL_CACHE_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, MODEL_CACHE_FILE)
+    except OSError as e:
+        print(f"Could not write Gemini model cache file: {str(e)}")
+
+def _refresh_model_cache():
+    """Re-run model discovery in the background"""
+    global _model_refresh_running
+    try:
+        model_name = _discover_model()
+        if model_name:
+            _store_model_cache(model_name)
+            _count_model_cache("refreshes")
+    except Exception as e:
+        print(f"Background Gemini model refresh failed: {str(e)}")
+    finally:
+        with _model_cache_lock:
+            _model_refresh_running = False
+
+def _start_model_refresh():
+    global _model_refresh_running
+    with _model_cache_lock:
+        if _model_refresh_running:
+            return
+        _model_refresh_running = True
+    threading.Thread(target=_refresh_model_cache, daemon=True).start()
+
+def resolve_model_name():
+    """
+    Return the Gemini model to use, calling genai.list_models() only when the
+    cache is empty. A stale entry is still served while it is refreshed in the
+    background. Returns None if no suitable model is available.
+    """
+    now = time.time()
+    
+    with _model_cache_lock:
+        entry = dict(_model_cache)
+    
+    # Another worker may have resolved the model already
+    if not entry["name"] or now - entry["resolved_at"] > MODEL_CACHE_TTL:
+        file_entry = _load_model_cache_file()
+        if file_entry and file_entry["resolved_at"] > entry["resolved_at"]:
+            entry = file_entry
+            with _model_cache_lock:
+                _model_cache.update(file_entry)
+    
+    if entry["name"]:
+        _count_model_cache("hits")
+        if now - entry["resolved_at"] > MODEL_CACHE_TTL:
+            _start_model_refresh()
+        return entry["name"]
+    
+    _count_model_cache("misses")
+    model_name = _discover_model()
+    if model_name:
+        _store_model_cache(model_name)
+    return model_name
+
+def _trend_entry(slope, r_value, p_value, mean, std, cv, minimum, maximum, latest,
+                 recent_change, recent_pct_change):
+    """Describe one metric's trend from its statistics (cv is None when mean <= 0)"""
+    # Determine trend direction and strength
+    if p_value < 0.05:  # Statistically significant
+        if slope > 0:
+            direction = "increasing"
+        else:
+            direction = "decreasing"
+        
+        # Determine strength based on r-squared value
+        r_squared = r_value ** 2
+        if r_squared > 0.7:
+            strength = "strong"
+        elif r_squared > 0.3:
+            strength = "moderate"
+        else:
+            strength = "slight"
+    else:
+        direction = "stable"
+        strength = "consistent"
+    
+    # Variability from the coefficient of variation
+    if cv is not None:
+        if cv > 25:
+            variability = "highly variable"
+        elif cv > 10:
+            variability = "somewhat variable"
+        else:
+            variability = "consistent"
+    else:
+        variability = "unknown"
+    
+    return {
+        "direction": direction,
+        "strength": strength,
+        "variability": variability,
+        "recent_change": recent_change,
+        "recent_pct_change": recent_pct_change,
+        "mean": float(mean),
+        "std": float(std),
+        "min": float(minimum),
+        "max": float(maximum),
+        "latest": float(latest)
+    }
+
+def _generate(model, model_name, prompt, key=None, **kwargs):
+    """
+    model.generate_content(prompt, **kwargs) behind the Gemini circuit breaker,
+    with identical concurrent calls sharing one upstream request. key defaults
+    to the normalized prompt.
+    """
+    key = key or prompt_key("gemini", prompt, model_name)
+    return single_flight.do(key, provider("gemini").generate_content, model, prompt, **kwargs)
+
 def analyze_trends(recent_vitals):
     """Analyze trends in vital data to provide statistical insights"""
     if not recent_vitals or len(recent_vitals) < 3:
         return {}
     
+    # Fast path: all four metrics numeric in every row -> one vectorized pass
+    values = vitals_matrix(recent_vitals)
+    if values is not None:
+        result = vitals_stats(values)
+        trends = {}
+        for i, metric in enumerate(VITALS_METRICS):
+            cv = result['cv'][i]
+            pct = result['recent_pct_change'][i]
+            trends[metric] = _trend_entry(
+                result['slope'][i], result['r_value'][i], result['p_value'][i],
+                result['mean'][i], result['std'][i], None if np.isnan(cv) else cv,
+                result['min'][i], result['max'][i], result['latest'][i],
+                result['recent_change'][i], 0 if np.isnan(pct) else pct
+            )
+        return trends
+    
     # Convert to DataFrame for easier analysis
     df = pd.DataFrame(recent_vitals)
     
     # Calculate trends
     trends = {}
-    for metric in ['heart_rate', 'sleep_hours', 'steps', 'mood']:
+    for metric in VITALS_METRICS:
         if metric in df.columns:
             values = df[metric].astype(float).values
             
@@ -40,38 +233,10 @@ def analyze_trends(recent_vitals):
             x = np.arange(len(values))
             slope, _, r_value, p_value, _ = stats.linregress(x, values)
             
-            # Determine trend direction and strength
-            if p_value < 0.05:  # Statistically significant
-                if slope > 0:
-                    direction = "increasing"
-                else:
-                    direction = "decreasing"
-                
-                # Determine strength based on r-squared value
-                r_squared = r_value ** 2
-                if r_squared > 0.7:
-                    strength = "strong"
-                elif r_squared > 0.3:
-                    strength = "moderate"
-                else:
-                    strength = "slight"
-            else:
-                direction = "stable"
-                strength = "consistent"
-            
             # Calculate variability (coefficient of variation)
             mean = np.mean(values)
             std = np.std(values)
-            if mean > 0:
-                cv = (std / mean) * 100
-                if cv > 25:
-                    variability = "highly variable"
-                elif cv > 10:
-                    variability = "somewhat variable"
-                else:
-                    variability = "consistent"
-            else:
-                variability = "unknown"
+            cv = (std / mean) * 100 if mean > 0 else None
             
             # Calculate recent change (last 3 entries)
             if len(values) >= 3:
@@ -82,45 +247,20 @@ def analyze_trends(recent_vitals):
                 recent_pct_change = 0
             
             # Store results
-            trends[metric] = {
-                "direction": direction,
-                "strength": strength,
-                "variability": variability,
-                "recent_change": recent_change,
-                "recent_pct_change": recent_pct_change,
-                "mean": float(mean),
-                "std": float(std),
-                "min": float(np.min(values)),
-                "max": float(np.max(values)),
-                "latest": float(values[-1])
-            }
+            trends[metric] = _trend_entry(slope, r_value, p_value, mean, std, cv,
+                                          np.min(values), np.max(values), values[-1],
+                                          recent_change, recent_pct_change)
     
     return trends
 
-def identify_correlations(recent_vitals):
-    """Identify correlations between different health metrics"""
-    if not recent_vitals or len(recent_vitals) < 5:  # Need at least 5 data points for meaningful correlation
-        return []
-    
-    # Convert to DataFrame
-    df = pd.DataFrame(recent_vitals)
-    
-    # Calculate correlation matrix
-    metrics = ['heart_rate', 'sleep_hours', 'steps', 'mood']
-    available_metrics = [m for m in metrics if m in df.columns]
-    
-    if len(available_metrics) < 2:
-        return []
-    
-    corr_matrix = df[available_metrics].corr()
-    
-    # Extract significant correlations
+def _correlation_entries(metrics, corr_value_of):
+    """Strong correlations between each pair of metrics, in metric order"""
     correlations = []
-    for i in range(len(available_metrics)):
-        for j in range(i+1, len(available_metrics)):
-            metric1 = available_metrics[i]
-            metric2 = available_metrics[j]
-            corr_value = corr_matrix.loc[metric1, metric2]
+    for i in range(len(metrics)):
+        for j in range(i+1, len(metrics)):
+            metric1 = metrics[i]
+            metric2 = metrics[j]
+            corr_value = corr_value_of(i, j)
             
             # Only include strong correlations
             if abs(corr_value) > 0.5:
@@ -137,6 +277,32 @@ def identify_correlations(recent_vitals):
     
     return correlations
 
+def identify_correlations(recent_vitals):
+    """Identify correlations between different health metrics"""
+    if not recent_vitals or len(recent_vitals) < 5:  # Need at least 5 data points for meaningful correlation
+        return []
+    
+    # Fast path: correlation matrix from the same vectorized kernel as analyze_trends
+    values = vitals_matrix(recent_vitals)
+    if values is not None:
+        corr = vitals_stats(values)['corr']
+        return _correlation_entries(VITALS_METRICS, lambda i, j: corr[i, j])
+    
+    # Convert to DataFrame
+    df = pd.DataFrame(recent_vitals)
+    
+    # Calculate correlation matrix
+    available_metrics = [m for m in VITALS_METRICS if m in df.columns]
+    
+    if len(available_metrics) < 2:
+        return []
+    
+    corr_matrix = df[available_metrics].corr()
+    return _correlation_entries(
+        available_metrics,
+        lambda i, j: corr_matrix.loc[available_metrics[i], available_metrics[j]]
+    )
+
 def get_health_insights(latest_vitals, recent_vitals):
     try:
         # If no data is provided, return a default message
@@ -145,23 +311,8 @@ def get_health_insights(latest_vitals, recent_vitals):
         
         # Try to use Gemini API if available
         try:
-            # List available models to find one that works
-            available_models = [m.name for m in genai.list_models()]
-            print(f"Available Gemini models: {available_models}")
-            
-            # Try to find a suitable model
-            model_name = None
-            for model_option in ["gemini-pro", "gemini-1.0-pro", "gemini-1.5-pro"]:
-                if model_option in str(available_models):
-                    model_name = model_option
-                    break
-                    
-            # If no specific model found, use the first text model available
-            if not model_name:
-                for model in genai.list_models():
-                    if "generateContent" in model.supported_generation_methods:
-                        model_name = model.name
-                        break
+            # Resolve the model once and reuse it across requests
+            model_name = resolve_model_name()
                         
             print(f"Selected Gemini model: {model_name}")
             
@@ -177,6 +328,20 @@ def get_health_insights(latest_vitals, recent_vitals):
             # Calculate health score based on latest vitals
             health_score = calculate_health_score(latest_vitals)
             
+            # Serve identical inputs from the response cache
+            cache_key = make_cache_key(
+                "health_insights",
+                latest=latest_vitals,
+                trends=trends,
+                correlations=correlations,
+                history=recent_vitals[-5:],
+                model=model_name
+            )
+            cached = response_cache.get(cache_key)
+            if cached:
+                print("Serving health insights from response cache")
+                return cached
+            
             # Initialize the model
             model = genai.GenerativeModel(model_name)
             
@@ -223,8 +388,9 @@ def get_health_insights(latest_vitals, recent_vitals):
             
             # Generate content with safety measures
             try:
-                response = model.generate_content(prompt)
+                response = _generate(model, model_name, prompt)
                 if response and hasattr(response, 'text') and response.text.strip():
+                    response_cache.set(cache_key, response.text)
                     return response.text
                 else:
                     print("Empty response from Gemini API. Using fallback analysis.")
@@ -408,23 +574,8 @@ def get_personalized_recommendations(vitals_data):
         # Print vitals data for debugging
         print(f"Generating recommendations for vitals: {json.dumps(vitals_data)}")
         
-        # Force use of Gemini API by ensuring we have a model
-        available_models = [m.name for m in genai.list_models()]
-        print(f"Available models: {available_models}")
-        
-        # Try to find a suitable model
-        model_name = None
-        for model_option in ["gemini-pro", "gemini-1.0-pro", "gemini-1.5-pro"]:
-            if model_option in str(available_models):
-                model_name = model_option
-                break
-        
-        # If no specific model found, use the first text model available
-        if not model_name:
-            for model in genai.list_models():
-                if "generateContent" in model.supported_generation_methods:
-                    model_name = model.name
-                    break
+        # Resolve the model once and reuse it across requests
+        model_name = resolve_model_name()
         
         # If still no model found, use a default model name
         if not model_name:
@@ -461,6 +612,19 @@ def get_personalized_recommendations(vitals_data):
             if mood < 4:
                 areas_to_improve.append("mood")
         
+        # Serve identical inputs from the response cache. The current time in
+        # the prompt is deliberately left out of the key.
+        cache_key = make_cache_key(
+            "recommendations",
+            vitals=vitals_data,
+            areas=areas_to_improve,
+            model=model_name
+        )
+        cached = response_cache.get(cache_key)
+        if cached:
+            print("Serving recommendations from response cache")
+            return cached
+        
         # Add timestamp to ensure uniqueness in each request
         current_time = datetime.now().isoformat()
         
@@ -506,11 +670,14 @@ def get_personalized_recommendations(vitals_data):
         ]
         
         print("Sending request to Gemini API...")
-        response = model.generate_content(prompt, safety_settings=safety_settings)
+        # The prompt carries the current time, so coalesce on the cache key instead
+        response = _generate(model, model_name, prompt, key=f"gemini:{cache_key}",
+                             safety_settings=safety_settings)
         
         # Ensure we have a valid response
         if response and hasattr(response, 'text') and response.text:
             print("Received valid response from Gemini API")
+            response_cache.set(cache_key, response.text)
             return response.text
         else:
             print("Empty response from Gemini API")
@@ -518,22 +685,28 @@ def get_personalized_recommendations(vitals_data):
             
     except Exception as e:
         print(f"Error generating recommendations: {str(e)}")
-        # Generate dynamic fallback recommendations instead of static ones
-        fallback_recommendations = [
-            f"Consider aiming for {vitals_data.get('steps', 7000) + 1000} steps tomorrow to improve your activity level",
-            f"Try sleeping {8 if vitals_data.get('sleep_hours', 7) < 7 else 7} hours tonight for better recovery",
-            f"Monitor your heart rate and aim to keep it between {max(60, vitals_data.get('heart_rate', 70) - 5)} and {min(100, vitals_data.get('heart_rate', 70) + 5)} bpm",
-            f"Schedule a 15-minute relaxation break at {datetime.now().hour + 1}:00 to improve your mood",
-            f"Try a new physical activity that you enjoy to increase your daily movement",
-            f"Set a reminder to drink water every {max(1, vitals_data.get('heart_rate', 70) // 20)} hours to stay hydrated",
-            f"Consider a {10 if vitals_data.get('mood', 3) < 3 else 5}-minute meditation session to improve focus"
-        ]
-        
-        # Select 3 random recommendations to ensure variety
-        import random
-        selected_recommendations = random.sample(fallback_recommendations, min(3, len(fallback_recommendations)))
-        
-        return "<ul>" + "".join([f"<li>{rec}</li>" for rec in selected_recommendations]) + "</ul>"
+        return generate_fallback_recommendations(vitals_data)
+
+def generate_fallback_recommendations(vitals_data):
+    """Generate fallback recommendations when Gemini API is unavailable"""
+    vitals_data = vitals_data if isinstance(vitals_data, dict) else {}
+    
+    # Generate dynamic fallback recommendations instead of static ones
+    fallback_recommendations = [
+        f"Consider aiming for {vitals_data.get('steps', 7000) + 1000} steps tomorrow to improve your activity level",
+        f"Try sleeping {8 if vitals_data.get('sleep_hours', 7) < 7 else 7} hours tonight for better recovery",
+        f"Monitor your heart rate and aim to keep it between {max(60, vitals_data.get('heart_rate', 70) - 5)} and {min(100, vitals_data.get('heart_rate', 70) + 5)} bpm",
+        f"Schedule a 15-minute relaxation break at {datetime.now().hour + 1}:00 to improve your mood",
+        f"Try a new physical activity that you enjoy to increase your daily movement",
+        f"Set a reminder to drink water every {max(1, vitals_data.get('heart_rate', 70) // 20)} hours to stay hydrated",
+        f"Consider a {10 if vitals_data.get('mood', 3) < 3 else 5}-minute meditation session to improve focus"
+    ]
+    
+    # Select 3 random recommendations to ensure variety
+    import random
+    selected_recommendations = random.sample(fallback_recommendations, min(3, len(fallback_recommendations)))
+    
+    return "<ul>" + "".join([f"<li>{rec}</li>" for rec in selected_recommendations]) + "</ul>"
 
 def get_chatbot_response(user_question, health_data=None, recent_data=None):
     """
@@ -583,7 +756,7 @@ def get_chatbot_response(user_question, health_data=None, recent_data=None):
         model = genai.GenerativeModel("gemini-pro")
         
         # Generate content with minimal parameters for reliability
-        response = model.generate_content(prompt)
+        response = _generate(model, "gemini-pro", prompt)
         
         # Return the response text
         if response and hasattr(response, 'text') and response.text:
@@ -598,7 +771,7 @@ def get_chatbot_response(user_question, health_data=None, recent_data=None):
         try:
             model = genai.GenerativeModel("gemini-pro")
             simple_prompt = f"Answer this health question briefly: {user_question}"
-            response = model.generate_content(simple_prompt)
+            response = _generate(model, "gemini-pro", simple_prompt)
             if response and hasattr(response, 'text') and response.text:
                 return response.text
         except Exception as fallback_error:
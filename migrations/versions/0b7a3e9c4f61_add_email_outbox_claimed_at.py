@@ -0,0 +1,31 @@
+"""add email_outbox.claimed_at delivery lease
+
+Revision ID: 0b7a3e9c4f61
+Revises: f5c0e6a93d48
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b7a3e9c4f61'
+down_revision = 'f5c0e6a93d48'
+branch_labels = None
+depends_on = None
+
+
+def _existing_columns():
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns('email_outbox')}
+
+
+def upgrade():
+    if 'claimed_at' not in _existing_columns():
+        op.add_column('email_outbox', sa.Column('claimed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    if 'claimed_at' in _existing_columns():
+        with op.batch_alter_table('email_outbox') as batch_op:
+            batch_op.drop_column('claimed_at')
@@ -0,0 +1,62 @@
+"""baseline: users and vitals_data as they existed before migrations
+
+Revision ID: 1d9e0c7a5b42
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1d9e0c7a5b42'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _existing_tables():
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade():
+    # Databases created by db.create_all() before migrations were introduced
+    # already have these tables; stamp over them instead of failing.
+    existing = _existing_tables()
+    if 'users' not in existing:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('username', sa.String(length=64), nullable=True),
+            sa.Column('email', sa.String(length=120), nullable=True),
+            sa.Column('password_hash', sa.String(length=128), nullable=True),
+            sa.Column('name', sa.String(length=64), nullable=True),
+            sa.Column('phone', sa.String(length=20), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_users_username', 'users', ['username'], unique=True)
+        op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    if 'vitals_data' not in existing:
+        op.create_table(
+            'vitals_data',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column('heart_rate', sa.Integer(), nullable=True),
+            sa.Column('sleep_hours', sa.Float(), nullable=True),
+            sa.Column('steps', sa.Integer(), nullable=True),
+            sa.Column('mood', sa.Integer(), nullable=True),
+            sa.Column('stress_level', sa.Integer(), nullable=True),
+            sa.Column('date', sa.Date(), nullable=True),
+            sa.Column('timestamp', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade():
+    op.drop_table('vitals_data')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_index('ix_users_username', table_name='users')
+    op.drop_table('users')
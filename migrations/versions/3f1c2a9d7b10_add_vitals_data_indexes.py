@@ -0,0 +1,42 @@
+"""add vitals_data indexes for date-cutoff reads
+
+Revision ID: 3f1c2a9d7b10
+Revises: 1d9e0c7a5b42
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d7b10'
+down_revision = '1d9e0c7a5b42'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'ix_vitals_data_date_id': ['date', 'id'],
+    'ix_vitals_data_user_date_id': ['user_id', 'date', 'id'],
+}
+
+
+def _existing_indexes():
+    inspector = sa.inspect(op.get_bind())
+    return {index['name'] for index in inspector.get_indexes('vitals_data')}
+
+
+def upgrade():
+    # db.create_all() already builds these indexes on databases it created;
+    # only add the ones that are missing.
+    existing = _existing_indexes()
+    for name, columns in INDEXES.items():
+        if name not in existing:
+            op.create_index(name, 'vitals_data', columns, unique=False)
+
+
+def downgrade():
+    existing = _existing_indexes()
+    for name in INDEXES:
+        if name in existing:
+            op.drop_index(name, table_name='vitals_data')
@@ -0,0 +1,52 @@
+"""unique (user_id, timestamp) on vitals_data for idempotent ingestion
+
+Revision ID: 8b4e6d21c5a3
+Revises: 3f1c2a9d7b10
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4e6d21c5a3'
+down_revision = '3f1c2a9d7b10'
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = 'ux_vitals_data_user_timestamp'
+
+
+def _existing_indexes():
+    inspector = sa.inspect(op.get_bind())
+    return {index['name'] for index in inspector.get_indexes('vitals_data')}
+
+
+def _delete_duplicates():
+    """
+    Keep only the newest row (max id) of each (user_id, timestamp); the form
+    path never prevented duplicates. Rows with a NULL key are never duplicates
+    under a unique index, so they are left alone.
+    """
+    result = op.get_bind().execute(sa.text(
+        "DELETE FROM vitals_data "
+        "WHERE user_id IS NOT NULL AND timestamp IS NOT NULL AND id NOT IN ("
+        # Derived table so MySQL accepts a subquery on the table being deleted from
+        "SELECT id FROM (SELECT MAX(id) AS id FROM vitals_data "
+        "WHERE user_id IS NOT NULL AND timestamp IS NOT NULL "
+        "GROUP BY user_id, timestamp) AS newest)"
+    ))
+    if result.rowcount:
+        print(f"Deleted {result.rowcount} duplicate vitals rows; run 'flask backfill-rollups' to refresh rollups")
+
+
+def upgrade():
+    if INDEX_NAME not in _existing_indexes():
+        _delete_duplicates()
+        op.create_index(INDEX_NAME, 'vitals_data', ['user_id', 'timestamp'], unique=True)
+
+
+def downgrade():
+    if INDEX_NAME in _existing_indexes():
+        op.drop_index(INDEX_NAME, table_name='vitals_data')
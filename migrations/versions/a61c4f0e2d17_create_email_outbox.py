@@ -0,0 +1,44 @@
+"""create email_outbox for the background email workers
+
+Revision ID: a61c4f0e2d17
+Revises: 8b4e6d21c5a3
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a61c4f0e2d17'
+down_revision = '8b4e6d21c5a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() may already have built it
+    if 'email_outbox' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'email_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('to_email', sa.String(length=120), nullable=False),
+        sa.Column('subject', sa.String(length=255), nullable=False),
+        sa.Column('html_content', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_email_outbox_status', 'email_outbox', ['status'], unique=False)
+    op.create_index('ix_email_outbox_next_attempt_at', 'email_outbox', ['next_attempt_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_email_outbox_next_attempt_at', table_name='email_outbox')
+    op.drop_index('ix_email_outbox_status', table_name='email_outbox')
+    op.drop_table('email_outbox')
@@ -0,0 +1,38 @@
+"""create calorie_jobs for background calorie_check analysis
+
+Revision ID: c2e87b3d9a10
+Revises: a61c4f0e2d17
+Create Date: 2026-10-18 12:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2e87b3d9a10'
+down_revision = 'a61c4f0e2d17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() may already have built it
+    if 'calorie_jobs' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'calorie_jobs',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=True),
+        sa.Column('stage', sa.String(length=32), nullable=True),
+        sa.Column('stages', sa.Text(), nullable=True),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('calorie_jobs')
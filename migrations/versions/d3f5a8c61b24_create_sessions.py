@@ -0,0 +1,35 @@
+"""create sessions for the SQLite server-side session store
+
+Revision ID: d3f5a8c61b24
+Revises: c2e87b3d9a10
+Create Date: 2026-10-18 12:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f5a8c61b24'
+down_revision = 'c2e87b3d9a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Same schema SQLiteSessionStore creates when it owns its own file
+    if 'sessions' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'sessions',
+        sa.Column('sid', sa.Text(), nullable=False),
+        sa.Column('data', sa.Text(), nullable=False),
+        sa.Column('expires_at', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('sid')
+    )
+    op.create_index('ix_sessions_expires_at', 'sessions', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_sessions_expires_at', table_name='sessions')
+    op.drop_table('sessions')
@@ -0,0 +1,40 @@
+"""create latest_vitals_snapshots for write-time alert evaluation
+
+Revision ID: e4b9d2f07c35
+Revises: d3f5a8c61b24
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b9d2f07c35'
+down_revision = 'd3f5a8c61b24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() may already have built it
+    if 'latest_vitals_snapshots' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'latest_vitals_snapshots',
+        sa.Column('user_key', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('vitals_id', sa.Integer(), nullable=True),
+        sa.Column('vitals_date', sa.Date(), nullable=True),
+        sa.Column('vitals', sa.Text(), nullable=False),
+        sa.Column('alerts', sa.Text(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['vitals_id'], ['vitals_data.id']),
+        sa.PrimaryKeyConstraint('user_key')
+    )
+    op.create_index('ix_latest_vitals_snapshots_updated_at', 'latest_vitals_snapshots',
+                    ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_latest_vitals_snapshots_updated_at', table_name='latest_vitals_snapshots')
+    op.drop_table('latest_vitals_snapshots')
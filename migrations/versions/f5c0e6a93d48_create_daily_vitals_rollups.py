@@ -0,0 +1,46 @@
+"""create daily_vitals_rollups for the leaderboard and daily aggregates
+
+Run 'flask backfill-rollups' afterwards to fill it from existing vitals.
+
+Revision ID: f5c0e6a93d48
+Revises: e4b9d2f07c35
+Create Date: 2026-10-18 12:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5c0e6a93d48'
+down_revision = 'e4b9d2f07c35'
+branch_labels = None
+depends_on = None
+
+METRICS = ['heart_rate', 'sleep_hours', 'steps', 'mood']
+
+
+def upgrade():
+    # db.create_all() may already have built it
+    if 'daily_vitals_rollups' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    metric_columns = [
+        sa.Column(f'{metric}_{part}', sa.Float(), nullable=True)
+        for metric in METRICS for part in ('min', 'max', 'sum', 'last')
+    ]
+    op.create_table(
+        'daily_vitals_rollups',
+        sa.Column('user_key', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=True),
+        sa.Column('last_timestamp', sa.DateTime(), nullable=True),
+        *metric_columns,
+        sa.PrimaryKeyConstraint('user_key', 'day')
+    )
+    op.create_index('ix_daily_rollup_day_steps', 'daily_vitals_rollups',
+                    ['day', 'steps_max', 'user_key'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_daily_rollup_day_steps', table_name='daily_vitals_rollups')
+    op.drop_table('daily_vitals_rollups')
@@ -1,12 +1,19 @@
 import os
+import re
 import datetime
 import json
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from sklearn.ensemble import IsolationForest
 import numpy as np
 import pandas as pd
+import joblib
+from app.alerts import build_alerts, publish_vitals_alerts
 
 # Initialize SQLAlchemy
 db = SQLAlchemy()
@@ -15,6 +22,11 @@ db = SQLAlchemy()
 DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'vitals.json')
 os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
 
+# Fitted anomaly models are persisted here and kept in a bounded in-memory LRU
+MODEL_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'models')
+MODEL_STORE_SIZE = int(os.getenv('ANOMALY_MODEL_CACHE_SIZE', '128'))
+MODEL_MAX_AGE = int(os.getenv('ANOMALY_MODEL_MAX_AGE', '86400'))
+
 # User model for authentication
 class User(db.Model, UserMixin):
     __tablename__ = 'users'
@@ -42,6 +54,13 @@ class User(db.Model, UserMixin):
 # Vitals data model
 class VitalsData(db.Model):
     __tablename__ = 'vitals_data'
+    # Every read filters on a date cutoff (optionally per user) and orders by date
+    __table_args__ = (
+        db.Index('ix_vitals_data_date_id', 'date', 'id'),
+        db.Index('ix_vitals_data_user_date_id', 'user_id', 'date', 'id'),
+        # Idempotency key for bulk ingestion (re-sent samples are skipped)
+        db.Index('ux_vitals_data_user_timestamp', 'user_id', 'timestamp', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
@@ -107,6 +126,8 @@ def save_vitals(vitals_data):
         vitals.user_id = user.id
     
     db.session.add(vitals)
+    # Keep the daily rollup in step with the raw row, in the same transaction
+    update_daily_rollup(vitals)
     db.session.commit()
     
     # Return the data in the expected format for compatibility
@@ -116,37 +137,587 @@ def save_vitals(vitals_data):
         result['email'] = user.email
         result['phone'] = user.phone
     
+    # Evaluate alert rules once, at write time, and push them to connected dashboards
+    alerts = build_alerts(result)
+    update_latest_snapshot(result, alerts)
+    publish_vitals_alerts(result, alerts)
+    
     return result
 
-def get_recent_vitals(days=7, user_id=None):
-    """Get recent vitals data from database"""
+def update_daily_rollup(vitals):
+    """Fold a new VitalsData row into its user's rollup for that day (caller commits)"""
+    delta = DailyVitalsRollup(user_key=vitals.user_id or 0, day=vitals.date)
+    delta.add_sample({metric: getattr(vitals, metric) for metric in ROLLUP_METRICS}, vitals.timestamp)
+    merge_daily_rollup(delta)
+
+def _rollup_insert():
+    """The dialect's INSERT with ON CONFLICT support, or None"""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert
+
+def merge_daily_rollup(delta):
+    """
+    Add the aggregates of delta, a DailyVitalsRollup that is not in the
+    session, to the stored rollup for its user and day (caller commits).
+
+    This is one INSERT ... ON CONFLICT DO UPDATE that does the arithmetic in
+    SQL (count = count + n, sum = sum + s, ...), so concurrent writers for
+    the same user and day neither collide on the insert nor lose an update.
+    """
+    table = DailyVitalsRollup.__table__
+    values = {column.name: getattr(delta, column.name) for column in table.columns}
+    values['count'] = delta.count or 0
+    for metric in ROLLUP_METRICS:
+        values[f'{metric}_sum'] = values[f'{metric}_sum'] or 0
+    insert = _rollup_insert()
+    if insert is None:
+        # No upsert in this dialect: lock the row for the read-modify-write
+        rollup = (DailyVitalsRollup.query.filter_by(user_key=delta.user_key, day=delta.day)
+                  .with_for_update().first())
+        if rollup is None:
+            db.session.add(delta)
+        else:
+            rollup.merge(delta)
+        return
+    
+    stmt = insert(table).values(**values)
+    new, old = stmt.excluded, table.c
+    newer = db.or_(old.last_timestamp.is_(None), new.last_timestamp.is_(None),
+                   new.last_timestamp >= old.last_timestamp)
+    
+    def pick(prefer_new, column):
+        return db.case((db.and_(prefer_new, new[column].isnot(None)), new[column]), else_=old[column])
+    
+    updates = {
+        'count': db.func.coalesce(old['count'], 0) + new['count'],
+        'last_timestamp': pick(newer, 'last_timestamp'),
+    }
+    for metric in ROLLUP_METRICS:
+        low, high, total, last = (f'{metric}_min', f'{metric}_max', f'{metric}_sum', f'{metric}_last')
+        updates[low] = pick(db.or_(old[low].is_(None), new[low] < old[low]), low)
+        updates[high] = pick(db.or_(old[high].is_(None), new[high] > old[high]), high)
+        updates[total] = db.func.coalesce(old[total], 0) + db.func.coalesce(new[total], 0)
+        updates[last] = pick(newer, last)
+    db.session.execute(stmt.on_conflict_do_update(index_elements=['user_key', 'day'], set_=updates))
+
+def get_daily_rollups(days=30, user_id=None):
+    """Read per-day aggregates for a date range from the rollup table"""
+    cutoff_date = (datetime.datetime.now() - datetime.timedelta(days=days)).date()
+    query = DailyVitalsRollup.query.filter(DailyVitalsRollup.day >= cutoff_date)
+    if user_id:
+        query = query.filter(DailyVitalsRollup.user_key == user_id)
+    return [rollup.to_dict() for rollup in query.order_by(DailyVitalsRollup.day)]
+
+def steps_leaderboard_query(days=30, limit=10):
+    """Build the top-N query used by get_steps_leaderboard (not executed)"""
+    cutoff_date = (datetime.datetime.now() - datetime.timedelta(days=days)).date()
+    return (db.session.query(DailyVitalsRollup.day, DailyVitalsRollup.steps_max)
+            .filter(DailyVitalsRollup.day >= cutoff_date, DailyVitalsRollup.steps_max.isnot(None))
+            .order_by(DailyVitalsRollup.steps_max.desc())
+            .limit(limit))
+
+def get_steps_leaderboard(days=30, limit=10):
+    """Top days by step count, as a single top-N query on the rollup table"""
+    rows = steps_leaderboard_query(days=days, limit=limit).all()
+    return [{"date": day.strftime('%Y-%m-%d'), "steps": int(steps)} for day, steps in rows]
+
+def backfill_daily_rollups(batch_size=1000):
+    """
+    Rebuild the rollup table from raw vitals in one streaming pass.
+    Rows are read in (user, day, timestamp) order so memory stays constant.
+    Returns the number of rollup rows written.
+    """
+    DailyVitalsRollup.query.delete()
+    db.session.commit()
+    
+    query = (db.session.query(VitalsData.user_id, VitalsData.date, VitalsData.timestamp,
+                              *[getattr(VitalsData, metric) for metric in ROLLUP_METRICS])
+             .filter(VitalsData.date.isnot(None))
+             .order_by(VitalsData.user_id, VitalsData.date, VitalsData.timestamp, VitalsData.id)
+             .yield_per(batch_size))
+    
+    written = 0
+    pending = []
+    current = None
+    for row in query:
+        user_key = row.user_id or 0
+        if current is None or (current.user_key, current.day) != (user_key, row.date):
+            current = DailyVitalsRollup(user_key=user_key, day=row.date)
+            pending.append(current)
+            if len(pending) >= batch_size:
+                # Flush the finished groups (the last one is still being filled)
+                # without committing, so the streaming cursor stays open
+                finished = pending[:-1]
+                db.session.add_all(finished)
+                db.session.flush()
+                for rollup in finished:
+                    db.session.expunge(rollup)
+                written += len(finished)
+                pending = pending[-1:]
+        current.add_sample({metric: getattr(row, metric) for metric in ROLLUP_METRICS}, row.timestamp)
+    
+    db.session.add_all(pending)
+    db.session.commit()
+    return written + len(pending)
+
+def update_latest_snapshot(vitals, alerts):
+    """Store the latest vitals entry for its user together with its alerts"""
+    user_key = vitals.get('user_id') or 0
+    snapshot = LatestVitalsSnapshot.query.get(user_key)
+    if snapshot is None:
+        snapshot = LatestVitalsSnapshot(user_key=user_key)
+        db.session.add(snapshot)
+    snapshot.vitals_id = vitals.get('id')
+    snapshot.vitals_date = datetime.datetime.strptime(vitals['date'], '%Y-%m-%d').date() if vitals.get('date') else None
+    snapshot.vitals = json.dumps(vitals)
+    snapshot.alerts = json.dumps(alerts)
+    snapshot.updated_at = datetime.datetime.utcnow()
+    db.session.commit()
+
+def get_latest_alerts(days=7):
+    """
+    Alerts for the most recently saved vitals entry, read from the snapshot table.
+    Falls back to evaluating the rules on recent vitals when no snapshot exists yet.
+    """
+    snapshot = LatestVitalsSnapshot.query.order_by(LatestVitalsSnapshot.updated_at.desc()).first()
+    if snapshot is None:
+        recent_data = get_recent_vitals(days=days)
+        return build_alerts(recent_data[-1] if recent_data else {})
+    
+    cutoff_date = (datetime.datetime.now() - datetime.timedelta(days=days)).date()
+    if snapshot.vitals_date and snapshot.vitals_date < cutoff_date:
+        return []
+    return json.loads(snapshot.alerts)
+
+# Metrics aggregated in the daily rollup table
+ROLLUP_METRICS = ['heart_rate', 'sleep_hours', 'steps', 'mood']
+
+# Per-user, per-day aggregates maintained incrementally by save_vitals
+class DailyVitalsRollup(db.Model):
+    __tablename__ = 'daily_vitals_rollups'
+    # Covers the leaderboard's date-range top-N without touching raw rows
+    __table_args__ = (db.Index('ix_daily_rollup_day_steps', 'day', 'steps_max', 'user_key'),)
+    
+    user_key = db.Column(db.Integer, primary_key=True)  # users.id, or 0 for anonymous entries
+    day = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, default=0)
+    last_timestamp = db.Column(db.DateTime)
+    heart_rate_min = db.Column(db.Float)
+    heart_rate_max = db.Column(db.Float)
+    heart_rate_sum = db.Column(db.Float, default=0)
+    heart_rate_last = db.Column(db.Float)
+    sleep_hours_min = db.Column(db.Float)
+    sleep_hours_max = db.Column(db.Float)
+    sleep_hours_sum = db.Column(db.Float, default=0)
+    sleep_hours_last = db.Column(db.Float)
+    steps_min = db.Column(db.Float)
+    steps_max = db.Column(db.Float)
+    steps_sum = db.Column(db.Float, default=0)
+    steps_last = db.Column(db.Float)
+    mood_min = db.Column(db.Float)
+    mood_max = db.Column(db.Float)
+    mood_sum = db.Column(db.Float, default=0)
+    mood_last = db.Column(db.Float)
+    
+    def add_sample(self, sample, timestamp=None):
+        """Fold one vitals entry into the aggregates"""
+        self.count = (self.count or 0) + 1
+        is_latest = self.last_timestamp is None or timestamp is None or timestamp >= self.last_timestamp
+        for metric in ROLLUP_METRICS:
+            value = sample.get(metric)
+            if value is None:
+                continue
+            value = float(value)
+            current_min = getattr(self, f'{metric}_min')
+            current_max = getattr(self, f'{metric}_max')
+            setattr(self, f'{metric}_min', value if current_min is None else min(current_min, value))
+            setattr(self, f'{metric}_max', value if current_max is None else max(current_max, value))
+            setattr(self, f'{metric}_sum', (getattr(self, f'{metric}_sum') or 0) + value)
+            if is_latest:
+                setattr(self, f'{metric}_last', value)
+        if is_latest and timestamp is not None:
+            self.last_timestamp = timestamp
+    
+    def merge(self, other):
+        """Fold another rollup of the same user and day into this one"""
+        newer = (self.last_timestamp is None or other.last_timestamp is None
+                 or other.last_timestamp >= self.last_timestamp)
+        self.count = (self.count or 0) + (other.count or 0)
+        for metric in ROLLUP_METRICS:
+            low, high = getattr(other, f'{metric}_min'), getattr(other, f'{metric}_max')
+            if low is not None:
+                current = getattr(self, f'{metric}_min')
+                setattr(self, f'{metric}_min', low if current is None else min(current, low))
+            if high is not None:
+                current = getattr(self, f'{metric}_max')
+                setattr(self, f'{metric}_max', high if current is None else max(current, high))
+            setattr(self, f'{metric}_sum', (getattr(self, f'{metric}_sum') or 0) + (getattr(other, f'{metric}_sum') or 0))
+            if newer and getattr(other, f'{metric}_last') is not None:
+                setattr(self, f'{metric}_last', getattr(other, f'{metric}_last'))
+        if newer and other.last_timestamp is not None:
+            self.last_timestamp = other.last_timestamp
+    
+    def to_dict(self):
+        data = {
+            'user_id': self.user_key or None,
+            'date': self.day.strftime('%Y-%m-%d') if self.day else None,
+            'count': self.count
+        }
+        for metric in ROLLUP_METRICS:
+            total = getattr(self, f'{metric}_sum')
+            data[metric] = {
+                'min': getattr(self, f'{metric}_min'),
+                'max': getattr(self, f'{metric}_max'),
+                'mean': total / self.count if self.count and total is not None else None,
+                'last': getattr(self, f'{metric}_last')
+            }
+        return data
+
+# Latest vitals per user with the alerts evaluated when they were saved
+class LatestVitalsSnapshot(db.Model):
+    __tablename__ = 'latest_vitals_snapshots'
+    
+    user_key = db.Column(db.Integer, primary_key=True)  # users.id, or 0 for anonymous entries
+    vitals_id = db.Column(db.Integer, db.ForeignKey('vitals_data.id'))
+    vitals_date = db.Column(db.Date)
+    vitals = db.Column(db.Text, nullable=False)  # JSON, same shape as save_vitals() result
+    alerts = db.Column(db.Text, nullable=False, default='[]')  # JSON list of alerts
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<LatestVitalsSnapshot user {self.user_key} vitals {self.vitals_id}>'
+
+# Outbox for emails delivered by the background workers in email_service
+class EmailOutbox(db.Model):
+    __tablename__ = 'email_outbox'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    html_content = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(16), default='pending', index=True)  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, index=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)  # start of the current 'sending' lease
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<EmailOutbox {self.id} to {self.to_email} ({self.status})>'
+
+# Background calorie_check analysis jobs and their stored results
+class CalorieJob(db.Model):
+    __tablename__ = 'calorie_jobs'
+    
+    id = db.Column(db.String(32), primary_key=True)
+    status = db.Column(db.String(16), default='queued')  # queued, running, done, failed
+    stage = db.Column(db.String(32), nullable=True)
+    stages = db.Column(db.Text, default='{}')  # JSON: stage name -> pending/running/done/skipped
+    result = db.Column(db.Text, nullable=True)  # JSON of the template variables
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    
+    def to_dict(self, include_result=True):
+        data = {
+            'id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'stages': json.loads(self.stages or '{}'),
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+        if include_result:
+            data['result'] = json.loads(self.result) if self.result else None
+        return data
+
+def _vitals_row_to_dict(row):
+    """Build the to_dict() shape (plus user info, when selected) from a projected vitals row"""
+    vital = {
+        'id': row.id,
+        'user_id': row.user_id,
+        'heart_rate': row.heart_rate,
+        'sleep_hours': row.sleep_hours,
+        'steps': row.steps,
+        'mood': row.mood,
+        'stress_level': row.stress_level,
+        'date': row.date.strftime('%Y-%m-%d') if row.date else None,
+        'timestamp': row.timestamp.isoformat() if row.timestamp else None
+    }
+    
+    # Add user info only when the join found a user
+    if row.user_id and getattr(row, 'user_pk', None) is not None:
+        vital['name'] = row.user_name
+        vital['email'] = row.user_email
+        vital['phone'] = row.user_phone
+    
+    return vital
+
+def _vitals_columns():
+    """The VitalsData columns behind to_dict()"""
+    return (
+        VitalsData.id,
+        VitalsData.user_id,
+        VitalsData.heart_rate,
+        VitalsData.sleep_hours,
+        VitalsData.steps,
+        VitalsData.mood,
+        VitalsData.stress_level,
+        VitalsData.date,
+        VitalsData.timestamp
+    )
+
+def _vitals_projection_query():
+    """Vitals columns outer-joined with the owning user's name/email/phone"""
+    return db.session.query(
+        *_vitals_columns(),
+        User.id.label('user_pk'),
+        User.name.label('user_name'),
+        User.email.label('user_email'),
+        User.phone.label('user_phone')
+    ).outerjoin(User, VitalsData.user_id == User.id)
+
+def recent_vitals_query(days=7, user_id=None):
+    """Build the projection query used by query_recent_vitals_rows (not executed)"""
     cutoff_date = (datetime.datetime.now() - datetime.timedelta(days=days)).date()
     
-    query = VitalsData.query.filter(VitalsData.date >= cutoff_date)
+    query = _vitals_projection_query().filter(VitalsData.date >= cutoff_date)
     
     # Filter by user if specified
     if user_id:
-        query = query.filter_by(user_id=user_id)
+        query = query.filter(VitalsData.user_id == user_id)
     
     # Order by date
-    query = query.order_by(VitalsData.date)
+    return query.order_by(VitalsData.date)
+
+def query_recent_vitals_rows(days=7, user_id=None):
+    """
+    Fetch recent vitals joined with user name/email/phone in a single statement.
+    
+    Only the columns needed by to_dict() are selected, so the result is a list of
+    plain row tuples rather than ORM instances (no identity-map hydration).
+    """
+    return recent_vitals_query(days=days, user_id=user_id).all()
+
+def iter_vitals_history(user_id=None, start_date=None, end_date=None, batch_size=1000):
+    """
+    Yield vitals dicts in (date, id) order, fetching batch_size rows at a time,
+    so memory stays constant however long the history is. The rows carry no
+    user contact fields (name, email, phone).
+    """
+    query = db.session.query(*_vitals_columns()).filter(VitalsData.date.isnot(None))
+    if user_id:
+        query = query.filter(VitalsData.user_id == user_id)
+    if start_date:
+        query = query.filter(VitalsData.date >= start_date)
+    if end_date:
+        query = query.filter(VitalsData.date <= end_date)
+    for row in query.order_by(VitalsData.date, VitalsData.id).yield_per(batch_size):
+        yield _vitals_row_to_dict(row)
+
+def get_vitals_page(user_id=None, after=None, limit=100):
+    """
+    One page of vitals in (date, id) order using keyset pagination. The rows
+    carry no user contact fields (name, email, phone).
+    
+    Args:
+        after: (date, id) of the last row of the previous page, or None
+    
+    Returns:
+        tuple: (list of vitals dicts, (date, id) of the last row or None when done)
+    """
+    query = db.session.query(*_vitals_columns()).filter(VitalsData.date.isnot(None))
+    if user_id:
+        query = query.filter(VitalsData.user_id == user_id)
+    if after:
+        after_date, after_id = after
+        query = query.filter(db.or_(VitalsData.date > after_date,
+                                    db.and_(VitalsData.date == after_date, VitalsData.id > after_id)))
+    # One extra row tells whether another page exists
+    rows = query.order_by(VitalsData.date, VitalsData.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_key = (rows[-1].date, rows[-1].id) if has_more else None
+    return [_vitals_row_to_dict(row) for row in rows], next_key
+
+def explain_query(query):
+    """Return the database's query plan for a SQLAlchemy query as a list of lines"""
+    dialect = db.engine.dialect.name
+    statement = str(query.statement.compile(dialect=db.engine.dialect,
+                                            compile_kwargs={"literal_binds": True}))
+    prefix = 'EXPLAIN QUERY PLAN ' if dialect == 'sqlite' else 'EXPLAIN '
+    rows = db.session.execute(db.text(prefix + statement)).fetchall()
+    return [' | '.join(str(col) for col in row) for row in rows]
+
+def _plan_problems(plan, table, index):
+    """Why a query plan is not the expected index read on table (empty when it is)"""
+    problems = []
+    text = '\n'.join(plan)
+    if index not in text:
+        problems.append(f"does not use {index}")
+    for line in plan:
+        # SQLite: "SCAN vitals_data" without an index; PostgreSQL: "Seq Scan on vitals_data"
+        if re.search(rf'\bSCAN {table}\b(?! USING)', line) or f'Seq Scan on {table}' in line:
+            problems.append(f"full scan of {table}: {line.strip()}")
+    return problems
+
+def check_vitals_query_plans(days=7, user_id=1):
+    """
+    EXPLAIN the hot read queries and check each one reads through its index.
+    
+    Returns:
+        list: (label, plan lines, problems) per query; problems is empty when
+        the plan uses the expected index and no full table scan
+    """
+    checks = [
+        ('recent vitals, all users', recent_vitals_query(days=days),
+         'vitals_data', 'ix_vitals_data_date_id'),
+        (f'recent vitals, user {user_id}', recent_vitals_query(days=days, user_id=user_id),
+         'vitals_data', 'ix_vitals_data_user_date_id'),
+        ('steps leaderboard', steps_leaderboard_query(days=days),
+         'daily_vitals_rollups', 'ix_daily_rollup_day_steps'),
+    ]
+    results = []
+    for label, query, table, index in checks:
+        plan = explain_query(query)
+        results.append((label, plan, _plan_problems(plan, table, index)))
+    return results
+
+def generate_synthetic_vitals(rows, users=100, days=365, batch_size=10000):
+    """
+    Insert random vitals rows for load testing; returns the number written.
+    
+    The user ids are not backed by users rows, so run this against a scratch database.
+    """
+    rng = np.random.default_rng()
+    now = datetime.datetime.now()
+    written = 0
+    while written < rows:
+        n = min(batch_size, rows - written)
+        # Sub-second offsets keep (user_id, timestamp) unique
+        offsets = rng.uniform(0, days * 86400, n)
+        user_ids = rng.integers(1, users + 1, n)
+        db.session.execute(VitalsData.__table__.insert(), [{
+            'user_id': int(user_ids[i]),
+            'heart_rate': int(rng.integers(50, 120)),
+            'sleep_hours': round(float(rng.uniform(4, 10)), 1),
+            'steps': int(rng.integers(0, 20000)),
+            'mood': int(rng.integers(1, 6)),
+            'date': (now - datetime.timedelta(seconds=float(offsets[i]))).date(),
+            'timestamp': now - datetime.timedelta(seconds=float(offsets[i]))
+        } for i in range(n)])
+        db.session.commit()
+        written += n
+    return written
+
+def get_recent_vitals(days=7, user_id=None):
+    """Get recent vitals data from database"""
+    # One joined, projection-only query instead of a User lookup per row
+    return [_vitals_row_to_dict(row) for row in query_recent_vitals_rows(days=days, user_id=user_id)]
+
+class AnomalyModelStore:
+    """
+    Per-user cache of fitted IsolationForest models keyed by a fingerprint of
+    the training window. Models live in an LRU-bounded dict and on disk so a
+    refit only happens when the data changes or the model is too old.
+    """
+    
+    def __init__(self, store_dir=MODEL_STORE_DIR, max_size=MODEL_STORE_SIZE, max_age=MODEL_MAX_AGE):
+        self.store_dir = store_dir
+        self.max_size = max_size
+        self.max_age = max_age
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'fits': 0, 'predicts': 0, 'memory_hits': 0, 'disk_hits': 0,
+                      'fit_seconds': 0.0, 'predict_seconds': 0.0}
+    
+    @staticmethod
+    def fingerprint(X):
+        return hashlib.sha256(np.ascontiguousarray(X, dtype=np.float64).tobytes()).hexdigest()
     
-    # Convert to list of dictionaries
-    vitals_list = [v.to_dict() for v in query.all()]
+    def _path(self, user_key):
+        return os.path.join(self.store_dir, f'isoforest_{user_key}.joblib')
     
-    # Add user info to each record
-    for vital in vitals_list:
-        if vital['user_id']:
-            user = User.query.get(vital['user_id'])
-            if user:
-                vital['name'] = user.name
-                vital['email'] = user.email
-                if hasattr(user, 'phone'):
-                    vital['phone'] = user.phone
+    def _is_valid(self, entry, fingerprint):
+        return (entry is not None and entry['fingerprint'] == fingerprint
+                and time.time() - entry['fitted_at'] <= self.max_age)
     
-    return vitals_list
+    def _count(self, **increments):
+        """Add to the stats counters; callers may run in several request threads"""
+        with self._lock:
+            for name, amount in increments.items():
+                self.stats[name] += amount
+    
+    def _remember(self, user_key, entry):
+        with self._lock:
+            self._models[user_key] = entry
+            self._models.move_to_end(user_key)
+            while len(self._models) > self.max_size:
+                self._models.popitem(last=False)
+    
+    def get_model(self, user_key, X):
+        """Return a fitted model for this user's training window, fitting only on a miss"""
+        fingerprint = self.fingerprint(X)
+        
+        with self._lock:
+            entry = self._models.get(user_key)
+            if entry is not None:
+                self._models.move_to_end(user_key)
+        if self._is_valid(entry, fingerprint):
+            self._count(memory_hits=1)
+            return entry['model']
+        
+        # Another worker process may already have fitted this window
+        try:
+            entry = joblib.load(self._path(user_key))
+        except Exception:
+            entry = None
+        if self._is_valid(entry, fingerprint):
+            self._count(disk_hits=1)
+            self._remember(user_key, entry)
+            return entry['model']
+        
+        start = time.perf_counter()
+        model = IsolationForest(contamination=0.1, random_state=42)
+        model.fit(X)
+        self._count(fits=1, fit_seconds=time.perf_counter() - start)
+        
+        entry = {'fingerprint': fingerprint, 'fitted_at': time.time(), 'model': model}
+        self._remember(user_key, entry)
+        try:
+            os.makedirs(self.store_dir, exist_ok=True)
+            tmp_path = f'{self._path(user_key)}.{os.getpid()}.tmp'
+            joblib.dump(entry, tmp_path)
+            os.replace(tmp_path, self._path(user_key))
+        except Exception as e:
+            print(f"Could not persist anomaly model for {user_key}: {str(e)}")
+        
+        return model
+    
+    def predict(self, user_key, X):
+        model = self.get_model(user_key, X)
+        start = time.perf_counter()
+        predictions = model.predict(X)
+        self._count(predicts=1, predict_seconds=time.perf_counter() - start)
+        return predictions
+    
+    def hit_rate(self):
+        with self._lock:
+            hits = self.stats['memory_hits'] + self.stats['disk_hits']
+            total = hits + self.stats['fits']
+        return hits / total if total else 0.0
 
-def analyze_vitals(vitals_data):
+anomaly_model_store = AnomalyModelStore()
+
+def analyze_vitals(vitals_data, user_id=None):
     """Analyze vitals data using machine learning to detect anomalies"""
     if not vitals_data:
         return {"anomalies": []}
@@ -163,12 +734,9 @@ def analyze_vitals(vitals_data):
     
     X = df[features].values
     
-    # Train isolation forest model
-    model = IsolationForest(contamination=0.1, random_state=42)
-    model.fit(X)
-    
-    # Predict anomalies
-    predictions = model.predict(X)
+    # Reuse the isolation forest fitted on this exact window when possible
+    user_key = f'user_{user_id}' if user_id else 'all'
+    predictions = anomaly_model_store.predict(user_key, X)
     anomaly_indices = np.where(predictions == -1)[0]
     
     # Get anomalies
@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+NUTRITION_CACHE_PATH = os.getenv(
+    "NUTRITION_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'nutrition_cache.db')
+)
+NUTRITION_CACHE_TTL = int(os.getenv("NUTRITION_CACHE_TTL", str(30 * 24 * 3600)))
+# Foods that were not found may be added upstream later, so misses expire sooner
+NUTRITION_NEGATIVE_TTL = int(os.getenv("NUTRITION_NEGATIVE_TTL", str(6 * 3600)))
+
+
+def normalize_food_name(food_name):
+    """Canonical cache key for a food name: lowercase, single-spaced"""
+    return ' '.join(str(food_name).lower().split())
+
+
+class NutritionCache:
+    """
+    SQLite cache of nutrition lookups shared by all providers (Nutritionix,
+    USDA, the local CSV/ML path). Each row records the provider, when it was
+    fetched and when it expires; a NULL payload is a cached negative result.
+    """
+
+    def __init__(self, path=NUTRITION_CACHE_PATH, ttl=NUTRITION_CACHE_TTL, negative_ttl=NUTRITION_NEGATIVE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._initialized = False
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "errors": 0, "by_provider": {}}
+
+    def _connect(self):
+        if not self._initialized:
+            # The directory must exist before sqlite can create the file
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5)
+        if not self._initialized:
+            with self._lock:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS nutrition_cache ("
+                    "provider TEXT NOT NULL, query_key TEXT NOT NULL, payload TEXT, "
+                    "fetched_at REAL NOT NULL, expires_at REAL NOT NULL, "
+                    "PRIMARY KEY (provider, query_key))"
+                )
+                conn.commit()
+                self._initialized = True
+        return conn
+
+    def _count(self, provider, outcome):
+        self.stats[outcome] += 1
+        provider_stats = self.stats["by_provider"].setdefault(provider, {"hits": 0, "negative_hits": 0, "misses": 0})
+        provider_stats[outcome] += 1
+
+    def get(self, provider, food_name):
+        """
+        Returns:
+            tuple: (found, value) - value is None for a cached negative result
+        """
+        key = normalize_food_name(food_name)
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT payload FROM nutrition_cache WHERE provider = ? AND query_key = ? AND expires_at > ?",
+                    (provider, key, time.time())
+                ).fetchone()
+        except Exception as e:
+            print(f"[NutritionCache] Read error: {e}")
+            self.stats["errors"] += 1
+            return False, None
+
+        if row is None:
+            self._count(provider, "misses")
+            return False, None
+        if row[0] is None:
+            self._count(provider, "negative_hits")
+            return True, None
+        self._count(provider, "hits")
+        return True, json.loads(row[0])
+
+    def set(self, provider, food_name, value, ttl=None):
+        """Store a result; None is stored as a negative entry with the shorter TTL"""
+        key = normalize_food_name(food_name)
+        now = time.time()
+        if ttl is None:
+            ttl = self.negative_ttl if value is None else self.ttl
+        payload = None if value is None else json.dumps(value, default=float)
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO nutrition_cache (provider, query_key, payload, fetched_at, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (provider, key, payload, now, now + ttl)
+                )
+        except Exception as e:
+            print(f"[NutritionCache] Write error: {e}")
+            self.stats["errors"] += 1
+
+    def hit_rate(self):
+        hits = self.stats["hits"] + self.stats["negative_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+
+nutrition_cache = NutritionCache()
+
+
+def cached_lookup(provider, food_name, fetch):
+    """
+    Serve a provider lookup from the cache, calling fetch(food_name) on a miss.
+
+    fetch returns None only when the provider really has no result; transient
+    failures (timeouts, 5xx, an open circuit) must raise, and are passed on to
+    the caller without being cached.
+    """
+    found, value = nutrition_cache.get(provider, food_name)
+    if found:
+        return value
+    value = fetch(food_name)
+    nutrition_cache.set(provider, food_name, value)
+    return value
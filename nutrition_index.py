@@ -0,0 +1,130 @@
+import os
+import re
+import threading
+from collections import defaultdict
+
+# Path to the bundled nutrition database
+NUTRITION_CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'data', 'food_nutrition.csv')
+
+# CSV columns used for each nutrition field
+NUTRIENT_COLUMNS = {
+    'calories': 'Data.Kilocalories',
+    'protein': 'Data.Protein',
+    'fat': 'Data.Fat.Total Lipid',
+    'carbohydrates': 'Data.Carbohydrate',
+    'fiber': 'Data.Fiber',
+    'sugar': 'Data.Sugar Total'
+}
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _tokenize(text):
+    return _TOKEN_RE.findall(text)
+
+
+class NutritionIndex:
+    """
+    In-memory index over the nutrition CSV, built once per process.
+
+    Lookups keep the original match priority (description substring, then
+    category substring, then the first per-word description match) but use a
+    token inverted index to narrow the candidate rows before the substring
+    check instead of scanning every row.
+    """
+
+    def __init__(self, df):
+        self.descriptions = df['Description'].fillna('').astype(str).str.lower().tolist()
+        self.categories = df['Category'].fillna('').astype(str).str.lower().tolist()
+        self.nutrients = [
+            {field: float(value) for field, value in zip(NUTRIENT_COLUMNS, row)}
+            for row in df[list(NUTRIENT_COLUMNS.values())].fillna(0).itertuples(index=False)
+        ]
+        # Column means, used when the calorie model predicts an unknown food
+        self.averages = {field: float(df[column].mean()) for field, column in NUTRIENT_COLUMNS.items()}
+
+        self._description_postings = self._build_postings(self.descriptions)
+        self._category_postings = self._build_postings(self.categories)
+        self._expansions = {}
+
+    @staticmethod
+    def _build_postings(values):
+        postings = defaultdict(list)
+        for row_id, value in enumerate(values):
+            for token in set(_tokenize(value)):
+                postings[token].append(row_id)
+        return dict(postings)
+
+    def _expand(self, postings, query_token):
+        """Rows containing an indexed token that contains query_token (memoized)"""
+        key = (id(postings), query_token)
+        rows = self._expansions.get(key)
+        if rows is None:
+            rows = set()
+            for token, row_ids in postings.items():
+                if query_token in token:
+                    rows.update(row_ids)
+            rows = frozenset(rows)
+            if len(self._expansions) > 10000:
+                self._expansions.clear()
+            self._expansions[key] = rows
+        return rows
+
+    def _candidates(self, postings, query):
+        """Rows whose tokens contain every query token, or None for a full scan"""
+        query_tokens = set(_tokenize(query))
+        if not query_tokens:
+            return None
+        candidates = None
+        # A query token can only match inside a single indexed token
+        for query_token in sorted(query_tokens, key=len, reverse=True):
+            rows = self._expand(postings, query_token)
+            candidates = rows if candidates is None else candidates & rows
+            if not candidates:
+                return []
+        return sorted(candidates)
+
+    def _first_match(self, values, postings, query):
+        candidates = self._candidates(postings, query)
+        if candidates is None:
+            candidates = range(len(values))
+        for row_id in candidates:
+            if query in values[row_id]:
+                return row_id
+        return None
+
+    def lookup(self, food_item):
+        """Return the nutrient dict of the best matching row, or None"""
+        query = food_item.lower()
+
+        row_id = self._first_match(self.descriptions, self._description_postings, query)
+        if row_id is None:
+            row_id = self._first_match(self.categories, self._category_postings, query)
+        if row_id is None and ' ' in query:
+            for word in query.split():
+                if len(word) > 3:
+                    row_id = self._first_match(self.descriptions, self._description_postings, word)
+                    if row_id is not None:
+                        break
+
+        if row_id is None:
+            return None
+        return dict(self.nutrients[row_id])
+
+
+def get_nutrition_index(csv_path=NUTRITION_CSV_PATH):
+    """Load the shared nutrition index on first use; None if the CSV is missing"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                if not os.path.exists(csv_path):
+                    print(f"CSV file not found at: {csv_path}")
+                    return None
+                import pandas as pd
+                _index = NutritionIndex(pd.read_csv(csv_path))
+                print(f"Nutrition index loaded with {len(_index.descriptions)} foods")
+    return _index
@@ -1,35 +1,155 @@
 import os
 import requests
+from app.nutrition_cache import cached_lookup, nutrition_cache
+from app.resilience import provider, CircuitOpenError
 
 NUTRITIONIX_APP_ID = os.environ.get('NUTRITIONIX_APP_ID')
 NUTRITIONIX_API_KEY = os.environ.get('NUTRITIONIX_API_KEY')
+# Overridable so a local stand-in server can be used
+NUTRITIONIX_API_URL = os.environ.get('NUTRITIONIX_API_URL', 'https://trackapi.nutritionix.com/v2/natural/nutrients')
+
+# Shared session so repeated calls reuse the HTTPS connection
+_session = requests.Session()
+
+
+def _headers():
+    return {
+        'x-app-id': NUTRITIONIX_APP_ID,
+        'x-app-key': NUTRITIONIX_API_KEY,
+        'Content-Type': 'application/json'
+    }
 
 
 def get_nutritionix_data(food_name):
     """
     Query Nutritionix API for nutrition data for a given food name.
     Returns a dict with nutrition info or None if failed.
+    Results, including foods Nutritionix could not match, are served from the
+    nutrition cache; transient failures are not cached.
+    """
+    try:
+        return cached_lookup("nutritionix", food_name, _fetch_nutritionix_data)
+    except CircuitOpenError as e:
+        print(f"[Nutritionix] Skipped: {e}")
+        return None
+    except Exception as e:
+        print(f"[Nutritionix] Exception: {e}")
+        return None
+
+
+def _fetch_nutritionix_data(food_name):
+    """
+    Returns the response JSON, or None when Nutritionix matched no food (404).
+    Any other failure is raised so it is not cached as a miss.
     """
-    url = 'https://trackapi.nutritionix.com/v2/natural/nutrients'
-    headers = {
-        'x-app-id': NUTRITIONIX_APP_ID,
-        'x-app-key': NUTRITIONIX_API_KEY,
-        'Content-Type': 'application/json'
-    }
     data = {
         'query': food_name
     }
-    try:
-        print(f"[Nutritionix] Sending request for: {food_name}")
-        print(f"[Nutritionix] Using App ID: {NUTRITIONIX_APP_ID}, API Key present: {bool(NUTRITIONIX_API_KEY)}")
-        response = requests.post(url, headers=headers, json=data)
-        print(f"[Nutritionix] Response status: {response.status_code}")
-        print(f"[Nutritionix] Response body: {response.text}")
-        if response.status_code == 200:
-            return response.json()
+    print(f"[Nutritionix] Sending request for: {food_name}")
+    print(f"[Nutritionix] Using App ID: {NUTRITIONIX_APP_ID}, API Key present: {bool(NUTRITIONIX_API_KEY)}")
+    response = provider("nutritionix").post(NUTRITIONIX_API_URL, session=_session, headers=_headers(), json=data)
+    print(f"[Nutritionix] Response status: {response.status_code}")
+    print(f"[Nutritionix] Response body: {response.text}")
+    if response.status_code == 200:
+        return response.json()
+    if response.status_code == 404:
+        # "We couldn't match any of your foods"
+        return None
+    print(f"[Nutritionix] API error: {response.status_code} {response.text}")
+    response.raise_for_status()
+    raise requests.HTTPError(f"Unexpected Nutritionix status {response.status_code}", response=response)
+
+
+def _match_item(food, food_names, assigned):
+    """Find the input item a returned food belongs to"""
+    name = (food.get('food_name') or '').lower().strip()
+    if not name:
+        return None
+    matches = [i for i, item in enumerate(food_names)
+               if name in item.lower().strip() or item.lower().strip() in name]
+    # Prefer an item that has no food yet, e.g. two separate "apple" entries
+    for i in matches:
+        if i not in assigned:
+            return i
+    return matches[0] if matches else None
+
+
+def get_nutritionix_batch(food_names):
+    """
+    Query Nutritionix once for all the food names of a meal.
+
+    Args:
+        food_names (list): Food names as entered or recognized
+
+    Returns:
+        list: For each input name, the list of Nutritionix 'foods' entries
+        resolved for it (empty when the item was not resolved)
+
+    Items the batch response leaves unresolved are retried one by one.
+    """
+    results = [[] for _ in food_names]
+    if not food_names:
+        return results
+
+    # Serve items looked up before from the cache
+    pending = []
+    for i, name in enumerate(food_names):
+        found, cached = nutrition_cache.get("nutritionix", name)
+        if found:
+            results[i] = (cached or {}).get('foods', [])
         else:
-            print(f"[Nutritionix] API error: {response.status_code} {response.text}")
-            return None
+            pending.append(i)
+    if not pending:
+        return results
+
+    # The natural-language endpoint parses several foods from one query
+    pending_names = [food_names[i] for i in pending]
+    try:
+        response = _fetch_nutritionix_data('\n'.join(pending_names))
+    except CircuitOpenError as e:
+        # Unresolved items fall back to the local nutrition database
+        print(f"[Nutritionix] Skipped: {e}")
+        return results
     except Exception as e:
         print(f"[Nutritionix] Exception: {e}")
-        return None
+        return results
+    if not response or 'foods' not in response:
+        return results
+
+    mapped = _map_foods(response['foods'], pending_names)
+    for i, name, foods in zip(pending, pending_names, mapped):
+        if foods:
+            results[i] = foods
+            nutrition_cache.set("nutritionix", name, {'foods': foods})
+        elif len(pending) == 1:
+            # A one-item batch is the single-item query, so its miss is real
+            nutrition_cache.set("nutritionix", name, None)
+        else:
+            # An item left over from a batch may only have been lost in
+            # parsing or matching; it is cached as a miss only when a query
+            # for it alone also finds nothing
+            results[i] = (get_nutritionix_data(name) or {}).get('foods', [])
+
+    return results
+
+
+def _map_foods(foods, food_names):
+    """Assign each returned food to one of the queried names"""
+    results = [[] for _ in food_names]
+
+    assigned = set()
+    unmatched = []
+    for food in foods:
+        i = _match_item(food, food_names, assigned)
+        if i is None:
+            unmatched.append(food)
+        else:
+            results[i].append(food)
+            assigned.add(i)
+
+    # Foods whose names differ from the input go to the remaining items in order
+    remaining = [i for i in range(len(food_names)) if i not in assigned]
+    for i, food in zip(remaining, unmatched):
+        results[i].append(food)
+
+    return results
@@ -1,8 +1,9 @@
 import os
 import json
-import requests
 import time
 from dotenv import load_dotenv
+from app.semantic_cache import chat_cache
+from app.resilience import provider
 
 # Load environment variables
 load_dotenv()
@@ -13,24 +14,22 @@ OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 # Get Gemini API key as fallback
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-def get_chatbot_response_gpt(user_question, health_data=None, recent_data=None):
-    """
-    Get a response from Google Gemini 2.5 Pro Experimental via OpenRouter API for the health chatbot feature.
-    
-    Args:
-        user_question (str): The user's question (any topic)
-        health_data (dict, optional): The user's latest health data
-        recent_data (list, optional): Recent health data for context
-        
-    Returns:
-        str: The AI-generated response to the user's question
-    """
-    # Print the API key (first 5 and last 5 chars) for debugging
-    print(f"Using OpenRouter API Key: {OPENROUTER_API_KEY[:5]}...{OPENROUTER_API_KEY[-5:]}")
-    # Check if we have a valid question
-    if not user_question or not user_question.strip():
-        return "Please ask a question."
-    
+# Chat completions endpoint (overridable, e.g. to point at a local test server)
+OPENROUTER_API_URL = os.getenv("OPENROUTER_API_URL", "https://openrouter.ai/api/v1/chat/completions")
+OPENROUTER_MODEL = "google/gemini-2.5-pro-experimental"
+
+# Semantic cache namespace for answers from get_chatbot_response_gpt
+CHAT_CACHE_NAMESPACE = "openrouter_chatbot"
+
+def _openrouter_headers():
+    return {
+        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+        "Content-Type": "application/json",
+        "HTTP-Referer": "https://health-tracker-app.com"
+    }
+
+def build_system_message(health_data=None, recent_data=None):
+    """System prompt for the health chatbot, personalized with the user's data"""
     # Build system message with health focus
     system_message = """You are an AI health assistant in the Health Tracker application. 
     Your primary focus is on providing health-related advice, insights, and answering questions about health, 
@@ -88,17 +87,41 @@ def get_chatbot_response_gpt(user_question, health_data=None, recent_data=None):
             sleep_avg = sum(sleep_values) / len(sleep_values)
             system_message += f"\n- Sleep average over past 5 days: {sleep_avg:.1f} hours"
     
-    # Configure OpenRouter API request with Qwen model
-    url = "https://openrouter.ai/api/v1/chat/completions"
+    return system_message
+
+def get_chatbot_response_gpt(user_question, health_data=None, recent_data=None):
+    """
+    Get a response from Google Gemini 2.5 Pro Experimental via OpenRouter API for the health chatbot feature.
+    
+    Args:
+        user_question (str): The user's question (any topic)
+        health_data (dict, optional): The user's latest health data
+        recent_data (list, optional): Recent health data for context
+        
+    Returns:
+        str: The AI-generated response to the user's question
+    """
+    # Print the API key (first 5 and last 5 chars) for debugging
+    print(f"Using OpenRouter API Key: {OPENROUTER_API_KEY[:5]}...{OPENROUTER_API_KEY[-5:]}")
+    # Check if we have a valid question
+    if not user_question or not user_question.strip():
+        return "Please ask a question."
+    
+    # Recurring questions are answered from the semantic cache
+    cached = chat_cache.get(CHAT_CACHE_NAMESPACE, user_question, health_data)
+    if cached:
+        print(f"Chatbot cache hit ({chat_cache.report()})")
+        return cached
+    
+    system_message = build_system_message(health_data, recent_data)
+    
+    # Configure OpenRouter API request
+    url = OPENROUTER_API_URL
     
     # Use Google Gemini 2.5 Pro Experimental via OpenRouter
-    model = "google/gemini-2.5-pro-experimental"
+    model = OPENROUTER_MODEL
     
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://health-tracker-app.com"
-    }
+    headers = _openrouter_headers()
     
     data = {
         "model": model,
@@ -119,12 +142,11 @@ def get_chatbot_response_gpt(user_question, health_data=None, recent_data=None):
         debug_data = data.copy()
         print(f"Request data: {debug_data}")
         
-        # Make the API request with a reasonable timeout
-        response = requests.post(
+        # Timeout follows observed latency; fails fast while OpenRouter is unhealthy
+        response = provider("openrouter").post(
             url,
             headers=headers,
-            json=data,
-            timeout=30  # Longer timeout for more reliable responses
+            json=data
         )
         
         print(f"Response status: {response.status_code}")
@@ -137,6 +159,7 @@ def get_chatbot_response_gpt(user_question, health_data=None, recent_data=None):
             if "choices" in result and len(result["choices"]) > 0:
                 answer = result["choices"][0]["message"]["content"]
                 print(f"Successfully received response from {model}")
+                chat_cache.set(CHAT_CACHE_NAMESPACE, user_question, answer, health_data)
                 return answer
             else:
                 print(f"Unexpected response format: {result}")
@@ -148,11 +171,10 @@ def get_chatbot_response_gpt(user_question, health_data=None, recent_data=None):
             print(f"Attempting fallback to {fallback_model}")
             
             data["model"] = fallback_model
-            fallback_response = requests.post(
+            fallback_response = provider("openrouter").post(
                 url,
                 headers=headers,
-                json=data,
-                timeout=30
+                json=data
             )
             
             print(f"Fallback response status: {fallback_response.status_code}")
@@ -163,6 +185,7 @@ def get_chatbot_response_gpt(user_question, health_data=None, recent_data=None):
                 if "choices" in fallback_result and len(fallback_result["choices"]) > 0:
                     answer = fallback_result["choices"][0]["message"]["content"]
                     print(f"Successfully received response from fallback model {fallback_model}")
+                    chat_cache.set(CHAT_CACHE_NAMESPACE, user_question, answer, health_data)
                     return answer
     
     except Exception as e:
@@ -199,10 +222,11 @@ def get_chatbot_response_gpt(user_question, health_data=None, recent_data=None):
         
         # Get response from Gemini
         model = genai.GenerativeModel('gemini-pro')
-        response = model.generate_content(gemini_prompt)
+        response = provider("gemini").generate_content(model, gemini_prompt)
         
         if response and hasattr(response, 'text'):
             print("Successfully received response from Gemini API fallback")
+            chat_cache.set(CHAT_CACHE_NAMESPACE, user_question, response.text, health_data)
             return response.text
     
     except Exception as e:
@@ -210,3 +234,49 @@ def get_chatbot_response_gpt(user_question, health_data=None, recent_data=None):
     
     # If all API calls fail, return an error message
     return "I'm having trouble connecting to my AI services right now. Please try again in a moment."
+
+def stream_chatbot_response_gpt(user_question, health_data=None, recent_data=None, model=OPENROUTER_MODEL):
+    """
+    Stream a chatbot answer from OpenRouter as it is generated.
+    
+    Yields:
+        str: text chunks in order. Closing the generator (e.g. when the browser
+        disconnects) closes the upstream connection so generation stops there too.
+    
+    Raises:
+        requests.RequestException, CircuitOpenError or ValueError if the request
+        fails before any text
+    """
+    data = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": build_system_message(health_data, recent_data)},
+            {"role": "user", "content": user_question}
+        ],
+        "max_tokens": 800,
+        "temperature": 0.5,
+        "top_p": 0.95,
+        "route": "fallback",
+        "stream": True
+    }
+    response = provider("openrouter").post(OPENROUTER_API_URL, headers=_openrouter_headers(), json=data,
+                                           stream=True)
+    try:
+        if response.status_code != 200:
+            raise ValueError(f"OpenRouter returned {response.status_code}: {response.text[:200]}")
+        # Server-sent events: "data: {json}" lines, ": comment" keep-alives, "data: [DONE]" at the end
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            payload = line[5:].strip()
+            if payload == "[DONE]":
+                break
+            try:
+                choices = json.loads(payload).get("choices") or [{}]
+            except ValueError:
+                continue
+            text = (choices[0].get("delta") or {}).get("content")
+            if text:
+                yield text
+    finally:
+        response.close()
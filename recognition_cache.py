@@ -0,0 +1,167 @@
+import os
+import io
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from PIL import Image
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+RECOGNITION_CACHE_PATH = os.getenv(
+    "RECOGNITION_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'recognition_cache.db')
+)
+# Maximum number of differing dHash bits for two photos to count as the same
+RECOGNITION_HASH_THRESHOLD = int(os.getenv("RECOGNITION_HASH_THRESHOLD", "5"))
+# Most recognitions kept, in memory and in the SQLite store
+RECOGNITION_CACHE_MAX_ENTRIES = int(os.getenv("RECOGNITION_CACHE_MAX_ENTRIES", "5000"))
+
+
+def dhash(image_bytes, hash_size=8):
+    """64-bit difference hash of an image, robust to resizing and re-encoding"""
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        small = img.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+        pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+
+class RecognitionCache:
+    """
+    Cache of food recognition results keyed on the exact SHA-256 of the image
+    and, for near-duplicates, a perceptual dHash compared by Hamming distance.
+    Entries are persisted in SQLite and mirrored in memory for lookups; both
+    keep at most max_entries, evicting the least recently used in memory and
+    the oldest on disk.
+    """
+
+    def __init__(self, path=RECOGNITION_CACHE_PATH, threshold=RECOGNITION_HASH_THRESHOLD,
+                 max_entries=RECOGNITION_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # sha256 -> (dhash or None, food_items), in LRU order
+        self._entries = None
+        self.stats = {"exact_hits": 0, "near_hits": 0, "misses": 0,
+                      "model_calls": 0, "model_seconds": 0.0}
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS recognition_cache ("
+            "sha256 TEXT PRIMARY KEY, dhash TEXT NOT NULL, food_items TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        return conn
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = OrderedDict()
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT sha256, dhash, food_items FROM recognition_cache ORDER BY created_at DESC LIMIT ?",
+                    (self.max_entries,)
+                ).fetchall()
+            # Oldest first, so the newest entries are the last to be evicted
+            for sha, phash, items in reversed(rows):
+                self._entries[sha] = (int(phash, 16) if phash else None, json.loads(items))
+        except Exception as e:
+            print(f"[RecognitionCache] Could not load cache: {e}")
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self.stats[name] += value
+
+    def lookup(self, image_bytes):
+        """
+        Returns:
+            tuple: (food_items or None, sha256, dhash) - the hashes are reused by store()
+        """
+        sha = hashlib.sha256(image_bytes).hexdigest()
+        with self._lock:
+            self._load()
+            entry = self._entries.get(sha)
+            if entry is not None:
+                self._entries.move_to_end(sha)
+                self.stats["exact_hits"] += 1
+                return list(entry[1]), sha, None
+
+        try:
+            phash = dhash(image_bytes)
+        except Exception as e:
+            print(f"[RecognitionCache] Could not hash image: {e}")
+            self._count(misses=1)
+            return None, sha, None
+
+        with self._lock:
+            best = None
+            for other_sha, (other, items) in self._entries.items():
+                if other is None:
+                    continue
+                distance = bin(phash ^ other).count('1')
+                if distance <= self.threshold and (best is None or distance < best[0]):
+                    best = (distance, other_sha, items)
+            if best is None:
+                self.stats["misses"] += 1
+                return None, sha, phash
+            self._entries.move_to_end(best[1])
+            self.stats["near_hits"] += 1
+            return list(best[2]), sha, phash
+
+    def store(self, sha, phash, food_items, model_seconds=None):
+        """Remember a successful recognition"""
+        with self._lock:
+            if model_seconds is not None:
+                self.stats["model_calls"] += 1
+                self.stats["model_seconds"] += model_seconds
+            self._load()
+            self._entries.pop(sha, None)
+            self._entries[sha] = (phash, list(food_items))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO recognition_cache (sha256, dhash, food_items, created_at) VALUES (?, ?, ?, ?)",
+                    (sha, format(phash, '016x') if phash is not None else '', json.dumps(food_items), time.time())
+                )
+                conn.execute(
+                    "DELETE FROM recognition_cache WHERE sha256 NOT IN "
+                    "(SELECT sha256 FROM recognition_cache ORDER BY created_at DESC LIMIT ?)",
+                    (self.max_entries,)
+                )
+        except Exception as e:
+            print(f"[RecognitionCache] Could not persist entry: {e}")
+
+    def report(self):
+        """Hit rate and estimated model latency saved"""
+        with self._lock:
+            stats = dict(self.stats)
+        hits = stats["exact_hits"] + stats["near_hits"]
+        total = hits + stats["misses"]
+        calls = stats["model_calls"]
+        avg_latency = stats["model_seconds"] / calls if calls else 0.0
+        return {
+            "hit_rate": hits / total if total else 0.0,
+            "hits": hits,
+            "misses": stats["misses"],
+            "avg_model_seconds": avg_latency,
+            "seconds_saved": hits * avg_latency
+        }
+
+
+recognition_cache = RecognitionCache()
@@ -0,0 +1,285 @@
+import os
+import math
+import time
+import inspect
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import requests
+from dotenv import load_dotenv
+
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:
+    google_exceptions = None
+
+# Load environment variables
+load_dotenv()
+
+# Timeout used until a provider has enough latency samples, per provider
+PROVIDER_DEFAULT_TIMEOUTS = {
+    "gemini": 30.0,
+    "gemini_vision": 45.0,
+    "openrouter": 30.0,
+    "nutritionix": 10.0,
+    "usda": 10.0,
+}
+PROVIDER_TIMEOUT_MIN = float(os.getenv("PROVIDER_TIMEOUT_MIN", "2"))
+PROVIDER_TIMEOUT_MAX = float(os.getenv("PROVIDER_TIMEOUT_MAX", "60"))
+# Timeout = observed p95 latency times this headroom, clamped to [min, max]
+PROVIDER_TIMEOUT_MULTIPLIER = float(os.getenv("PROVIDER_TIMEOUT_MULTIPLIER", "2"))
+PROVIDER_CONNECT_TIMEOUT = float(os.getenv("PROVIDER_CONNECT_TIMEOUT", "5"))
+PROVIDER_LATENCY_WINDOW = int(os.getenv("PROVIDER_LATENCY_WINDOW", "100"))
+PROVIDER_MIN_SAMPLES = int(os.getenv("PROVIDER_MIN_SAMPLES", "20"))
+# Consecutive failures that open the circuit, and how long it stays open before a probe
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+# Threads that enforce deadlines on SDK calls without a timeout option
+PROVIDER_DEADLINE_POOL_SIZE = int(os.getenv("PROVIDER_DEADLINE_POOL_SIZE", "8"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open"""
+
+    def __init__(self, provider):
+        super().__init__(f"{provider} circuit is open")
+        self.provider = provider
+
+
+def _is_provider_fault(error):
+    """Whether an exception says the provider is unhealthy (not that the request was bad)"""
+    if google_exceptions is not None:
+        if isinstance(error, (google_exceptions.ServerError, google_exceptions.TooManyRequests,
+                              google_exceptions.DeadlineExceeded)):
+            return True
+        if isinstance(error, google_exceptions.ClientError):
+            return False
+    return True
+
+
+_deadline_executor = ThreadPoolExecutor(max_workers=PROVIDER_DEADLINE_POOL_SIZE,
+                                        thread_name_prefix="provider-call")
+
+
+def _call_with_deadline(timeout, fn, *args, **kwargs):
+    """
+    Run fn in the deadline pool and wait at most timeout seconds. A call that
+    misses the deadline keeps its pool thread until it returns, but the caller
+    is released; the breaker stops new calls once the provider keeps failing.
+    """
+    future = _deadline_executor.submit(fn, *args, **kwargs)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise TimeoutError(f"call did not finish within {timeout:.1f}s")
+
+
+_END_OF_STREAM = object()
+
+
+def _close_stream(*objects):
+    """Best-effort close/cancel of an upstream stream and the objects wrapping it"""
+    for obj in objects:
+        for name in ('close', 'cancel'):
+            method = getattr(obj, name, None)
+            if callable(method):
+                try:
+                    method()
+                except Exception:
+                    # e.g. a generator still running in a timed-out pool thread
+                    pass
+
+
+def _accepts_request_options(method):
+    """Whether a generate_content method takes request_options (google-generativeai >= 0.4)"""
+    try:
+        return 'request_options' in inspect.signature(method).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+class Provider:
+    """
+    Circuit breaker and adaptive timeout for one outbound provider.
+
+    The timeout is the p95 of recent successful call latencies times a
+    headroom multiplier, clamped to [min, max]; until enough samples exist
+    the provider's default is used.
+
+    After BREAKER_FAILURE_THRESHOLD consecutive failures the circuit opens
+    and calls raise CircuitOpenError without touching the network, so callers
+    go straight to their fallbacks. Once BREAKER_RESET_SECONDS have passed a
+    single probe call is let through (half-open): success closes the circuit,
+    failure opens it again.
+    """
+
+    def __init__(self, name, default_timeout=30.0, failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                 reset_seconds=BREAKER_RESET_SECONDS):
+        self.name = name
+        self.default_timeout = default_timeout
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=PROVIDER_LATENCY_WINDOW)
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.stats = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def p95(self):
+        """95th percentile of recent successful latencies, or None with too few samples"""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < PROVIDER_MIN_SAMPLES:
+            return None
+        return samples[math.ceil(0.95 * len(samples)) - 1]
+
+    def timeout(self):
+        """Seconds to allow the next call"""
+        p95 = self.p95()
+        if p95 is None:
+            return self.default_timeout
+        return min(PROVIDER_TIMEOUT_MAX, max(PROVIDER_TIMEOUT_MIN, p95 * PROVIDER_TIMEOUT_MULTIPLIER))
+
+    def _acquire(self):
+        """Let a call through, or raise CircuitOpenError; returns True for a half-open probe"""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == CLOSED:
+                self.stats["calls"] += 1
+                return False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                self.stats["calls"] += 1
+                return True
+            self.stats["rejected"] += 1
+        raise CircuitOpenError(self.name)
+
+    def _record(self, ok, elapsed=None, probe=False):
+        with self._lock:
+            if probe:
+                self._probing = False
+            if ok is None:
+                return
+            if ok:
+                self._failures = 0
+                if elapsed is not None:
+                    self._latencies.append(elapsed)
+                if self.state != CLOSED:
+                    print(f"[{self.name}] Circuit closed")
+                self.state = CLOSED
+                return
+            self.stats["failures"] += 1
+            self._failures += 1
+            if probe or (self.state == CLOSED and self._failures >= self.failure_threshold):
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self.stats["opened"] += 1
+                print(f"[{self.name}] Circuit opened after {self._failures} consecutive failures")
+
+    def _run(self, fn, args, kwargs, sample=True, failed=None):
+        probe = self._acquire()
+        start = time.perf_counter()
+        # None (interrupted, e.g. GeneratorExit) releases a probe without a verdict
+        ok = None
+        try:
+            result = fn(*args, **kwargs)
+            ok = not (failed and failed(result))
+            return result
+        except Exception as e:
+            ok = not _is_provider_fault(e)
+            raise
+        finally:
+            self._record(ok, time.perf_counter() - start if sample else None, probe)
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) through the breaker, sampling its latency"""
+        return self._run(fn, args, kwargs)
+
+    def stream(self, fn, *args, **kwargs):
+        """
+        Generator over the chunks of fn(*args, **kwargs), a call that returns an
+        iterable. Opening the stream and every next() are held to the timeout,
+        and the whole stream counts as one call: it succeeds once exhausted and
+        fails on a provider error part-way. Closing the generator (GeneratorExit)
+        closes or cancels the upstream iterator. Stream latency is not sampled.
+        """
+        probe = self._acquire()
+        timeout = self.timeout()
+        ok = None
+        response = chunks = None
+        try:
+            response = _call_with_deadline(timeout, fn, *args, **kwargs)
+            chunks = iter(response)
+            while True:
+                chunk = _call_with_deadline(timeout, next, chunks, _END_OF_STREAM)
+                if chunk is _END_OF_STREAM:
+                    break
+                yield chunk
+            ok = True
+        except Exception as e:
+            ok = not _is_provider_fault(e)
+            raise
+        finally:
+            self._record(ok, None, probe)
+            _close_stream(chunks, response, getattr(response, '_iterator', None))
+
+    def request(self, method, url, session=None, **kwargs):
+        """
+        HTTP request through the breaker with the adaptive timeout. 5xx and 429
+        responses count as failures but are still returned to the caller.
+        """
+        kwargs.setdefault('timeout', (PROVIDER_CONNECT_TIMEOUT, self.timeout()))
+        send = getattr(session or requests, method)
+        return self._run(send, (url,), kwargs, sample=not kwargs.get('stream'),
+                         failed=lambda response: response.status_code >= 500 or response.status_code == 429)
+
+    def post(self, url, session=None, **kwargs):
+        return self.request('post', url, session=session, **kwargs)
+
+    def get(self, url, session=None, **kwargs):
+        return self.request('get', url, session=session, **kwargs)
+
+    def generate_content(self, model, *args, stream=False, **kwargs):
+        """
+        model.generate_content(...) through the breaker with the adaptive timeout.
+        SDK versions without request_options get the deadline from the pool.
+        With stream=True this returns the generator from stream().
+        """
+        if _accepts_request_options(model.generate_content):
+            kwargs.setdefault('request_options', {"timeout": self.timeout()})
+        if stream:
+            return self.stream(model.generate_content, *args, stream=True, **kwargs)
+        if 'request_options' in kwargs:
+            return self.call(model.generate_content, *args, **kwargs)
+        return self.call(_call_with_deadline, self.timeout(), model.generate_content, *args, **kwargs)
+
+    def report(self):
+        """Breaker state, current timeout and counters"""
+        p95 = self.p95()
+        return dict(self.stats, state=self.state, timeout=round(self.timeout(), 2),
+                    p95=round(p95, 3) if p95 is not None else None)
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def provider(name):
+    """The shared Provider for name, created on first use"""
+    with _providers_lock:
+        if name not in _providers:
+            _providers[name] = Provider(name, PROVIDER_DEFAULT_TIMEOUTS.get(name, 30.0))
+        return _providers[name]
+
+
+def providers_report():
+    """report() of every provider used so far"""
+    with _providers_lock:
+        return {name: p.report() for name, p in _providers.items()}
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Cache configuration
+CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "")
+CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "21600"))
+CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+CACHE_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'response_cache.db')
+
+
+def make_cache_key(namespace, **parts):
+    """
+    Build a content-addressed key from the inputs of a prompt.
+
+    The parts are serialized canonically (sorted keys, no whitespace) so that
+    byte-identical inputs always map to the same key.
+    """
+    canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    digest = hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class MemoryBackend:
+    """In-process LRU bounded by entry count and total value size"""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, time.time() + ttl)
+            self._size += size
+            while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        value, _ = self._entries.pop(key)
+        self._size -= len(value.encode('utf-8'))
+
+
+class SQLiteBackend:
+    """File-backed cache shared by all worker processes on one host"""
+
+    def __init__(self, path=CACHE_DB_PATH, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_response_cache_accessed ON response_cache (accessed_at)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE response_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now + ttl, now)
+            )
+            conn.execute("DELETE FROM response_cache WHERE expires_at < ?", (now,))
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM response_cache").fetchone()
+            # Evict least recently used entries until both limits are met
+            while count > self.max_entries or total > self.max_bytes:
+                row = conn.execute(
+                    "SELECT key, size FROM response_cache ORDER BY accessed_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    break
+                conn.execute("DELETE FROM response_cache WHERE key = ?", (row[0],))
+                count -= 1
+                total -= row[1]
+
+
+class RedisBackend:
+    """Backend for any server speaking the Redis protocol (Redis, Valkey, KeyDB...)"""
+
+    def __init__(self, url=CACHE_URL, client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url or "redis://localhost:6379/0")
+        self.client = client
+
+    def get(self, key):
+        value = self.client.get(key)
+        if isinstance(value, bytes):
+            value = value.decode('utf-8')
+        return value
+
+    def set(self, key, value, ttl):
+        # Size-based eviction is delegated to the server's maxmemory policy
+        self.client.set(key, value, ex=int(ttl))
+
+
+class ResponseCache:
+    """Front-end used by the services; never lets a cache failure break a request"""
+
+    def __init__(self, backend, ttl=CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0, "errors": 0}
+
+    def get(self, key):
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            print(f"Response cache read error: {str(e)}")
+            self.stats["errors"] += 1
+            return None
+        if value is None:
+            self.stats["misses"] += 1
+        else:
+            self.stats["hits"] += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        if not value:
+            return
+        try:
+            self.backend.set(key, value, ttl or self.ttl)
+        except Exception as e:
+            print(f"Response cache write error: {str(e)}")
+            self.stats["errors"] += 1
+
+
+def create_backend(name=CACHE_BACKEND):
+    """Create the cache backend selected by RESPONSE_CACHE_BACKEND"""
+    try:
+        if name == "sqlite":
+            return SQLiteBackend(CACHE_URL or CACHE_DB_PATH)
+        if name == "redis":
+            return RedisBackend(CACHE_URL)
+    except Exception as e:
+        print(f"Could not initialize {name} response cache, using in-process cache: {str(e)}")
+    return MemoryBackend()
+
+
+response_cache = ResponseCache(create_backend())
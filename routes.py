@@ -1,11 +1,15 @@
 from flask import render_template, request, redirect, url_for, flash, session
+from flask import Response, jsonify, stream_with_context
 from flask import Blueprint
 from app.forms import VitalsForm
-from app.gemini_service import get_health_insights, get_personalized_recommendations, genai, get_chatbot_response
-from app.models import save_vitals, get_recent_vitals, analyze_vitals
+from app.gemini_service import genai, get_chatbot_response
+from app.models import save_vitals, get_recent_vitals, analyze_vitals, get_latest_alerts
 from app.openai_service import get_chatbot_response_gpt
-from app.email_service import send_health_notification
+from app.email_service import queue_health_notification
+from app.alerts import alert_hub
+from app.ai_orchestrator import get_insights_and_recommendations, get_insights_with_deadline
 import secrets  # Added for secret key generation
+import hashlib  # For alert ETags
 import json  # Added for json.dumps
 import requests  # For API requests
 import datetime
@@ -13,7 +17,6 @@ import re  # For regex
 from dotenv import load_dotenv  # Added for loading environment variables
 from flask_wtf import FlaskForm
 from wtforms import BooleanField, SubmitField
-from app.nutritionix_service import get_nutritionix_data
 
 # Generate a secure secret key (64-character hex string)
 print("Generated secret key:", secrets.token_hex(32))
@@ -159,9 +162,8 @@ def dashboard():
         # Save the data
         saved_vitals = save_vitals(latest_vitals)
         
-        # Get insights based on all data
-        health_insights = get_health_insights(saved_vitals, recent_data)
-        recommendations = get_personalized_recommendations(saved_vitals)
+        # Get insights based on all data (both AI calls run concurrently)
+        health_insights, recommendations = get_insights_and_recommendations(saved_vitals, recent_data)
         
         # Store user name for personalized greeting
         user_name = saved_vitals.get('name')
@@ -259,15 +261,15 @@ def dashboard():
                 </html>
                 """
                 
-                # Send the email notification
-                email_sent = send_health_notification(
+                # Queue the email notification; the outbox workers deliver it
+                email_queued = queue_health_notification(
                     to_email=saved_vitals.get('email'),
                     subject=email_subject,
                     html_content=email_html
                 )
                 
-                if email_sent:
-                    flash("Health insights sent to your email successfully!", "success")
+                if email_queued:
+                    flash("Health insights will be sent to your email shortly!", "success")
                 else:
                     flash("Could not send email. Please check the console for error details.", "warning")
                     
@@ -283,8 +285,7 @@ def dashboard():
     # If we have recent data, get insights for the latest entry
     if recent_data:
         latest = recent_data[-1]
-        health_insights = get_health_insights(latest, recent_data)
-        recommendations = get_personalized_recommendations(latest)
+        health_insights, recommendations = get_insights_and_recommendations(latest, recent_data)
         user_name = latest.get('name')
     
     # Remove the today's date for the dashboard header
@@ -337,67 +338,16 @@ def dashboard():
 def get_real_time_alerts():
     """
     API endpoint to fetch real-time health alerts
-    Returns alerts based on recent health data
+    Returns alerts based on recent health data; unchanged polls get 304
     """
     try:
-        # Get recent vitals data
-        recent_data = get_recent_vitals(days=7)
-        
-        # If no data is available, return empty alerts
-        if not recent_data:
-            return {"alerts": []}
-        
-        # Create simple alerts based on the most recent data
-        alerts = []
-        
-        # Get the most recent entry
-        latest = recent_data[-1] if recent_data else {}
-        
-        # Check for heart rate issues
-        if latest.get('heart_rate', 0) > 100:
-            alerts.append({
-                'date': latest.get('date', ''),
-                'type': 'heart_rate',
-                'message': f"Elevated heart rate detected: {latest.get('heart_rate')} bpm",
-                'data': {'heart_rate': latest.get('heart_rate')}
-            })
-        elif latest.get('heart_rate', 0) < 60 and latest.get('heart_rate', 0) > 0:
-            alerts.append({
-                'date': latest.get('date', ''),
-                'type': 'heart_rate',
-                'message': f"Low heart rate detected: {latest.get('heart_rate')} bpm",
-                'data': {'heart_rate': latest.get('heart_rate')}
-            })
-        
-        # Check for sleep issues
-        if latest.get('sleep_hours', 0) < 6 and latest.get('sleep_hours', 0) > 0:
-            alerts.append({
-                'date': latest.get('date', ''),
-                'type': 'sleep_hours',
-                'message': f"Sleep duration below recommended levels: {latest.get('sleep_hours')} hours",
-                'data': {'sleep_hours': latest.get('sleep_hours')}
-            })
-        
-        # Check for mood issues
-        if latest.get('mood', 5) <= 2:
-            alerts.append({
-                'date': latest.get('date', ''),
-                'type': 'mood',
-                'message': f"Mood score indicates potential concern: {latest.get('mood')}/5",
-                'data': {'mood': latest.get('mood')}
-            })
-        
-        # Check for low steps
-        if latest.get('steps', 0) < 5000 and latest.get('steps', 0) > 0:
-            alerts.append({
-                'date': latest.get('date', ''),
-                'type': 'steps',
-                'message': f"Step count below daily target: {latest.get('steps')} steps",
-                'data': {'steps': latest.get('steps')}
-            })
+        # Alerts were evaluated when the latest vitals were saved
+        alerts = get_latest_alerts(days=7)
         
         print(f"Returning {len(alerts)} health alerts")
-        return {"alerts": alerts}
+        response = jsonify({"alerts": alerts})
+        response.set_etag(hashlib.md5(response.get_data()).hexdigest())
+        return response.make_conditional(request)
     
     except Exception as e:
         print(f"Error generating alerts: {str(e)}")
@@ -405,31 +355,105 @@ def get_real_time_alerts():
         traceback.print_exc()
         return {"alerts": [], "error": str(e)}
 
+@main.route('/api/alerts/stream', methods=['GET'])
+def stream_alerts():
+    """
+    Server-Sent Events endpoint that pushes alerts whenever new vitals are saved.
+    Reconnecting clients resume from the Last-Event-ID header; an id issued
+    by another worker or before a restart is ignored.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    response = Response(alert_hub.stream(last_event_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@main.route('/api/vitals/bulk', methods=['POST'])
+def ingest_vitals_bulk():
+    """
+    Bulk vitals ingestion for wearable sync. Accepts a JSON list (or an object
+    with a "samples" list) or NDJSON; samples are idempotent on (user, timestamp).
+    """
+    from app.vitals_ingest import parse_ingest_payload, ingest_vitals, VITALS_INGEST_MAX_ROWS
+    defaults = {key: request.args[key] for key in ('email', 'name', 'phone') if key in request.args}
+    try:
+        samples = parse_ingest_payload(request.get_data(), request.content_type or '', defaults)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    if len(samples) > VITALS_INGEST_MAX_ROWS:
+        return {"error": f"At most {VITALS_INGEST_MAX_ROWS} samples per request"}, 413
+    
+    try:
+        report = ingest_vitals(samples)
+    except Exception as e:
+        print(f"Error ingesting vitals: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return {"error": "Could not store vitals"}, 500
+    status = 400 if samples and len(report['rejected']) == len(samples) else 200
+    return report, status
+
+@main.route('/api/vitals/export', methods=['GET'])
+def export_vitals():
+    """
+    Stream vitals history as CSV (default) or NDJSON. Rows are fetched in
+    batches and written as they arrive, so memory use does not grow with history.
+    """
+    from app.models import iter_vitals_history
+    from app.vitals_export import stream_csv, stream_ndjson
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in ('csv', 'ndjson'):
+        return {"error": "format must be csv or ndjson"}, 400
+    try:
+        user_id = request.args.get('user_id', type=int)
+        start_date = request.args.get('start')
+        end_date = request.args.get('end')
+        start_date = datetime.date.fromisoformat(start_date) if start_date else None
+        end_date = datetime.date.fromisoformat(end_date) if end_date else None
+    except ValueError:
+        return {"error": "start and end must be YYYY-MM-DD"}, 400
+    
+    vitals = iter_vitals_history(user_id=user_id, start_date=start_date, end_date=end_date)
+    if export_format == 'csv':
+        body, mimetype = stream_csv(vitals), 'text/csv'
+    else:
+        body, mimetype = stream_ndjson(vitals), 'application/x-ndjson'
+    # The generator runs after the view returns; keep the app context for the DB cursor
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=vitals.{export_format}'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@main.route('/api/vitals', methods=['GET'])
+def list_vitals():
+    """Page through vitals in (date, id) order; pass next_cursor back as ?cursor="""
+    from app.models import get_vitals_page
+    from app.vitals_export import encode_cursor, decode_cursor
+    limit = max(1, min(request.args.get('limit', 100, type=int), 1000))
+    cursor = request.args.get('cursor')
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    
+    vitals, next_key = get_vitals_page(user_id=request.args.get('user_id', type=int), after=after, limit=limit)
+    return {"vitals": vitals, "next_cursor": encode_cursor(next_key) if next_key else None}
+
 @main.route('/api/leaderboard', methods=['GET'])
 def get_leaderboard():
-    # Placeholder: Simulate a leaderboard based on steps
-    from app.models import get_recent_vitals
-    recent_data = get_recent_vitals(days=30)
-    # Simulate users (in real app, use user accounts)
-    leaderboard = []
-    for entry in recent_data:
-        leaderboard.append({
-            "date": entry.get("date", ""),
-            "steps": entry.get("steps", 0)
-        })
-    leaderboard = sorted(leaderboard, key=lambda x: x["steps"], reverse=True)[:10]
-    return {"leaderboard": leaderboard}
+    # Top step counts over the last 30 days, read from the daily rollup table
+    from app.models import get_steps_leaderboard
+    return {"leaderboard": get_steps_leaderboard(days=30, limit=10)}
 
 @main.route('/api/ai-goal', methods=['POST'])
 def ai_goal_setting():
     # AI-powered goal suggestion based on recent data
     from app.models import get_recent_vitals
-    from app.gemini_service import get_health_insights
     recent_data = get_recent_vitals(days=14)
     if not recent_data:
         return {"goal": "Record more data to get personalized goals."}
     latest = recent_data[-1]
-    insights = get_health_insights(latest, recent_data)
+    insights = get_insights_with_deadline(latest, recent_data)
     # Simulate extracting a goal from insights
     goal = "Increase your daily steps by 10% for the next week!"
     return {"goal": goal, "insights": insights}
@@ -479,6 +503,54 @@ def health_chatbot():
             "answer": "I'm having trouble processing your request right now. Please try again later."
         }, 500  # Return 500 status code to indicate server error
 
+@main.route('/api/chatbot/stream', methods=['POST'])
+def health_chatbot_stream():
+    """
+    Streaming chatbot endpoint: relays the answer as Server-Sent Events
+    ("token" events with text chunks, then "done") while the model generates it.
+    """
+    from app.direct_chatbot import stream_direct_chatbot_response
+    from app.models import get_recent_vitals
+    import time
+    
+    user_question = (request.get_json(silent=True) or {}).get("question", "")
+    if not user_question:
+        return {"answer": "Please ask a question."}, 400
+    print(f"Received streaming chatbot question: {user_question}")
+    
+    # Read the context now; the generator below runs after this view returns
+    recent_data = get_recent_vitals(days=14)
+    latest = recent_data[-1] if recent_data else {}
+    
+    def events():
+        start_time = time.time()
+        first_token = None
+        chunks = 0
+        answer = stream_direct_chatbot_response(user_question, health_data=latest, recent_data=recent_data)
+        try:
+            for text in answer:
+                if first_token is None:
+                    first_token = time.time() - start_time
+                chunks += 1
+                yield f"event: token\ndata: {json.dumps({'text': text})}\n\n"
+            elapsed_time = time.time() - start_time
+            print(f"Streamed chatbot response: first token {first_token or 0:.2f}s, total {elapsed_time:.2f}s, {chunks} chunks")
+            yield f"event: done\ndata: {json.dumps({'first_token': first_token, 'elapsed': elapsed_time})}\n\n"
+        except GeneratorExit:
+            # The browser went away; closing our generator closes the provider stream too
+            print(f"Chatbot stream cancelled by client after {chunks} chunks")
+            raise
+        except Exception as e:
+            print(f"Error in chatbot stream: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'error': 'The response was interrupted. Please try again.'})}\n\n"
+        finally:
+            answer.close()
+    
+    response = Response(events(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @main.route('/activity-log')
 def activity_log():
     # In a real application, you would fetch activity data from the database
@@ -518,40 +590,15 @@ def settings():
 
 from werkzeug.utils import secure_filename
 import os
-from app.food_recognition import recognize_food_from_image, get_nutrition_data, get_food_insights
+from app.calorie_jobs import submit_calorie_job, get_calorie_job, empty_nutrition_totals
 
 @main.route('/calorie_check', methods=['GET', 'POST'])
 def calorie_check():
     from flask import session
-    # On POST, process and redirect (PRG pattern)
+    # On POST, save the upload, queue the analysis and redirect at once (PRG pattern)
     if request.method == 'POST':
-        food_items = []
-        nutrition_data = []
-        total_nutrition = {
-            'calories': 0,
-            'protein': 0,
-            'fat': 0,
-            'carbohydrates': 0,
-            'fiber': 0,
-            'sugar': 0
-        }
-        food_insights = ""
-        image_path = None
-        raw_api_output = None
-        # ... (existing POST logic for analyzing food and populating above variables)
-        # Process form submission
-        food_items = []  # Always reset to avoid carryover between form types
-        nutrition_data = []
+        file_path = None
         image_path = None
-        total_nutrition = {
-            'calories': 0,
-            'protein': 0,
-            'fat': 0,
-            'carbohydrates': 0,
-            'fiber': 0,
-            'sugar': 0
-        }
-        food_insights = ""
         manual_food = request.form.get('manual_food', '').strip()
         if 'food_image' in request.files and request.files['food_image'].filename:
             # Handle image upload
@@ -562,89 +609,41 @@ def calorie_check():
             image_path = os.path.join('static', 'uploads', filename)
             file_path = os.path.join('app', image_path)
             file.save(file_path)
-            # Call recognition and capture raw output
-            from app.food_recognition import recognize_food_from_image
-            try:
-                food_items = recognize_food_from_image(file_path)
-                if hasattr(recognize_food_from_image, 'last_raw_output'):
-                    raw_api_output = recognize_food_from_image.last_raw_output
-            except Exception as e:
-                raw_api_output = str(e)
-            print(f"Recognized food items: {food_items}")
-        elif manual_food:
             # Only process manual food if no image uploaded
-            food_items = [item.strip() for item in manual_food.split(',') if item.strip()]
-        food_items = [item for item in food_items if item and "Unable to recognize" not in item]
-        nutrition_data = []
-        for item in food_items:
-            # Try Nutritionix API first
-            nutritionix_response = get_nutritionix_data(item)
-            if nutritionix_response and 'foods' in nutritionix_response:
-                for food in nutritionix_response['foods']:
-                    data = {
-                        'food_item': food.get('food_name', item),
-                        'calories': food.get('nf_calories', 0),
-                        'protein': food.get('nf_protein', 0),
-                        'fat': food.get('nf_total_fat', 0),
-                        'carbohydrates': food.get('nf_total_carbohydrate', 0),
-                        'fiber': food.get('nf_dietary_fiber', 0),
-                        'sugar': food.get('nf_sugars', 0)
-                    }
-                    nutrition_data.append(data)
-                    try:
-                        total_nutrition['calories'] += float(data.get('calories', 0))
-                        total_nutrition['protein'] += float(data.get('protein', 0))
-                        total_nutrition['fat'] += float(data.get('fat', 0))
-                        total_nutrition['carbohydrates'] += float(data.get('carbohydrates', 0))
-                        total_nutrition['fiber'] += float(data.get('fiber', 0))
-                        total_nutrition['sugar'] += float(data.get('sugar', 0))
-                    except Exception as agg_err:
-                        print(f"[ERROR] Aggregating nutrition for {item}: {agg_err}")
-            else:
-                # Fallback to old method if Nutritionix fails
-                data = get_nutrition_data(item)
-                if data:
-                    nutrition_data.append(data)
-                    try:
-                        total_nutrition['calories'] += float(data.get('calories', 0))
-                        total_nutrition['protein'] += float(data.get('protein', 0))
-                        total_nutrition['fat'] += float(data.get('fat', 0))
-                        total_nutrition['carbohydrates'] += float(data.get('carbohydrates', 0))
-                        total_nutrition['fiber'] += float(data.get('fiber', 0))
-                        total_nutrition['sugar'] += float(data.get('sugar', 0))
-                    except Exception as agg_err:
-                        print(f"[ERROR] Aggregating nutrition for {item}: {agg_err}")
-                else:
-                    print(f"[WARN] No nutrition data for: {item}")
-        food_insights = get_food_insights([d['food_item'] for d in nutrition_data]) if nutrition_data else ""
-        # Pass raw_api_output to template for debugging
-        # Store results in session
-        session['food_items'] = food_items
-        session['nutrition_data'] = nutrition_data
-        session['total_nutrition'] = total_nutrition
-        session['food_insights'] = food_insights
-        session['image_path'] = image_path
-        session['raw_api_output'] = raw_api_output
+            manual_food = ''
+        job_id = submit_calorie_job(file_path=file_path, image_path=image_path, manual_food=manual_food)
+        if request.accept_mimetypes.best == 'application/json':
+            return {"job_id": job_id, "status_url": url_for('main.calorie_job_status', job_id=job_id)}, 202
+        # Only the job id travels in the session; results stay server-side
+        session['calorie_job_id'] = job_id
         return redirect(url_for('main.calorie_check'))
 
-    # On GET, show results if in session, else show defaults
-    food_items = session.pop('food_items', [])
-    nutrition_data = session.pop('nutrition_data', [])
-    total_nutrition = session.pop('total_nutrition', {
-        'calories': 0,
-        'protein': 0,
-        'fat': 0,
-        'carbohydrates': 0,
-        'fiber': 0,
-        'sugar': 0
-    })
-    food_insights = session.pop('food_insights', "")
-    image_path = session.pop('image_path', None)
-    raw_api_output = session.pop('raw_api_output', None)
-    return render_template('calorie_check.html', 
-                          food_items=food_items,
-                          nutrition_data=nutrition_data,
-                          total_nutrition=total_nutrition,
-                          food_insights=food_insights,
-                          image_path=image_path,
-                          raw_api_output=raw_api_output)
+    # On GET, show the job's results if it has finished, its progress if not, else defaults
+    results = {
+        'food_items': [],
+        'nutrition_data': [],
+        'total_nutrition': empty_nutrition_totals(),
+        'food_insights': "",
+        'image_path': None,
+        'raw_api_output': None
+    }
+    pending_job = None
+    job = get_calorie_job(request.args.get('job') or session.get('calorie_job_id'))
+    if job:
+        if job['status'] == 'done':
+            results.update(job['result'] or {})
+            session.pop('calorie_job_id', None)
+        elif job['status'] == 'failed':
+            results['raw_api_output'] = job['error']
+            session.pop('calorie_job_id', None)
+        else:
+            pending_job = job
+    return render_template('calorie_check.html', pending_job=pending_job, **results)
+
+@main.route('/api/calorie_jobs/<job_id>', methods=['GET'])
+def calorie_job_status(job_id):
+    """Report per-stage progress of a calorie_check job, and its result once done"""
+    job = get_calorie_job(job_id)
+    if not job:
+        return {"error": "Job not found"}, 404
+    return job
@@ -0,0 +1,50 @@
+"""
+Shared setup for the benchmark scripts in this directory.
+
+The repository root is the `app` package, so the scripts load it the same way
+tests/conftest.py does and run against a scratch SQLite database.
+"""
+import os
+import sys
+import time
+import tempfile
+import importlib.util
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if 'app' not in sys.modules:
+    spec = importlib.util.spec_from_file_location('app', os.path.join(ROOT, '__init__.py'),
+                                                  submodule_search_locations=[ROOT])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['app'] = module
+    spec.loader.exec_module(module)
+
+
+@contextlib.contextmanager
+def scratch_app(path=None):
+    """Minimal app context bound to a fresh SQLite database with all tables created"""
+    from flask import Flask
+    from app.models import db
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask("health_tracker_bench")
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + (path or os.path.join(tmp, 'bench.db'))
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.engine.dispose()
+
+
+def timed(fn, repeat=5):
+    """Best wall time of fn() over `repeat` runs, in milliseconds, and its last result"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
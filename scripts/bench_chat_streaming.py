@@ -0,0 +1,63 @@
+"""
+Time to first token of the streaming chatbot path against the latency of
+the blocking one, using the local fake LLM server (scripts/fake_llm_server.py)
+in place of OpenRouter. Also checks that closing the stream early closes
+the upstream connection.
+
+    python scripts/bench_chat_streaming.py --tokens 200 --rate 50 --first-token 0.3
+"""
+import time
+import uuid
+import argparse
+import _benchmark  # noqa: F401 - loads the app package
+from fake_llm_server import FakeLLMServer
+from app import openai_service
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--tokens', type=int, default=200, help='Tokens per answer.')
+    parser.add_argument('--rate', type=float, default=50.0, help='Tokens per second.')
+    parser.add_argument('--first-token', type=float, default=0.3, help='Seconds before the first token.')
+    parser.add_argument('--cancel-after', type=int, default=5, help='Chunks read before closing the stream.')
+    args = parser.parse_args()
+
+    server = FakeLLMServer(('127.0.0.1', 0), args.tokens, args.rate, args.first_token).start()
+    openai_service.OPENROUTER_API_URL = server.url
+    openai_service.OPENROUTER_API_KEY = openai_service.OPENROUTER_API_KEY or 'fake-key'
+    # A fresh question each time, so the semantic cache never answers
+    question = lambda: f"How can I sleep better? ({uuid.uuid4().hex})"
+
+    start = time.perf_counter()
+    answer = openai_service.get_chatbot_response_gpt(question())
+    blocking = time.perf_counter() - start
+    assert answer.split() == [server.token_text(i).strip() for i in range(args.tokens)]
+
+    start = time.perf_counter()
+    first_token = None
+    chunks = []
+    for text in openai_service.stream_chatbot_response_gpt(question()):
+        if first_token is None:
+            first_token = time.perf_counter() - start
+        chunks.append(text)
+    streaming = time.perf_counter() - start
+    assert ''.join(chunks) == answer
+
+    stream = openai_service.stream_chatbot_response_gpt(question())
+    for _ in range(args.cancel_after):
+        next(stream)
+    stream.close()
+    deadline = time.monotonic() + 5
+    while server.stats["disconnects"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    print(f"\n{args.tokens} tokens at {args.rate:g}/s, first token after {args.first_token:g}s")
+    print(f"  blocking response:       {blocking * 1000:7.0f} ms")
+    print(f"  streaming first token:   {first_token * 1000:7.0f} ms (whole stream {streaming * 1000:.0f} ms)")
+    print(f"  closed after {args.cancel_after} chunks:   upstream "
+          f"{'saw the disconnect' if server.stats['disconnects'] else 'did NOT see a disconnect'}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Throughput of the chatbot's offline fallback, and of its intent scoring
+before and after the compiled KeywordMatcher.
+
+The "before" scorer is the old loop: one substring check per keyword, with
+the question lowercased for every check. The two sleeps the old
+get_direct_chatbot_response did first (0.5s each) capped it at about
+1 req/s on their own and are not timed here.
+
+    python scripts/bench_chatbot_fallback.py --seconds 2
+"""
+import time
+import random
+import argparse
+import _benchmark  # noqa: F401 - loads the app package
+from app.direct_chatbot import INTENT_CATEGORIES, intent_matcher, get_fallback_response
+
+QUESTIONS = [
+    "How can I get better sleep when I'm stressed?",
+    "what is a normal heart rate in bpm",
+    "Is 10000 steps a day enough walking?",
+    "how much water should I drink after running",
+]
+
+
+def scores_per_keyword(user_question):
+    """get_fallback_response's scoring before the matcher"""
+    category_scores = {category: 0 for category in INTENT_CATEGORIES}
+    for category, keywords in INTENT_CATEGORIES.items():
+        for keyword in keywords:
+            if keyword in user_question.lower():
+                category_scores[category] += 1
+    return category_scores
+
+
+def random_questions(count, seed=21):
+    rng = random.Random(seed)
+    keywords = sorted({keyword for words in INTENT_CATEGORIES.values() for keyword in words})
+    fillers = ['', ' ', 'the ', 'my ', 'x', 'ing ', 'un', '?', ', ']
+    for _ in range(count):
+        parts = [rng.choice(keywords if rng.random() < 0.6 else fillers) for _ in range(rng.randint(0, 8))]
+        yield ''.join(parts) if rng.random() < 0.5 else ' '.join(parts)
+
+
+def rate(fn, seconds):
+    """Calls per second of fn(question), cycling through QUESTIONS"""
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for question in QUESTIONS:
+            fn(question)
+        calls += len(QUESTIONS)
+    return calls / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--seconds', type=float, default=2.0, help='Time spent on each measurement.')
+    parser.add_argument('--check', type=int, default=20000, help='Random keyword mixes compared.')
+    args = parser.parse_args()
+
+    mismatches = sum(1 for q in random_questions(args.check) if intent_matcher.scores(q) != scores_per_keyword(q))
+    print(f"Scores compared on {args.check} random keyword mixes: {mismatches} mismatches")
+
+    before = rate(scores_per_keyword, args.seconds)
+    after = rate(lambda q: intent_matcher.scores(q.lower()), args.seconds)
+    print(f"Intent scoring:     {before:10.0f} q/s per keyword, {after:10.0f} q/s compiled ({after / before:.1f}x)")
+    print(f"Fallback responses: {rate(get_fallback_response, args.seconds):10.0f} req/s")
+
+
+if __name__ == '__main__':
+    main()
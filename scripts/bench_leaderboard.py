@@ -0,0 +1,49 @@
+"""
+Compare the steps leaderboard read from raw vitals with the rollup query.
+
+The raw path is what /api/leaderboard did before the daily rollup table:
+load 30 days of vitals and sort them in Python. The rollup path is the
+top-N query it runs now.
+
+    python scripts/bench_leaderboard.py --rows 10000 100000 1000000
+"""
+import time
+import argparse
+from _benchmark import scratch_app, timed
+from app.models import (db, generate_synthetic_vitals, backfill_daily_rollups,
+                        get_recent_vitals, get_steps_leaderboard)
+
+
+def raw_leaderboard(days=30, limit=10):
+    """The pre-rollup leaderboard: every recent row, sorted in Python"""
+    rows = [{"date": entry.get("date", ""), "steps": entry.get("steps", 0)}
+            for entry in get_recent_vitals(days=days)]
+    return sorted(rows, key=lambda x: x["steps"], reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        with scratch_app():
+            start = time.perf_counter()
+            generate_synthetic_vitals(rows, users=args.users)
+            written = backfill_daily_rollups(batch_size=10000)
+            print(f"\n{rows} vitals rows, {written} rollup rows "
+                  f"(generated and backfilled in {time.perf_counter() - start:.1f}s)")
+
+            raw_ms, raw = timed(raw_leaderboard, args.repeat)
+            rollup_ms, rollup = timed(get_steps_leaderboard, args.repeat)
+            print(f"  raw scan:     {raw_ms:9.1f} ms")
+            print(f"  rollup query: {rollup_ms:9.1f} ms  ({raw_ms / rollup_ms:.0f}x faster)")
+            # Both rank each user-day's best entry first, so the step counts agree
+            assert [r['steps'] for r in raw] == [r['steps'] for r in rollup]
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Query count and latency of get_recent_vitals (one joined, projection-only
+statement) against the per-row path it replaced (ORM rows, then one
+User.query.get() per user), on 10k, 100k and 1M synthetic vitals rows.
+
+    python scripts/bench_recent_vitals.py --rows 10000 100000 1000000 --days 30
+"""
+import time
+import datetime
+import argparse
+import warnings
+from sqlalchemy import event
+from sqlalchemy.exc import LegacyAPIWarning
+from _benchmark import scratch_app, timed
+from app.models import db, User, VitalsData, generate_synthetic_vitals, get_recent_vitals
+
+
+def recent_vitals_per_row_lookup(days=7, user_id=None):
+    """get_recent_vitals as it was before the joined query"""
+    warnings.simplefilter('ignore', LegacyAPIWarning)
+    cutoff_date = (datetime.datetime.now() - datetime.timedelta(days=days)).date()
+    query = VitalsData.query.filter(VitalsData.date >= cutoff_date)
+    if user_id:
+        query = query.filter_by(user_id=user_id)
+    vitals_list = [v.to_dict() for v in query.order_by(VitalsData.date).all()]
+    for vital in vitals_list:
+        if vital['user_id']:
+            user = User.query.get(vital['user_id'])
+            if user:
+                vital['name'] = user.name
+                vital['email'] = user.email
+                vital['phone'] = user.phone
+    return vitals_list
+
+
+def measure(fn, repeat, **kwargs):
+    """(best ms, statements per call, result), each run on an empty identity map as in a new request"""
+    statements = []
+    listen = lambda *args: statements.append(args[2])
+
+    def run():
+        db.session.remove()
+        statements.clear()
+        return fn(**kwargs)
+
+    event.listen(db.engine, 'before_cursor_execute', listen)
+    try:
+        ms, result = timed(run, repeat)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listen)
+    return ms, len(statements), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=30, help='Window read, as on the dashboard.')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        with scratch_app():
+            start = time.perf_counter()
+            db.session.execute(User.__table__.insert(), [
+                {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com',
+                 'name': f'User {i}', 'phone': f'555-{i:04d}'} for i in range(1, args.users + 1)
+            ])
+            db.session.commit()
+            generate_synthetic_vitals(rows, users=args.users)
+            print(f"\n{rows} vitals rows, {args.users} users (generated in {time.perf_counter() - start:.1f}s)")
+
+            old_ms, old_statements, old = measure(recent_vitals_per_row_lookup, args.repeat, days=args.days)
+            new_ms, new_statements, new = measure(get_recent_vitals, args.repeat, days=args.days)
+            key = lambda vital: vital['id']
+            assert sorted(old, key=key) == sorted(new, key=key)
+            print(f"  {len(new)} rows in the last {args.days} days")
+            print(f"  per-row lookups: {old_statements:5d} statements {old_ms:9.1f} ms")
+            print(f"  joined query:    {new_statements:5d} statements {new_ms:9.1f} ms  ({old_ms / new_ms:.1f}x faster)")
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
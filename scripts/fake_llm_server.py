@@ -0,0 +1,110 @@
+"""
+Local stand-in for the OpenRouter chat completions endpoint.
+
+It answers POST requests with a fixed number of tokens at a configurable
+rate, after a configurable first-token latency. With "stream": true it
+sends OpenAI-style SSE deltas as they are "generated"; otherwise it waits
+for the whole answer and returns one JSON body. Point the app at it with
+OPENROUTER_API_URL=http://127.0.0.1:<port>/chat/completions.
+
+    python scripts/fake_llm_server.py --port 8089 --tokens 200 --rate 50 --first-token 0.3
+"""
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, tokens=200, rate=50.0, first_token=0.3):
+        super().__init__(address, FakeLLMHandler)
+        self.tokens = tokens
+        self.rate = rate
+        self.first_token = first_token
+        self.stats_lock = threading.Lock()
+        # Streams the client closed before the last token
+        self.stats = {"requests": 0, "streams": 0, "disconnects": 0}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/chat/completions"
+
+    def count(self, name):
+        with self.stats_lock:
+            self.stats[name] += 1
+
+    def token_text(self, index):
+        return f"word{index} "
+
+    def start(self):
+        """Serve from a daemon thread; returns the server"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        server.count("requests")
+        time.sleep(server.first_token)
+        if body.get("stream"):
+            self._stream(server)
+        else:
+            # A blocking request only returns once every token is generated
+            time.sleep(server.tokens / server.rate)
+            answer = ''.join(server.token_text(i) for i in range(server.tokens))
+            payload = json.dumps({"choices": [{"message": {"role": "assistant", "content": answer}}]}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    def _stream(self, server):
+        server.count("streams")
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for i in range(server.tokens):
+                if i:
+                    time.sleep(1 / server.rate)
+                delta = {"choices": [{"delta": {"content": server.token_text(i)}}]}
+                self._chunk(f"data: {json.dumps(delta)}\n\n")
+            self._chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            server.count("disconnects")
+        self.close_connection = True
+
+    def _chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--tokens', type=int, default=200, help='Tokens per answer.')
+    parser.add_argument('--rate', type=float, default=50.0, help='Tokens per second.')
+    parser.add_argument('--first-token', type=float, default=0.3, help='Seconds before the first token.')
+    args = parser.parse_args()
+    server = FakeLLMServer(('127.0.0.1', args.port), args.tokens, args.rate, args.first_token)
+    print(f"Fake LLM at {server.url}: {args.tokens} tokens at {args.rate}/s after {args.first_token}s")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+import os
+import re
+import math
+import time
+import zlib
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Minimum cosine similarity for two questions to share an answer
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "512"))
+# Size of the hashed feature space
+SEMANTIC_CACHE_DIMENSIONS = 2 ** 18
+
+_NON_WORD = re.compile(r"[^a-z0-9 ]+")
+_SPACES = re.compile(r"\s+")
+_NUMBER = re.compile(r"\d+")
+# Words that flip a question's meaning (normalization turns "don't" into "don t")
+NEGATIONS = frozenset(["not", "no", "never", "without", "none", "nothing", "neither", "nor", "cannot",
+                       "dont", "doesnt", "didnt", "isnt", "arent", "cant", "wont", "shouldnt"])
+
+
+def normalize_question(text):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    text = _NON_WORD.sub(" ", (text or "").lower())
+    return _SPACES.sub(" ", text).strip()
+
+
+def question_vector(normalized, dimensions=SEMANTIC_CACHE_DIMENSIONS):
+    """
+    L2-normalized sparse vector of hashed features: words, word bigrams and
+    character trigrams. Trigrams tolerate typos and inflections; the word
+    features keep questions that differ in a key word apart.
+    """
+    words = normalized.split()
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f" {word} "
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+
+    counts = {}
+    for feature in features:
+        # crc32 is stable across processes, unlike hash()
+        index = zlib.crc32(feature.encode('utf-8')) % dimensions
+        counts[index] = counts.get(index, 0) + 1
+    # Sublinear term frequency so repeated words do not dominate
+    vector = {index: 1 + math.log(count) for index, count in counts.items()}
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {index: weight / norm for index, weight in vector.items()} if norm else {}
+
+
+def guard_tokens(normalized):
+    """
+    Tokens that must match exactly for two questions to share an answer: the
+    numbers and the negations. Similar wording cannot make "is 120 bpm normal"
+    answer "is 60 bpm normal", or "should I eat before a run" answer "should
+    I not eat before a run".
+    """
+    words = normalized.split()
+    guards = set(_NUMBER.findall(normalized))
+    for previous, word in zip([""] + words, words):
+        if word in NEGATIONS or (word == "t" and previous.endswith("n")):
+            guards.add("not")
+    return frozenset(guards)
+
+
+def cosine(a, b):
+    """Cosine similarity of two L2-normalized sparse vectors"""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(index, 0.0) for index, weight in a.items())
+
+
+def _band(value, cuts, labels):
+    if value is None or value == '':
+        return 'na'
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 'na'
+    for cut, label in zip(cuts, labels):
+        if value < cut:
+            return label
+    return labels[-1]
+
+
+def health_context_bucket(health_data):
+    """
+    Coarse bands of the vitals a chatbot answer may be personalized on, using
+    the same thresholds as the canned responses and alerts. Questions only
+    share an answer within one bucket.
+    """
+    if not health_data:
+        return "none"
+    return "|".join([
+        "hr:" + _band(health_data.get('heart_rate'), (60, 101), ("low", "normal", "high")),
+        "sleep:" + _band(health_data.get('sleep_hours'), (7, 9.01), ("short", "ok", "long")),
+        "steps:" + _band(health_data.get('steps'), (5000, 10000), ("low", "mid", "high")),
+        "mood:" + _band(health_data.get('mood'), (3, 4), ("poor", "fair", "good")),
+    ])
+
+
+class SemanticCache:
+    """
+    In-process cache of chatbot answers looked up by question similarity.
+
+    Entries live in buckets of (namespace, health context). A lookup tries the
+    exact normalized question first, then the most similar question in the
+    bucket above the cosine threshold whose numbers and negations
+    (guard_tokens) are the same. Entries expire after the TTL and the
+    least recently used are evicted beyond max_entries.
+    """
+
+    def __init__(self, threshold=SEMANTIC_CACHE_THRESHOLD, ttl=SEMANTIC_CACHE_TTL,
+                 max_entries=SEMANTIC_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # (namespace, bucket, normalized question) -> (vector, guards, answer, expires_at), in LRU order
+        self._entries = OrderedDict()
+        # (namespace, bucket) -> set of normalized questions
+        self._buckets = {}
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0,
+                      "evictions": 0, "expirations": 0}
+
+    def get(self, namespace, question, health_data=None):
+        """Cached answer for a question like this one, or None"""
+        normalized = normalize_question(question)
+        bucket = (namespace, health_context_bucket(health_data))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(bucket + (normalized,))
+            if entry is not None and entry[3] >= now:
+                self._entries.move_to_end(bucket + (normalized,))
+                self.stats["exact_hits"] += 1
+                return entry[2]
+
+            vector = question_vector(normalized)
+            guards = guard_tokens(normalized)
+            best_key, best_score = None, self.threshold
+            for other in list(self._buckets.get(bucket, ())):
+                key = bucket + (other,)
+                other_vector, other_guards, _, expires_at = self._entries[key]
+                if expires_at < now:
+                    self._drop(key)
+                    self.stats["expirations"] += 1
+                    continue
+                if other_guards != guards:
+                    continue
+                score = cosine(vector, other_vector)
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.stats["semantic_hits"] += 1
+            return self._entries[best_key][2]
+
+    def set(self, namespace, question, answer, health_data=None):
+        """Remember the answer to a question"""
+        normalized = normalize_question(question)
+        if not normalized or not answer:
+            return
+        bucket = (namespace, health_context_bucket(health_data))
+        key = bucket + (normalized,)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (question_vector(normalized), guard_tokens(normalized), answer,
+                                  time.time() + self.ttl)
+            self._buckets.setdefault(bucket, set()).add(normalized)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def _drop(self, key):
+        del self._entries[key]
+        bucket, normalized = key[:2], key[2]
+        questions = self._buckets.get(bucket)
+        if questions is not None:
+            questions.discard(normalized)
+            if not questions:
+                del self._buckets[bucket]
+
+    def report(self):
+        """Hit rate and counters"""
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        total = hits + self.stats["misses"]
+        return dict(self.stats, entries=len(self._entries),
+                    hit_rate=hits / total if total else 0.0)
+
+
+chat_cache = SemanticCache()
@@ -0,0 +1,255 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from flask.sessions import SessionInterface, SessionMixin, SecureCookieSessionInterface
+from flask.json.tag import TaggedJSONSerializer
+from itsdangerous import Signer, BadSignature
+from werkzeug.datastructures import CallbackDict
+from sqlalchemy.engine import make_url
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite")  # sqlite or filesystem
+SESSION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+# By default sessions live in the app's SQLite database, in the table the
+# migrations create; set this to keep them in a separate file instead
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH")
+# Used when the app database is not SQLite (SQLiteSessionStore speaks sqlite3 only)
+SESSION_FALLBACK_DB_PATH = os.path.join(SESSION_DIR, 'sessions.db')
+SESSION_SWEEP_INTERVAL = int(os.getenv("SESSION_SWEEP_INTERVAL", "600"))
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session data kept on the server; the cookie only carries its id"""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class SQLiteSessionStore:
+    """Sessions in one SQLite file shared by all worker processes"""
+
+    def __init__(self, path=SESSION_FALLBACK_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_sessions_expires_at ON sessions (expires_at)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def load(self, sid):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT data FROM sessions WHERE sid = ? AND expires_at > ?", (sid, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def save(self, sid, data, expires_at):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)",
+                (sid, data, expires_at)
+            )
+
+    def delete(self, sid):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def sweep(self):
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+
+
+class FilesystemSessionStore:
+    """One JSON file per session"""
+
+    def __init__(self, directory=os.path.join(SESSION_DIR, 'sessions')):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, sid):
+        return os.path.join(self.directory, f"{sid}.json")
+
+    def load(self, sid):
+        try:
+            with open(self._path(sid), 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('expires_at', 0) <= time.time():
+            return None
+        return entry.get('data')
+
+    def save(self, sid, data, expires_at):
+        tmp_path = f"{self._path(sid)}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'data': data, 'expires_at': expires_at}, f)
+        os.replace(tmp_path, self._path(sid))
+
+    def delete(self, sid):
+        try:
+            os.remove(self._path(sid))
+        except OSError:
+            pass
+
+    def sweep(self):
+        removed = 0
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, 'r') as f:
+                    expires_at = json.load(f).get('expires_at', 0)
+                if expires_at <= now:
+                    os.remove(path)
+                    removed += 1
+            except (OSError, ValueError):
+                continue
+        return removed
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Flask session interface that stores session data server-side and sends a
+    compact signed session id as the cookie. Expired sessions are swept
+    periodically.
+    """
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, sweep_interval=SESSION_SWEEP_INTERVAL):
+        self.store = store
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._cookie_interface = SecureCookieSessionInterface()
+        # Bytes a cookie-packed session would have sent vs the id cookie actually sent
+        self.stats = {"saves": 0, "cookie_session_bytes": 0, "server_session_cookie_bytes": 0}
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt='server-session', key_derivation='hmac')
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode('utf-8')
+                data = self.store.load(sid)
+                if data is not None:
+                    return ServerSideSession(self.serializer.loads(data), sid=sid)
+            except BadSignature:
+                pass
+            except Exception as e:
+                print(f"Error loading server-side session: {str(e)}")
+        return ServerSideSession(sid=uuid.uuid4().hex, new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        # Drop the stored data and the cookie once the session is emptied
+        if not session:
+            if session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.modified or self.should_set_cookie(app, session):
+            expires_at = time.time() + app.permanent_session_lifetime.total_seconds()
+            self.store.save(session.sid, self.serializer.dumps(dict(session)), expires_at)
+
+        if not self.should_set_cookie(app, session):
+            return
+
+        cookie = self._signer(app).sign(session.sid.encode('utf-8')).decode('utf-8')
+        response.set_cookie(
+            name,
+            cookie,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+        self._record_sizes(app, session, cookie)
+        self._maybe_sweep()
+
+    def _record_sizes(self, app, session, cookie):
+        try:
+            packed = self._cookie_interface.get_signing_serializer(app).dumps(dict(session))
+        except Exception:
+            return
+        with self._stats_lock:
+            self.stats["saves"] += 1
+            self.stats["cookie_session_bytes"] += len(packed)
+            self.stats["server_session_cookie_bytes"] += len(cookie)
+
+    def report(self):
+        """One-line summary of the cookie size savings, logged with each sweep"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        saves = stats["saves"]
+        if not saves:
+            return "no session cookies set yet"
+        saved = stats["cookie_session_bytes"] - stats["server_session_cookie_bytes"]
+        return (f"{saves} session cookie(s) set, avg {stats['server_session_cookie_bytes'] / saves:.0f} bytes "
+                f"instead of {stats['cookie_session_bytes'] / saves:.0f}; {saved} bytes saved")
+
+    def _maybe_sweep(self):
+        now = time.time()
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        with self._sweep_lock:
+            if now - self._last_sweep < self.sweep_interval:
+                return
+            self._last_sweep = now
+        try:
+            removed = self.store.sweep()
+            if removed:
+                print(f"Swept {removed} expired session(s)")
+            print(f"Server-side sessions: {self.report()}")
+        except Exception as e:
+            print(f"Error sweeping sessions: {str(e)}")
+
+
+def app_database_path(app):
+    """File of the app's SQLAlchemy database when it is SQLite, else None"""
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI')
+    if not uri:
+        return None
+    url = make_url(uri)
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+        return None
+    # Flask-SQLAlchemy resolves relative SQLite paths against the instance folder
+    return url.database if os.path.isabs(url.database) else os.path.join(app.instance_path, url.database)
+
+
+def init_app(app, backend=SESSION_BACKEND):
+    """Install the server-side session interface on the app"""
+    if backend == "filesystem":
+        store = FilesystemSessionStore()
+    else:
+        store = SQLiteSessionStore(SESSION_DB_PATH or app_database_path(app) or SESSION_FALLBACK_DB_PATH)
+    app.session_interface = ServerSideSessionInterface(store)
+    where = f" at {store.path}" if backend != "filesystem" else ""
+    print(f"Server-side sessions enabled ({backend} backend{where})")
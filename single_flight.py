@@ -0,0 +1,102 @@
+import re
+import asyncio
+import hashlib
+import inspect
+import threading
+from concurrent.futures import Future
+
+_SPACES = re.compile(r"\s+")
+
+
+def prompt_key(namespace, prompt, model=None):
+    """Key for an upstream call: the prompt with whitespace runs collapsed, plus the model"""
+    normalized = _SPACES.sub(" ", prompt or "").strip()
+    digest = hashlib.sha256(f"{model or ''}\x00{normalized}".encode('utf-8')).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: the first caller for a key runs the
+    upstream call and every caller that arrives while it is in flight waits
+    for and shares its result (or its exception). Nothing is kept after the
+    call finishes, so this never serves stale results.
+
+    Threads call do(); coroutines call do_async(). Both kinds of caller can
+    join the same flight, since each flight is a concurrent.futures.Future.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.stats = {"upstream_calls": 0, "coalesced_calls": 0, "errors": 0}
+
+    def _join(self, key):
+        """Return (future, is_leader) for key"""
+        with self._lock:
+            future = self._flights.get(key)
+            if future is None:
+                future = Future()
+                self._flights[key] = future
+                self.stats["upstream_calls"] += 1
+                return future, True
+            self.stats["coalesced_calls"] += 1
+            stats = dict(self.stats)
+        # Log outside the lock so a slow stdout never blocks other callers
+        print(f"Joining in-flight call for {key.split(':')[0]}: {stats}")
+        return future, False
+
+    def _finish(self, key, future, result=None, error=None):
+        with self._lock:
+            self._flights.pop(key, None)
+            if error is not None:
+                self.stats["errors"] += 1
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) once for all concurrent callers with this key"""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    async def do_async(self, key, fn, *args, **kwargs):
+        """
+        Async variant of do(). fn may be a coroutine function; a plain function
+        is run in the loop's default executor so it does not block the loop.
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            if inspect.iscoroutinefunction(fn):
+                result = await fn(*args, **kwargs)
+            else:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(None, lambda: fn(*args, **kwargs))
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    def report(self):
+        """Counters, including the share of calls that were saved"""
+        with self._lock:
+            in_flight = len(self._flights)
+            stats = dict(self.stats)
+        total = stats["upstream_calls"] + stats["coalesced_calls"]
+        return dict(stats, in_flight=in_flight,
+                    saved_ratio=stats["coalesced_calls"] / total if total else 0.0)
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,45 @@
+import os
+import sys
+import importlib.util
+import pytest
+
+# The repository root is the `app` package (modules import each other as app.*)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if 'app' not in sys.modules:
+    spec = importlib.util.spec_from_file_location('app', os.path.join(ROOT, '__init__.py'),
+                                                  submodule_search_locations=[ROOT])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['app'] = module
+    spec.loader.exec_module(module)
+
+
+@pytest.fixture
+def flask_app(tmp_path):
+    """Minimal app bound to a scratch SQLite database with all tables created"""
+    from flask import Flask
+    from app.models import db
+
+    app = Flask("health_tracker_tests")
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + str(tmp_path / 'test.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(flask_app, monkeypatch):
+    """Test client for the main blueprint, with the AI calls replaced by canned answers"""
+    from app import routes
+    from app.routes import main
+
+    flask_app.template_folder = os.path.join(ROOT, 'templates')
+    flask_app.static_folder = os.path.join(ROOT, 'static')
+    flask_app.config.update(SECRET_KEY='test', WTF_CSRF_ENABLED=False)
+    flask_app.register_blueprint(main)
+    monkeypatch.setattr(routes, 'get_insights_and_recommendations',
+                        lambda latest, recent: ("Insights", ["Recommendation"]))
+    return flask_app.test_client()
@@ -0,0 +1,29 @@
+import json
+from app.alerts import AlertHub
+
+
+def _drain(subscriber):
+    events = []
+    while not subscriber.empty():
+        events.append(subscriber.get_nowait())
+    return [json.loads(data)['n'] for _, data in events]
+
+
+def test_reconnect_replays_events_after_last_event_id():
+    hub = AlertHub()
+    ids = [hub.publish({'n': n}) for n in range(5)]
+    assert _drain(hub.subscribe(ids[2])) == [3, 4]
+    assert _drain(hub.subscribe(ids[-1])) == []
+
+
+def test_ids_from_another_worker_or_restart_replay_nothing():
+    first, second = AlertHub(), AlertHub()
+    first_ids = [first.publish({'n': n}) for n in range(3)]
+    second_ids = [second.publish({'n': n}) for n in range(3)]
+
+    # Each worker numbers its events from 1, but the ids never collide
+    assert not set(first_ids) & set(second_ids)
+    assert _drain(second.subscribe(first_ids[0])) == []
+    # Bare numbers from before epoch-prefixed ids, and junk, are ignored too
+    assert _drain(second.subscribe('1')) == []
+    assert _drain(second.subscribe('not-an-id')) == []
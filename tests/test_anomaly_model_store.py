@@ -0,0 +1,64 @@
+import time
+import threading
+import numpy as np
+from app.models import AnomalyModelStore
+
+
+def test_counters_stay_consistent_across_threads(tmp_path):
+    store = AnomalyModelStore(store_dir=str(tmp_path), max_size=4)
+    X = np.random.default_rng(0).normal(size=(50, 3))
+    store.predict('user-1', X)
+
+    threads = [threading.Thread(target=lambda: [store.predict('user-1', X) for _ in range(10)])
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert store.stats['predicts'] == 81
+    assert store.stats['fits'] == 1
+    assert store.stats['memory_hits'] == 80
+    assert store.hit_rate() == 80 / 81
+
+
+def _window(seed=0):
+    return np.random.default_rng(seed).normal(size=(50, 3))
+
+
+def test_refits_when_the_training_window_changes(tmp_path):
+    store = AnomalyModelStore(store_dir=str(tmp_path))
+    first = store.get_model('user-1', _window(0))
+    assert store.get_model('user-1', _window(0)) is first
+
+    second = store.get_model('user-1', _window(1))
+    assert second is not first
+    assert store.stats['fits'] == 2 and store.stats['memory_hits'] == 1
+
+
+def test_refits_after_max_age(tmp_path, monkeypatch):
+    store = AnomalyModelStore(store_dir=str(tmp_path), max_age=60)
+    X = _window()
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now)
+    first = store.get_model('user-1', X)
+    monkeypatch.setattr(time, 'time', lambda: now + 59)
+    assert store.get_model('user-1', X) is first
+
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+    assert store.get_model('user-1', X) is not first
+    # The stale copy on disk is not reused either
+    assert store.stats['fits'] == 2 and store.stats['disk_hits'] == 0
+
+
+def test_fresh_store_loads_the_model_from_disk(tmp_path):
+    X = _window()
+    AnomalyModelStore(store_dir=str(tmp_path)).predict('user-1', X)
+
+    fresh = AnomalyModelStore(store_dir=str(tmp_path))
+    predictions = fresh.predict('user-1', X)
+    assert fresh.stats['fits'] == 0 and fresh.stats['disk_hits'] == 1
+    assert len(predictions) == len(X)
+    # Cached in memory after the first disk load
+    fresh.predict('user-1', X)
+    assert fresh.stats['memory_hits'] == 1
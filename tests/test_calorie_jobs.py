@@ -0,0 +1,64 @@
+import json
+import datetime
+from app import calorie_jobs
+from app.calorie_jobs import get_calorie_job, CALORIE_JOB_TIMEOUT, CALORIE_JOB_QUEUE_TIMEOUT
+from app.models import db, CalorieJob
+
+
+def _job(job_id, status, age_seconds):
+    moment = datetime.datetime.utcnow() - datetime.timedelta(seconds=age_seconds)
+    db.session.add(CalorieJob(id=job_id, status=status, stages=json.dumps({}),
+                              created_at=moment, updated_at=moment))
+    db.session.commit()
+
+
+def test_stale_running_job_is_marked_failed(flask_app):
+    _job('stale', 'running', CALORIE_JOB_TIMEOUT + 60)
+    job = get_calorie_job('stale')
+    assert job['status'] == 'failed'
+    assert job['error']
+
+
+def test_recent_running_job_is_left_alone(flask_app):
+    _job('busy', 'running', 5)
+    assert get_calorie_job('busy')['status'] == 'running'
+
+
+def test_queued_job_waits_longer_than_the_run_timeout(flask_app):
+    # Still waiting behind other jobs, not lost
+    _job('waiting', 'queued', CALORIE_JOB_TIMEOUT + 60)
+    assert get_calorie_job('waiting')['status'] == 'queued'
+    _job('lost', 'queued', CALORIE_JOB_QUEUE_TIMEOUT + 60)
+    assert get_calorie_job('lost')['status'] == 'failed'
+
+
+def test_worker_does_not_overwrite_a_failed_job(flask_app, monkeypatch):
+    _job('late', 'queued', CALORIE_JOB_QUEUE_TIMEOUT + 60)
+    assert get_calorie_job('late')['status'] == 'failed'
+
+    ran = []
+    monkeypatch.setattr(calorie_jobs, 'lookup_meal_nutrition', lambda items: ran.append(items) or ([], {}))
+    calorie_jobs._run_job(flask_app, 'late', None, None, 'apple')
+
+    job = get_calorie_job('late')
+    assert (job['status'], job['result']) == ('failed', None)
+    assert ran == []
+
+
+def test_stale_check_does_not_overwrite_a_job_that_just_finished(flask_app):
+    _job('racing', 'running', CALORIE_JOB_TIMEOUT + 60)
+    job = CalorieJob.query.get('racing')
+    # The worker finishes between the status read and the stale update
+    db.session.execute(CalorieJob.__table__.update().where(CalorieJob.id == 'racing')
+                       .values(status='done', updated_at=datetime.datetime.utcnow()))
+    calorie_jobs._fail_if_stale(job)
+    assert job.status == 'done'
+
+
+def test_finished_job_is_never_failed(flask_app):
+    _job('old', 'done', CALORIE_JOB_TIMEOUT * 10)
+    assert get_calorie_job('old')['status'] == 'done'
+
+
+def test_missing_job(flask_app):
+    assert get_calorie_job('nope') is None
@@ -0,0 +1,103 @@
+import datetime
+import threading
+import pandas as pd
+import pytest
+from app.models import (db, VitalsData, DailyVitalsRollup, ROLLUP_METRICS, generate_synthetic_vitals,
+                        backfill_daily_rollups, update_daily_rollup, get_daily_rollups, get_steps_leaderboard)
+
+
+@pytest.fixture
+def raw_vitals(flask_app):
+    generate_synthetic_vitals(3000, users=20, days=40)
+    rows = db.session.query(VitalsData.user_id, VitalsData.date, VitalsData.timestamp,
+                            *[getattr(VitalsData, metric) for metric in ROLLUP_METRICS]).all()
+    return pd.DataFrame(rows, columns=['user_id', 'date', 'timestamp'] + ROLLUP_METRICS)
+
+
+def _aggregate(df):
+    """Per user-day aggregates computed straight from the raw rows"""
+    df = df.sort_values('timestamp')
+    grouped = df.groupby(['user_id', 'date'])
+    expected = {}
+    for (user_id, day), group in grouped:
+        expected[(user_id, day.strftime('%Y-%m-%d'))] = {
+            'count': len(group),
+            **{metric: {'min': float(group[metric].min()), 'max': float(group[metric].max()),
+                        'mean': pytest.approx(float(group[metric].mean())),
+                        'last': float(group[metric].iloc[-1])} for metric in ROLLUP_METRICS}
+        }
+    return expected
+
+
+def _rollups():
+    rollups = get_daily_rollups(days=60)
+    return {(r['user_id'], r['date']): {k: v for k, v in r.items() if k not in ('user_id', 'date')}
+            for r in rollups}
+
+
+def test_backfill_matches_raw_aggregates(raw_vitals):
+    backfill_daily_rollups(batch_size=50)
+    assert _rollups() == _aggregate(raw_vitals)
+
+
+def test_incremental_updates_match_raw_aggregates(raw_vitals):
+    # Fold the rows in shuffled order, as concurrent writers would
+    for vitals in VitalsData.query.order_by(VitalsData.steps).all():
+        update_daily_rollup(vitals)
+    db.session.commit()
+    assert _rollups() == _aggregate(raw_vitals)
+
+
+def test_leaderboard_matches_raw_scan(raw_vitals):
+    backfill_daily_rollups()
+    cutoff = (datetime.datetime.now() - datetime.timedelta(days=30)).date()
+    recent = raw_vitals[raw_vitals['date'] >= cutoff]
+    # Each user-day's best entry, ranked by steps
+    best = recent.groupby(['user_id', 'date'])['steps'].max().sort_values(ascending=False).head(10)
+    assert [entry['steps'] for entry in get_steps_leaderboard(days=30, limit=10)] == best.tolist()
+    assert DailyVitalsRollup.query.count() == raw_vitals.groupby(['user_id', 'date']).ngroups
+
+
+def test_concurrent_samples_for_the_same_day(flask_app):
+    day = datetime.date.today()
+    start = threading.Barrier(2)
+    errors = []
+
+    def save(heart_rate, minute):
+        with flask_app.app_context():
+            try:
+                vitals = VitalsData(user_id=7, heart_rate=heart_rate, sleep_hours=7, steps=1000 * minute, mood=3,
+                                    date=day, timestamp=datetime.datetime.combine(day, datetime.time(8, minute)))
+                db.session.add(vitals)
+                start.wait()
+                update_daily_rollup(vitals)
+                db.session.commit()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    writers = [threading.Thread(target=save, args=(60, 1)), threading.Thread(target=save, args=(90, 2))]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    assert errors == []
+    rollup = get_daily_rollups(days=1, user_id=7)[0]
+    assert rollup['count'] == 2
+    assert rollup['heart_rate'] == {'min': 60.0, 'max': 90.0, 'mean': 75.0, 'last': 90.0}
+    assert rollup['steps']['last'] == 2000.0
+
+
+def test_second_sample_updates_existing_rollup(flask_app):
+    day = datetime.date.today()
+    for minute, steps in ((5, 4000), (1, 9000)):
+        vitals = VitalsData(user_id=8, heart_rate=70, sleep_hours=7, steps=steps, mood=3, date=day,
+                            timestamp=datetime.datetime.combine(day, datetime.time(9, minute)))
+        db.session.add(vitals)
+        update_daily_rollup(vitals)
+        db.session.commit()
+    rollup = get_daily_rollups(days=1, user_id=8)[0]
+    # The earlier timestamp arrived last, so it must not become the "last" value
+    assert rollup['count'] == 2 and rollup['steps'] == {'min': 4000.0, 'max': 9000.0, 'mean': 6500.0, 'last': 4000.0}
@@ -0,0 +1,146 @@
+import time
+import threading
+import datetime
+import smtplib
+import pytest
+from app import email_service
+from app.email_service import SMTPConnection, drain_outbox, queue_health_notification, _claim_next_email
+from app.models import db, EmailOutbox
+
+
+class FakeSMTP:
+    """Stand-in for smtplib.SMTP that records connections and messages"""
+
+    instances = []
+
+    def __init__(self, host, port, timeout=None):
+        self.sent = []
+        self.fail_for = set()
+        FakeSMTP.instances.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        pass
+
+    def send_message(self, msg):
+        if msg['To'] in FakeSMTP.fail_for:
+            raise smtplib.SMTPRecipientsRefused({msg['To']: (550, b'rejected')})
+        self.sent.append(msg['To'])
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    FakeSMTP.instances = []
+    FakeSMTP.fail_for = set()
+    monkeypatch.setattr(email_service.smtplib, 'SMTP', FakeSMTP)
+    monkeypatch.setenv('MAIL_USERNAME', 'sender@example.com')
+    monkeypatch.setenv('MAIL_PASSWORD', 'password')
+    return FakeSMTP
+
+
+def test_one_connection_is_reused_across_emails(flask_app, smtp):
+    count = 200
+    for i in range(count):
+        queue_health_notification(f'user{i}@example.com', 'Health update', '<p>hi</p>')
+
+    connection = SMTPConnection('sender@example.com', 'password')
+    start = time.perf_counter()
+    assert drain_outbox(connection) == count
+    elapsed = time.perf_counter() - start
+    print(f"Delivered {count} outbox emails in {elapsed:.2f}s ({count / elapsed:.0f} msgs/s)")
+
+    assert len(smtp.instances) == 1
+    assert len(smtp.instances[0].sent) == count
+    assert EmailOutbox.query.filter_by(status='sent').count() == count
+
+
+def test_failed_delivery_is_rescheduled_with_backoff(flask_app, smtp, monkeypatch):
+    monkeypatch.setattr(email_service, 'OUTBOX_MAX_ATTEMPTS', 3)
+    smtp.fail_for = {'bounce@example.com'}
+    queue_health_notification('bounce@example.com', 'Health update', '<p>hi</p>')
+    connection = SMTPConnection('sender@example.com', 'password')
+
+    delays = []
+    for attempt in range(1, 3):
+        before = datetime.datetime.utcnow()
+        assert drain_outbox(connection) == 1
+        email = EmailOutbox.query.one()
+        assert (email.status, email.attempts, email.claimed_at) == ('pending', attempt, None)
+        delays.append((email.next_attempt_at - before).total_seconds())
+        # Not due yet, so nothing is claimed until the backoff has passed
+        assert drain_outbox(connection) == 0
+        email.next_attempt_at = datetime.datetime.utcnow()
+        db.session.commit()
+
+    base = email_service.OUTBOX_BACKOFF_BASE
+    assert base <= delays[0] < base + 5
+    assert 2 * base <= delays[1] < 2 * base + 5
+
+    assert drain_outbox(connection) == 1
+    assert EmailOutbox.query.one().status == 'failed'
+
+
+def test_expired_sending_lease_is_reclaimed(flask_app, smtp):
+    now = datetime.datetime.utcnow()
+    stale = datetime.timedelta(seconds=email_service.OUTBOX_LEASE_SECONDS + 1)
+    for address, claimed_at in (('stale@example.com', now - stale), ('busy@example.com', now)):
+        db.session.add(EmailOutbox(to_email=address, subject='s', html_content='c',
+                                   status='sending', attempts=1, claimed_at=claimed_at))
+    db.session.commit()
+
+    email = _claim_next_email()
+    assert email.to_email == 'stale@example.com'
+    assert email.attempts == 2
+    # The row another worker is still delivering is left alone
+    assert _claim_next_email() is None
+
+
+def test_queue_reports_failure_without_credentials(flask_app, monkeypatch):
+    monkeypatch.delenv('MAIL_USERNAME', raising=False)
+    monkeypatch.delenv('MAIL_PASSWORD', raising=False)
+    assert queue_health_notification('user@example.com', 'Health update', '<p>hi</p>') is False
+    assert EmailOutbox.query.count() == 0
+
+
+def test_every_waiting_worker_sees_a_wakeup():
+    seen = email_service._outbox_generation
+    woken = []
+    waiters = [threading.Thread(target=lambda: woken.append(email_service._wait_for_outbox(seen, timeout=5)))
+               for _ in range(3)]
+    for waiter in waiters:
+        waiter.start()
+    time.sleep(0.05)
+    start = time.perf_counter()
+    email_service._wake_outbox_workers()
+    for waiter in waiters:
+        waiter.join()
+    assert len(woken) == 3 and time.perf_counter() - start < 1
+
+
+def test_worker_without_credentials_does_not_spin(flask_app, monkeypatch):
+    calls = []
+    stop = threading.Event()
+
+    def no_credentials():
+        calls.append(1)
+        return None, None
+
+    monkeypatch.setattr(email_service, '_get_credentials', no_credentials)
+    monkeypatch.setattr(email_service, 'OUTBOX_POLL_INTERVAL', 0.05)
+    worker = threading.Thread(target=email_service._outbox_worker, args=(flask_app, stop), daemon=True)
+    worker.start()
+    for _ in range(5):
+        email_service._wake_outbox_workers()
+        time.sleep(0.1)
+    stop.set()
+    email_service._wake_outbox_workers()
+    worker.join(2)
+
+    # About one check per poll interval or wakeup, not a busy loop
+    assert not worker.is_alive()
+    assert len(calls) < 40
@@ -0,0 +1,117 @@
+import time
+import threading
+from types import SimpleNamespace
+import pytest
+from app import gemini_service
+from app.resilience import Provider, CircuitOpenError
+
+
+class FakeGenai:
+    """Stand-in for google.generativeai that counts list_models() round trips"""
+
+    def __init__(self, names):
+        self.names = names
+        self.calls = 0
+
+    def list_models(self):
+        self.calls += 1
+        return [SimpleNamespace(name=name, supported_generation_methods=['generateContent'])
+                for name in self.names]
+
+
+def _select_model_uncached(genai):
+    """Model selection as it ran on every insight request before the cache"""
+    available_models = [m.name for m in genai.list_models()]
+    for model_option in ["gemini-pro", "gemini-1.0-pro", "gemini-1.5-pro"]:
+        if model_option in str(available_models):
+            return model_option
+    for model in genai.list_models():
+        if "generateContent" in model.supported_generation_methods:
+            return model.name
+    return None
+
+
+@pytest.fixture
+def fresh_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(gemini_service, 'MODEL_CACHE_FILE', str(tmp_path / 'gemini_model.json'))
+    monkeypatch.setattr(gemini_service, '_model_cache', {"name": None, "resolved_at": 0.0})
+    monkeypatch.setattr(gemini_service, 'model_cache_stats', {"hits": 0, "misses": 0, "refreshes": 0})
+    # A breaker of its own, so failures here do not open the shared Gemini circuit
+    breaker = Provider('gemini', default_timeout=5.0, failure_threshold=1)
+    monkeypatch.setattr(gemini_service, 'provider', lambda name: breaker)
+    return breaker
+
+
+@pytest.mark.parametrize('names', [
+    ['models/embedding-001', 'models/gemini-1.5-pro', 'models/gemini-pro'],
+    ['models/text-bison-001'],
+])
+def test_cached_resolution_matches_uncached_selection(fresh_cache, monkeypatch, names):
+    fake = FakeGenai(names)
+    monkeypatch.setattr(gemini_service, 'genai', fake)
+
+    resolved = [gemini_service.resolve_model_name() for _ in range(50)]
+
+    assert set(resolved) == {_select_model_uncached(FakeGenai(names))}
+    assert fake.calls == 1
+    assert gemini_service.model_cache_stats == {"hits": 49, "misses": 1, "refreshes": 0}
+
+
+def test_other_workers_reuse_the_cache_file(fresh_cache, monkeypatch):
+    fake = FakeGenai(['models/gemini-pro'])
+    monkeypatch.setattr(gemini_service, 'genai', fake)
+    gemini_service.resolve_model_name()
+
+    # A second process starts with an empty in-memory cache
+    monkeypatch.setattr(gemini_service, '_model_cache', {"name": None, "resolved_at": 0.0})
+    assert gemini_service.resolve_model_name() == 'gemini-pro'
+    assert fake.calls == 1
+
+
+def test_stale_entry_is_served_while_refreshing(fresh_cache, monkeypatch):
+    fake = FakeGenai(['models/gemini-1.0-pro'])
+    monkeypatch.setattr(gemini_service, 'genai', fake)
+    monkeypatch.setattr(gemini_service, '_model_cache',
+                        {"name": "gemini-pro", "resolved_at": time.time() - gemini_service.MODEL_CACHE_TTL - 1})
+
+    assert gemini_service.resolve_model_name() == 'gemini-pro'
+    deadline = time.monotonic() + 5
+    while gemini_service.model_cache_stats["refreshes"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert gemini_service.resolve_model_name() == 'gemini-1.0-pro'
+    assert fake.calls == 1
+
+
+class FailingGenai:
+    def __init__(self):
+        self.calls = 0
+
+    def list_models(self):
+        self.calls += 1
+        raise ConnectionError('Gemini is unreachable')
+
+
+def test_discovery_goes_through_the_circuit_breaker(fresh_cache, monkeypatch):
+    failing = FailingGenai()
+    monkeypatch.setattr(gemini_service, 'genai', failing)
+
+    with pytest.raises(ConnectionError):
+        gemini_service.resolve_model_name()
+    # The circuit is open now, so discovery fails fast without a round trip
+    with pytest.raises(CircuitOpenError):
+        gemini_service.resolve_model_name()
+    assert failing.calls == 1
+    assert fresh_cache.stats["rejected"] == 1
+
+
+def test_counters_are_exact_under_concurrent_requests(fresh_cache, monkeypatch):
+    monkeypatch.setattr(gemini_service, 'genai', FakeGenai(['models/gemini-pro']))
+    gemini_service.resolve_model_name()
+
+    threads = [threading.Thread(target=lambda: [gemini_service.resolve_model_name() for _ in range(500)])
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert gemini_service.model_cache_stats == {"hits": 4000, "misses": 1, "refreshes": 0}
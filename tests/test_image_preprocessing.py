@@ -0,0 +1,60 @@
+import io
+import os
+import glob
+import pytest
+from PIL import Image
+from app.food_recognition import prepare_image_for_upload, IMAGE_MAX_EDGE
+
+UPLOADS = glob.glob(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 'static', 'uploads', '*'))
+
+
+def _encode(img, fmt, **params):
+    output = io.BytesIO()
+    img.save(output, format=fmt, **params)
+    return output.getvalue()
+
+
+def _open(data):
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    return img
+
+
+def test_large_png_is_downscaled_to_jpeg():
+    original = _encode(Image.effect_noise((3000, 2000), 40).convert('RGBA'), 'PNG')
+    data, mime = prepare_image_for_upload(original)
+    img = _open(data)
+    assert mime == 'image/jpeg' and img.format == 'JPEG'
+    assert max(img.size) == IMAGE_MAX_EDGE and img.size[0] > img.size[1]
+    assert len(data) < len(original)
+
+
+def test_exif_orientation_is_applied_and_metadata_dropped():
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise
+    original = _encode(Image.new('RGB', (400, 200), 'red'), 'JPEG', exif=exif.tobytes())
+    data, mime = prepare_image_for_upload(original)
+    img = _open(data)
+    assert img.size == (200, 400)
+    assert 'exif' not in img.info
+
+
+def test_small_image_is_sent_unchanged():
+    original = _encode(Image.new('RGB', (64, 64), 'green'), 'PNG', optimize=True)
+    assert prepare_image_for_upload(original) == (original, 'image/png')
+
+
+def test_unreadable_bytes_are_sent_unchanged():
+    assert prepare_image_for_upload(b'not an image') == (b'not an image', 'image/jpeg')
+
+
+@pytest.mark.parametrize('path', UPLOADS, ids=os.path.basename)
+def test_sample_uploads_never_grow(path):
+    with open(path, 'rb') as f:
+        original = f.read()
+    data, mime = prepare_image_for_upload(original)
+    img = _open(data)
+    assert data == original or max(img.size) <= IMAGE_MAX_EDGE
+    assert len(data) <= len(original)
+    assert mime == Image.MIME[img.format]
@@ -0,0 +1,51 @@
+import random
+import pytest
+from app.direct_chatbot import INTENT_CATEGORIES, KeywordMatcher, intent_matcher
+
+QUESTIONS = [
+    "How can I get better sleep when I'm stressed?",
+    "what is a normal heart rate in bpm",
+    "Is 10000 steps a day enough walking?",
+    "I feel tired and can't rest, maybe my diet is bad",
+    "how much water should I drink after running",
+    "does melatonin help with insomnia and waking up at night",
+    "type 2 diabetes and blood sugar after a meal",
+    "",
+    "hello there",
+]
+
+
+def _scores_per_keyword(question):
+    """get_fallback_response's scoring before the matcher: one substring check per keyword"""
+    return {category: sum(1 for keyword in keywords if keyword in question)
+            for category, keywords in INTENT_CATEGORIES.items()}
+
+
+def _random_questions(count=5000):
+    rng = random.Random(21)
+    keywords = sorted({keyword for words in INTENT_CATEGORIES.values() for keyword in words})
+    fillers = ['', ' ', 'the ', 'my ', 'x', 'ing ', 'un', '?', ', ']
+    for _ in range(count):
+        parts = [rng.choice(keywords if rng.random() < 0.6 else fillers) for _ in range(rng.randint(0, 8))]
+        # Glue some keywords together so matches overlap and sit inside other words
+        yield ''.join(parts) if rng.random() < 0.5 else ' '.join(parts)
+
+
+@pytest.mark.parametrize('question', QUESTIONS)
+def test_scores_match_per_keyword_counts(question):
+    question = question.lower()
+    assert intent_matcher.scores(question) == _scores_per_keyword(question)
+
+
+def test_scores_match_on_random_keyword_mixes():
+    mismatches = [q for q in _random_questions() if intent_matcher.scores(q) != _scores_per_keyword(q)]
+    assert mismatches == []
+
+
+def test_overlapping_and_prefix_keywords():
+    matcher = KeywordMatcher({'a': ['rest', 'stress'], 'b': ['walk', 'walking'], 'c': ['wake up']})
+    assert matcher.matches('stress') == {'stress'}
+    assert matcher.matches('distressed') == {'stress'}
+    assert matcher.matches('interest') == {'rest'}
+    assert matcher.matches('walking and wake up') == {'walk', 'walking', 'wake up'}
+    assert matcher.scores('stressful rest') == {'a': 2, 'b': 0, 'c': 0}
@@ -0,0 +1,67 @@
+import os
+import pytest
+import sqlalchemy as sa
+from flask import Flask
+from flask_migrate import Migrate, upgrade
+from app.models import db
+from conftest import ROOT
+
+MIGRATIONS = os.path.join(ROOT, 'migrations')
+
+
+@pytest.fixture
+def migrate_app(tmp_path):
+    app = Flask("health_tracker_migrations")
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + str(tmp_path / 'migrate.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    Migrate(app, db, directory=MIGRATIONS)
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+def _inspector():
+    return sa.inspect(db.engine)
+
+
+def test_upgrade_fresh_database_to_head(migrate_app):
+    upgrade(directory=MIGRATIONS)
+    inspector = _inspector()
+    assert {'users', 'vitals_data'} <= set(inspector.get_table_names())
+    indexes = {index['name'] for index in inspector.get_indexes('vitals_data')}
+    assert {'ix_vitals_data_date_id', 'ix_vitals_data_user_date_id',
+            'ux_vitals_data_user_timestamp'} <= indexes
+
+
+def test_upgrade_database_created_by_create_all(migrate_app):
+    db.create_all()
+    upgrade(directory=MIGRATIONS)
+    assert 'alembic_version' in _inspector().get_table_names()
+
+
+def test_migrated_schema_matches_models(migrate_app):
+    upgrade(directory=MIGRATIONS)
+    inspector = _inspector()
+    for table in db.metadata.sorted_tables:
+        assert table.name in inspector.get_table_names(), table.name
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        assert {column.name for column in table.columns} <= columns, table.name
+
+
+def test_unique_index_migration_removes_duplicates(migrate_app):
+    upgrade(directory=MIGRATIONS, revision='3f1c2a9d7b10')
+    rows = [(1, '2026-01-01 08:00:00'), (1, '2026-01-01 08:00:00'), (1, '2026-01-01 08:00:00'),
+            (2, '2026-01-01 08:00:00'), (None, '2026-01-01 08:00:00'), (None, '2026-01-01 08:00:00')]
+    with db.engine.begin() as conn:
+        for user_id, timestamp in rows:
+            conn.execute(sa.text("INSERT INTO vitals_data (user_id, heart_rate, date, timestamp) "
+                                 "VALUES (:user_id, 70, '2026-01-01', :timestamp)"),
+                         {'user_id': user_id, 'timestamp': timestamp})
+
+    upgrade(directory=MIGRATIONS, revision='8b4e6d21c5a3')
+
+    with db.engine.connect() as conn:
+        remaining = conn.execute(sa.text("SELECT id, user_id FROM vitals_data ORDER BY id")).fetchall()
+    # The newest duplicate for user 1 survives; rows without a user are untouched
+    assert [tuple(row) for row in remaining] == [(3, 1), (4, 2), (5, None), (6, None)]
@@ -0,0 +1,89 @@
+import os
+import pytest
+from app import nutrition_cache as cache_module
+from app.nutrition_cache import NutritionCache, cached_lookup
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    # A directory that does not exist yet, as on a fresh checkout
+    cache = NutritionCache(path=str(tmp_path / 'missing' / 'nutrition_cache.db'))
+    monkeypatch.setattr(cache_module, 'nutrition_cache', cache)
+    return cache
+
+
+def test_creates_missing_directory(cache):
+    cache.set('usda', 'Apple', {'calories': 52})
+    assert os.path.exists(cache.path)
+    assert cache.get('usda', ' apple ') == (True, {'calories': 52})
+    assert cache.stats['errors'] == 0
+
+
+def test_empty_result_is_cached_as_negative(cache):
+    calls = []
+
+    def fetch(name):
+        calls.append(name)
+        return None
+
+    assert cached_lookup('usda', 'dragonfruit', fetch) is None
+    assert cached_lookup('usda', 'dragonfruit', fetch) is None
+    assert len(calls) == 1
+    assert cache.stats['negative_hits'] == 1
+
+
+def test_transient_error_is_not_cached(cache):
+    calls = []
+
+    def fetch(name):
+        calls.append(name)
+        if len(calls) == 1:
+            raise TimeoutError('upstream timed out')
+        return {'calories': 95}
+
+    with pytest.raises(TimeoutError):
+        cached_lookup('nutritionix', 'banana', fetch)
+    assert cached_lookup('nutritionix', 'banana', fetch) == {'calories': 95}
+    assert len(calls) == 2
+
+
+def test_each_source_is_cached_under_its_own_provider(cache, tmp_path, monkeypatch):
+    from app import food_nutrition, usda_api
+    csv_path = tmp_path / 'foods.csv'
+    csv_path.write_text("food_item,calories,protein,fat,carbohydrates,fiber,sugar\napple,52,0.3,0.2,14,2.4,10.3\n")
+    monkeypatch.setattr(food_nutrition, 'CSV_PATH', str(csv_path))
+    monkeypatch.setattr(usda_api, '_fetch_usda_nutrition', lambda name: {'food_item': name, 'calories': 160})
+
+    assert food_nutrition.get_nutrition_data('Apple')['calories'] == 52
+    assert food_nutrition.get_nutrition_data('avocado') == {'food_item': 'avocado', 'calories': 160}
+    # The USDA answer lives only under "usda"; "csv" records the local miss
+    assert cache.get('csv', 'avocado') == (True, None)
+    assert cache.get('usda', 'avocado') == (True, {'food_item': 'avocado', 'calories': 160})
+    assert cache.get('usda', 'apple') == (False, None)
+
+
+def test_calorie_model_estimate_is_computed_once(monkeypatch):
+    from app import food_recognition
+
+    class Index:
+        averages = {'calories': 200.0, 'protein': 5.0, 'fat': 4.0, 'carbohydrates': 30.0, 'fiber': 2.0, 'sugar': 6.0}
+
+        def lookup(self, name):
+            return None
+
+    class Model:
+        calls = 0
+
+        def predict(self, features):
+            Model.calls += 1
+            return [180.0]
+
+    monkeypatch.setattr(food_recognition, 'get_nutrition_index', lambda: Index())
+    monkeypatch.setattr(food_recognition, 'calorie_model', Model())
+    monkeypatch.setattr(food_recognition, '_average_estimate', None)
+
+    first = food_recognition.get_nutrition_data('mystery stew')
+    second = food_recognition.get_nutrition_data('dragon roll')
+    assert (first['food_item'], first['calories']) == ('mystery stew', 180.0)
+    assert (second['food_item'], second['calories']) == ('dragon roll', 180.0)
+    assert Model.calls == 1
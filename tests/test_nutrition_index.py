@@ -0,0 +1,57 @@
+import random
+import pandas as pd
+import pytest
+from app.nutrition_index import NUTRITION_CSV_PATH, NUTRIENT_COLUMNS, NutritionIndex
+
+
+def _lookup_with_pandas(df, food_item):
+    """food_recognition.get_nutrition_data's matching before the index (plain substring)"""
+    food_item_lower = food_item.lower()
+    contains = lambda column, text: df[df[column].str.lower().str.contains(text, na=False, regex=False)]
+    matches = contains('Description', food_item_lower)
+    if len(matches) == 0:
+        matches = contains('Category', food_item_lower)
+    if len(matches) == 0 and ' ' in food_item_lower:
+        for word in food_item_lower.split():
+            if len(word) > 3:
+                word_matches = contains('Description', word)
+                if len(word_matches) > 0:
+                    matches = word_matches
+                    break
+    if len(matches) == 0:
+        return None
+    row = matches.iloc[0]
+    return {field: float(0 if pd.isna(row[column]) else row[column]) for field, column in NUTRIENT_COLUMNS.items()}
+
+
+@pytest.fixture(scope='module')
+def nutrition_df():
+    return pd.read_csv(NUTRITION_CSV_PATH)
+
+
+def _queries(df):
+    rng = random.Random(7)
+    descriptions = df['Description'].dropna().astype(str).tolist()
+    categories = df['Category'].dropna().astype(str).tolist()
+    queries = ['apple', 'Chicken breast', 'grilled salmon fillet', 'rice', 'xyzzy', 'pizza with extra cheese',
+               'ice cream', 'egg', 'a', 'raw', '', 'banana smoothie bowl', 'dragonfruit']
+    for text in rng.sample(descriptions, 100):
+        words = text.replace(',', ' ').split()
+        queries.append(text)
+        queries.append(rng.choice(words))
+        queries.append(' '.join(words[:2]))
+        queries.append(text[1:6])
+    queries.extend(rng.sample(categories, 20))
+    return queries
+
+
+def test_index_lookup_matches_pandas_scan(nutrition_df):
+    index = NutritionIndex(nutrition_df)
+    for query in _queries(nutrition_df):
+        assert index.lookup(query) == _lookup_with_pandas(nutrition_df, query), query
+
+
+def test_averages_match_column_means(nutrition_df):
+    index = NutritionIndex(nutrition_df)
+    for field, column in NUTRIENT_COLUMNS.items():
+        assert index.averages[field] == pytest.approx(nutrition_df[column].mean())
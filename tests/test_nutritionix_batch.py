@@ -0,0 +1,94 @@
+import json
+import pytest
+from app import nutritionix_service, nutrition_cache as cache_module
+from app.nutrition_cache import NutritionCache
+
+# What the natural-language endpoint returns for each line of a query
+CATALOG = {
+    'apple': {'food_name': 'apple', 'nf_calories': 95},
+    '2 eggs': {'food_name': 'eggs', 'nf_calories': 143},
+    'grilled chicken breast': {'food_name': 'chicken breast', 'nf_calories': 284},
+    'coffee with milk': {'food_name': 'coffee', 'nf_calories': 2},
+    'toast': {'food_name': 'toast', 'nf_calories': 64},
+}
+# Foods the parser only recognizes when they are queried on their own
+ALONE = {
+    'pb&j': {'food_name': 'peanut butter and jelly sandwich', 'nf_calories': 376},
+}
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self._payload = payload
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return self._payload
+
+
+class FakeNutritionix:
+    """Stand-in for the Nutritionix provider: parses one food per query line"""
+
+    def __init__(self):
+        self.queries = []
+
+    def post(self, url, session=None, headers=None, json=None):
+        self.queries.append(json['query'])
+        foods = [dict(CATALOG[line]) for line in json['query'].split('\n') if line in CATALOG]
+        if json['query'] in ALONE:
+            foods = [dict(ALONE[json['query']])]
+        if not foods:
+            return FakeResponse(404, {'message': "We couldn't match any of your foods"})
+        return FakeResponse(200, {'foods': foods})
+
+
+@pytest.fixture
+def fake_api(tmp_path, monkeypatch):
+    cache = NutritionCache(path=str(tmp_path / 'cache.db'))
+    monkeypatch.setattr(cache_module, 'nutrition_cache', cache)
+    monkeypatch.setattr(nutritionix_service, 'nutrition_cache', cache)
+    api = FakeNutritionix()
+    monkeypatch.setattr(nutritionix_service, 'provider', lambda name: api)
+    return api
+
+
+def test_batch_matches_per_item_lookups(fake_api, tmp_path, monkeypatch):
+    meal = ['apple', '2 eggs', 'grilled chicken breast', 'dragonfruit', 'coffee with milk']
+    per_item = [(nutritionix_service.get_nutritionix_data(name) or {}).get('foods', []) for name in meal]
+    assert len(fake_api.queries) == len(meal)
+
+    # Start over with an empty cache so the batch really hits the API
+    fresh = NutritionCache(path=str(tmp_path / 'batch.db'))
+    monkeypatch.setattr(cache_module, 'nutrition_cache', fresh)
+    monkeypatch.setattr(nutritionix_service, 'nutrition_cache', fresh)
+    fake_api.queries.clear()
+
+    assert nutritionix_service.get_nutritionix_batch(meal) == per_item
+    # The unresolved item is confirmed with a query of its own
+    assert fake_api.queries == ['\n'.join(meal), 'dragonfruit']
+
+
+def test_batch_only_requests_uncached_items(fake_api):
+    nutritionix_service.get_nutritionix_batch(['apple', 'toast'])
+    fake_api.queries.clear()
+
+    results = nutritionix_service.get_nutritionix_batch(['toast', '2 eggs', 'apple'])
+
+    assert fake_api.queries == ['2 eggs']
+    assert [foods[0]['food_name'] for foods in results] == ['toast', 'eggs', 'apple']
+
+
+def test_batch_leftover_is_not_cached_as_a_miss_when_found_alone(fake_api):
+    results = nutritionix_service.get_nutritionix_batch(['apple', 'pb&j', 'dragonfruit'])
+
+    assert fake_api.queries == ['apple\npb&j\ndragonfruit', 'pb&j', 'dragonfruit']
+    assert [foods[0]['nf_calories'] if foods else None for foods in results] == [95, 376, None]
+    cache = nutritionix_service.nutrition_cache
+    assert cache.get('nutritionix', 'pb&j') == (True, {'foods': [ALONE['pb&j']]})
+    # Only the item that a single query could not match either is a negative
+    assert cache.get('nutritionix', 'dragonfruit') == (True, None)
+
+    fake_api.queries.clear()
+    assert nutritionix_service.get_nutritionix_batch(['pb&j', 'dragonfruit']) == results[1:]
+    assert fake_api.queries == []
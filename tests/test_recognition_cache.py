@@ -0,0 +1,87 @@
+import io
+import threading
+from PIL import Image, ImageDraw
+from app.recognition_cache import RecognitionCache, dhash
+
+
+def _photo(size=(320, 240), flip=False, fmt='PNG', **params):
+    """A plate-like test image: a light disc on a horizontal gradient"""
+    img = Image.linear_gradient('L').rotate(90).resize(size).convert('RGB')
+    draw = ImageDraw.Draw(img)
+    draw.ellipse((size[0] // 4, size[1] // 4, size[0] * 3 // 4, size[1] * 3 // 4), fill=(230, 200, 120))
+    if flip:
+        img = img.transpose(Image.FLIP_LEFT_RIGHT).transpose(Image.FLIP_TOP_BOTTOM)
+    output = io.BytesIO()
+    img.save(output, format=fmt, **params)
+    return output.getvalue()
+
+
+def _cache(tmp_path, **kwargs):
+    return RecognitionCache(path=str(tmp_path / 'recognition.db'), **kwargs)
+
+
+def _remember(cache, image, food_items):
+    found, sha, phash = cache.lookup(image)
+    assert found is None
+    cache.store(sha, dhash(image) if phash is None else phash, food_items, model_seconds=1.0)
+
+
+def test_exact_hit(tmp_path):
+    cache = _cache(tmp_path)
+    image = _photo()
+    _remember(cache, image, ['Pasta'])
+    assert cache.lookup(image)[0] == ['Pasta']
+    assert cache.stats['exact_hits'] == 1
+
+
+def test_near_duplicate_within_threshold_is_a_hit(tmp_path):
+    cache = _cache(tmp_path, threshold=5)
+    original = _photo()
+    # Same photo resized and re-encoded, as a phone upload would be
+    near = _photo(size=(288, 216), fmt='JPEG', quality=60)
+    assert near != original and bin(dhash(original) ^ dhash(near)).count('1') <= 5
+    _remember(cache, original, ['Pasta'])
+    assert cache.lookup(near)[0] == ['Pasta']
+    assert cache.stats['near_hits'] == 1
+
+
+def test_different_photo_above_threshold_is_a_miss(tmp_path):
+    cache = _cache(tmp_path, threshold=5)
+    original, other = _photo(), _photo(flip=True)
+    assert bin(dhash(original) ^ dhash(other)).count('1') > 5
+    _remember(cache, original, ['Pasta'])
+    assert cache.lookup(other)[0] is None
+    assert cache.stats['misses'] == 2
+
+
+def test_entries_are_bounded_in_memory_and_on_disk(tmp_path):
+    cache = _cache(tmp_path, max_entries=3, threshold=0)
+    images = [_photo(size=(100 + 37 * i, 80 + 11 * i), flip=i % 2 == 1) for i in range(5)]
+    for i, image in enumerate(images):
+        _, sha, _ = cache.lookup(image)
+        cache.store(sha, None, [f'food {i}'])
+    assert len(cache._entries) == 3
+
+    reloaded = _cache(tmp_path, max_entries=3)
+    assert [reloaded.lookup(image)[0] for image in images[2:]] == [['food 2'], ['food 3'], ['food 4']]
+    assert len(reloaded._entries) == 3
+    with reloaded._connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM recognition_cache").fetchone()[0] == 3
+
+
+def test_counters_are_consistent_under_concurrent_lookups(tmp_path):
+    cache = _cache(tmp_path)
+    image = _photo()
+    _remember(cache, image, ['Pasta'])
+
+    def hit():
+        for _ in range(200):
+            cache.lookup(image)
+
+    workers = [threading.Thread(target=hit) for _ in range(8)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert cache.stats['exact_hits'] == 1600
+    assert cache.report()['hits'] == 1600
@@ -0,0 +1,70 @@
+import time
+import pytest
+from app.resilience import Provider, CircuitOpenError
+
+
+class FakeStream:
+    """Upstream chunk iterator that records whether it was closed"""
+
+    def __init__(self, chunks, delay=0.0):
+        self.chunks = list(chunks)
+        self.delay = delay
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.chunks:
+            raise StopIteration
+        time.sleep(self.delay)
+        return self.chunks.pop(0)
+
+    def close(self):
+        self.closed = True
+
+
+def test_stream_success_is_recorded():
+    breaker = Provider('test', default_timeout=1.0, failure_threshold=1)
+    upstream = FakeStream(['a', 'b', 'c'])
+    assert list(breaker.stream(lambda: upstream)) == ['a', 'b', 'c']
+    assert upstream.closed
+    assert breaker.stats['calls'] == 1 and breaker.stats['failures'] == 0
+    assert breaker.state == 'closed'
+
+
+def test_slow_chunk_times_out_and_opens_circuit():
+    breaker = Provider('test', default_timeout=0.2, failure_threshold=1)
+    upstream = FakeStream(['a', 'b'], delay=0.5)
+    chunks = breaker.stream(lambda: upstream)
+    with pytest.raises(TimeoutError):
+        list(chunks)
+    assert breaker.stats['failures'] == 1
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        next(breaker.stream(lambda: FakeStream(['x'])))
+
+
+def test_failure_part_way_is_recorded():
+    breaker = Provider('test', default_timeout=1.0, failure_threshold=1)
+
+    def broken():
+        yield 'a'
+        raise ConnectionError('reset by peer')
+
+    chunks = breaker.stream(broken)
+    assert next(chunks) == 'a'
+    with pytest.raises(ConnectionError):
+        next(chunks)
+    assert breaker.state == 'open'
+
+
+def test_closing_the_generator_closes_upstream():
+    breaker = Provider('test', default_timeout=1.0, failure_threshold=1)
+    upstream = FakeStream(['a', 'b', 'c'])
+    chunks = breaker.stream(lambda: upstream)
+    assert next(chunks) == 'a'
+    chunks.close()
+    assert upstream.closed
+    # An abandoned stream is neither a success nor a failure
+    assert breaker.stats['failures'] == 0 and breaker.state == 'closed'
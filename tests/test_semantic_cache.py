@@ -0,0 +1,44 @@
+import pytest
+from app.semantic_cache import SemanticCache, guard_tokens, normalize_question
+
+NS = 'chat'
+
+
+@pytest.fixture
+def cache():
+    return SemanticCache(threshold=0.85, ttl=60, max_entries=100)
+
+
+def test_paraphrase_is_a_semantic_hit(cache):
+    cache.set(NS, 'How can I improve my sleep quality?', 'answer')
+    assert cache.get(NS, 'how can i improve my sleep quality') == 'answer'
+    assert cache.get(NS, 'How do I improve my sleep quality?') == 'answer'
+    assert cache.stats['semantic_hits'] == 1
+
+
+@pytest.mark.parametrize('cached, asked', [
+    ('is 120 bpm normal', 'is 60 bpm normal'),
+    ('is 120 bpm normal', 'is 120 bpm normal for 40 year olds'),
+    ('should I eat before a run', 'should I not eat before a run'),
+    ('is it safe to exercise with a cold', 'is it safe to exercise without a cold'),
+    ('can I drink coffee before bed', "can't I drink coffee before bed"),
+    ('is it bad that I sleep 6 hours', "isn't it bad that I sleep 6 hours"),
+    ('do I need to take vitamin d supplements', "don't I need to take vitamin d supplements"),
+])
+def test_numbers_and_negations_must_match(cache, cached, asked):
+    cache.set(NS, cached, 'answer')
+    assert cache.get(NS, asked) is None
+
+
+def test_guard_tokens():
+    assert guard_tokens(normalize_question('Is 120 bpm normal?')) == {'120'}
+    assert guard_tokens(normalize_question("I don't sleep 8 hours")) == {'8', 'not'}
+    assert guard_tokens(normalize_question('I never nap')) == {'not'}
+    # "t" only counts after a word ending in "n"
+    assert guard_tokens(normalize_question("what's a t-cell")) == frozenset()
+
+
+def test_health_context_separates_answers(cache):
+    cache.set(NS, 'how is my heart rate', 'fast', {'heart_rate': 120})
+    assert cache.get(NS, 'how is my heart rate', {'heart_rate': 70}) is None
+    assert cache.get(NS, 'how is my heart rate', {'heart_rate': 130}) == 'fast'
@@ -0,0 +1,73 @@
+from flask import Flask, session
+from app.server_session import ServerSideSessionInterface, SQLiteSessionStore
+
+
+def _app(tmp_path):
+    app = Flask("session_tests")
+    app.secret_key = 'test-secret'
+    app.session_interface = ServerSideSessionInterface(SQLiteSessionStore(str(tmp_path / 'sessions.db')),
+                                                       sweep_interval=0)
+
+    @app.route('/set')
+    def set_value():
+        session['results'] = {'food_items': ['apple'] * 50, 'total_calories': 4750}
+        return 'ok'
+
+    @app.route('/get')
+    def get_value():
+        return str(session.get('results', {}).get('total_calories'))
+
+    return app
+
+
+def test_session_round_trip_and_savings_are_logged(tmp_path, capsys):
+    app = _app(tmp_path)
+    client = app.test_client()
+
+    response = client.get('/set')
+    cookie = response.headers['Set-Cookie'].split(';')[0].split('=', 1)[1]
+    assert client.get('/get').data == b'4750'
+
+    stats = app.session_interface.stats
+    assert stats['saves'] == 1 and stats['server_session_cookie_bytes'] == len(cookie)
+    assert stats['cookie_session_bytes'] > len(cookie)
+    saved = stats['cookie_session_bytes'] - len(cookie)
+    assert f"{saved} bytes saved" in capsys.readouterr().out
+
+
+def test_sessions_are_kept_in_the_migrated_app_database(tmp_path, monkeypatch):
+    import sqlite3
+    from flask_migrate import Migrate, upgrade
+    from app import server_session
+    from app.models import db
+    from conftest import ROOT
+
+    monkeypatch.setattr(server_session, 'SESSION_DB_PATH', None)
+    app = _app(tmp_path)
+    database = tmp_path / 'health_tracker.db'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{database}'
+    db.init_app(app)
+    migrations = f'{ROOT}/migrations'
+    Migrate(app, db, directory=migrations)
+    with app.app_context():
+        upgrade(directory=migrations)
+        db.session.remove()
+
+    server_session.init_app(app)
+    assert app.session_interface.store.path == str(database)
+
+    client = app.test_client()
+    client.get('/set')
+    assert client.get('/get').data == b'4750'
+    with sqlite3.connect(database) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] == 1
+
+
+def test_relative_and_non_sqlite_databases(tmp_path):
+    from app.server_session import app_database_path
+    app = Flask("session_paths", instance_path=str(tmp_path / 'instance'))
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///health.db'
+    assert app_database_path(app) == str(tmp_path / 'instance' / 'health.db')
+    for uri in ('postgresql://user@localhost/health', 'sqlite://', 'sqlite:///:memory:'):
+        app.config['SQLALCHEMY_DATABASE_URI'] = uri
+        assert app_database_path(app) is None
@@ -0,0 +1,45 @@
+import time
+import threading
+from app.single_flight import SingleFlight, prompt_key
+
+
+def test_concurrent_callers_share_one_upstream_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def upstream():
+        calls.append(1)
+        release.wait(5)
+        return 'answer'
+
+    key = prompt_key('test', 'How  is my sleep?')
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do(key, upstream))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while flight.report()['coalesced_calls'] < 7 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['answer'] * 8
+    assert len(calls) == 1
+    report = flight.report()
+    assert report['upstream_calls'] == 1 and report['in_flight'] == 0
+
+
+def test_errors_are_shared_and_counted():
+    flight = SingleFlight()
+
+    def failing():
+        raise RuntimeError('upstream down')
+
+    try:
+        flight.do('k', failing)
+    except RuntimeError:
+        pass
+    assert flight.report()['errors'] == 1
+    assert flight.report()['in_flight'] == 0
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+from app import gemini_service
+from app.vitals_analytics import METRICS, vitals_matrix, vitals_stats
+
+
+def _random_vitals(rng, n, trend=0.0):
+    return [{
+        'heart_rate': int(rng.integers(55, 110) + trend * i),
+        'sleep_hours': round(float(rng.uniform(4, 10)), 1),
+        'steps': int(rng.integers(0, 15000) + 200 * trend * i),
+        'mood': int(rng.integers(1, 6)),
+        'date': f'2026-01-{i % 28 + 1:02d}'
+    } for i in range(n)]
+
+
+def _cases():
+    rng = np.random.default_rng(11)
+    cases = [_random_vitals(rng, n) for n in (3, 4, 5, 8, 30, 200)]
+    cases += [_random_vitals(rng, n, trend=1.5) for n in (6, 50)]
+    # A constant column and a perfectly linear one
+    steady = _random_vitals(rng, 12)
+    for i, row in enumerate(steady):
+        row['mood'] = 3
+        row['heart_rate'] = 60 + 2 * i
+    cases.append(steady)
+    return cases
+
+
+def _assert_close(actual, expected, path=''):
+    if isinstance(expected, dict):
+        assert actual.keys() == expected.keys(), path
+        for key in expected:
+            _assert_close(actual[key], expected[key], f'{path}.{key}')
+    elif isinstance(expected, list):
+        assert len(actual) == len(expected), path
+        for i, (a, e) in enumerate(zip(actual, expected)):
+            _assert_close(a, e, f'{path}[{i}]')
+    elif isinstance(expected, str) or expected is None:
+        assert actual == expected, path
+    else:
+        assert actual == pytest.approx(expected, rel=1e-9, abs=1e-9), path
+
+
+@pytest.mark.parametrize('vitals', _cases(), ids=lambda v: f'{len(v)}rows')
+def test_kernel_matches_scipy_and_pandas(vitals):
+    values = vitals_matrix(vitals)
+    result = vitals_stats(values)
+    x = np.arange(len(vitals))
+    for i, metric in enumerate(METRICS):
+        column = values[:, i]
+        if column.std() == 0:
+            assert result['slope'][i] == 0 and result['p_value'][i] == 1.0
+            continue
+        expected = stats.linregress(x, column)
+        assert result['slope'][i] == pytest.approx(expected.slope, rel=1e-9, abs=1e-12)
+        assert result['r_value'][i] == pytest.approx(expected.rvalue, rel=1e-9, abs=1e-12)
+        assert result['p_value'][i] == pytest.approx(expected.pvalue, rel=1e-6, abs=1e-12)
+    expected_corr = pd.DataFrame(vitals)[METRICS].corr().values
+    np.testing.assert_allclose(result['corr'], expected_corr, rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.parametrize('vitals', _cases(), ids=lambda v: f'{len(v)}rows')
+def test_fast_path_matches_dataframe_path(vitals, monkeypatch):
+    fast_trends = gemini_service.analyze_trends(vitals)
+    fast_correlations = gemini_service.identify_correlations(vitals)
+
+    # Force the original DataFrame implementation
+    monkeypatch.setattr(gemini_service, 'vitals_matrix', lambda rows: None)
+    _assert_close(fast_trends, gemini_service.analyze_trends(vitals))
+    _assert_close(fast_correlations, gemini_service.identify_correlations(vitals))
+
+
+def test_matrix_rejects_incomplete_rows():
+    assert vitals_matrix([{'heart_rate': 70, 'sleep_hours': 7, 'steps': 100}]) is None
+    assert vitals_matrix([{'heart_rate': 70, 'sleep_hours': None, 'steps': 100, 'mood': 3}]) is None
+    assert vitals_matrix([{'heart_rate': 70, 'sleep_hours': float('nan'), 'steps': 100, 'mood': 3}]) is None
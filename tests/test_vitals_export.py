@@ -0,0 +1,39 @@
+import csv
+import io
+import json
+from app.vitals_ingest import ingest_vitals
+
+CONTACT_FIELDS = {'name', 'email', 'phone'}
+
+
+def _store_two_users():
+    ingest_vitals([
+        {'email': f'user{n}@example.com', 'name': f'User {n}', 'phone': f'+1555000{n}',
+         'timestamp': f'2026-01-0{day}T08:00:00', 'heart_rate': 70, 'sleep_hours': 7.5, 'steps': 6000, 'mood': 4}
+        for n in (1, 2) for day in (1, 2, 3)
+    ])
+
+
+def test_vitals_pages_leave_out_contact_fields(client):
+    _store_two_users()
+    vitals, cursor = [], None
+    while True:
+        page = client.get('/api/vitals', query_string={'limit': 4, **({'cursor': cursor} if cursor else {})}).get_json()
+        vitals.extend(page['vitals'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+
+    assert len(vitals) == 6 and len({vital['id'] for vital in vitals}) == 6
+    assert all(not CONTACT_FIELDS & vital.keys() for vital in vitals)
+
+
+def test_export_leaves_out_contact_fields(client):
+    _store_two_users()
+    rows = list(csv.DictReader(io.StringIO(client.get('/api/vitals/export').get_data(as_text=True))))
+    assert len(rows) == 6 and not CONTACT_FIELDS & rows[0].keys()
+
+    body = client.get('/api/vitals/export', query_string={'format': 'ndjson', 'user_id': rows[0]['user_id']})
+    lines = [json.loads(line) for line in body.get_data(as_text=True).splitlines()]
+    assert len(lines) == 3 and all(not CONTACT_FIELDS & line.keys() for line in lines)
+    assert 'example.com' not in body.get_data(as_text=True)
@@ -0,0 +1,66 @@
+import json
+import datetime
+from app.models import db, User, VitalsData
+from app.vitals_ingest import ingest_vitals
+
+
+def _sample(email, minute, **values):
+    return dict({'email': email, 'timestamp': f'2026-01-01T08:{minute:02d}:00',
+                 'heart_rate': 70, 'sleep_hours': 7.5, 'steps': 6000, 'mood': 4}, **values)
+
+
+def _existing_user(username, email):
+    user = User(username=username, email=email, name='Existing')
+    user.set_password('secret')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_ingest_inserts_and_skips_resent_samples(flask_app):
+    first = ingest_vitals([_sample('ann@example.com', 0), _sample('ann@example.com', 1)])
+    again = ingest_vitals([_sample('ann@example.com', 0), _sample('ann@example.com', 2)])
+    assert (first['inserted'], first['duplicates']) == (2, 0)
+    assert (again['inserted'], again['duplicates']) == (1, 1)
+    assert VitalsData.query.count() == 3
+
+
+def test_username_collision_rejects_only_its_samples(flask_app):
+    _existing_user('bob', 'bob@old.example.com')
+    report = ingest_vitals([
+        _sample('bob@new.example.com', 0),
+        _sample('carol@example.com', 1),
+        _sample('bob@new.example.com', 2),
+    ])
+    assert report['inserted'] == 1
+    assert [entry['index'] for entry in report['rejected']] == [0, 2]
+    assert "already taken" in report['rejected'][0]['errors'][0]
+    assert User.query.filter_by(email='bob@new.example.com').first() is None
+    assert User.query.filter_by(email='carol@example.com').one().vitals.count() == 1
+
+
+def test_username_collision_within_batch(flask_app):
+    report = ingest_vitals([_sample('dan@one.example.com', 0), _sample('dan@two.example.com', 1)])
+    assert report['inserted'] == 1
+    assert [entry['index'] for entry in report['rejected']] == [1]
+
+
+def test_invalid_samples_are_rejected_with_their_index(flask_app):
+    report = ingest_vitals([_sample('eve@example.com', 0, heart_rate=500), _sample('eve@example.com', 1)])
+    assert report['inserted'] == 1
+    assert report['rejected'][0]['index'] == 0
+
+
+def test_partial_samples_are_rejected_and_dashboard_still_renders(client):
+    now = datetime.datetime.now()
+    partial = [{'email': 'fay@example.com', 'timestamp': (now - datetime.timedelta(minutes=i)).isoformat(),
+                'heart_rate': 72} for i in range(20)]
+    response = client.post('/api/vitals/bulk', data='\n'.join(json.dumps(sample) for sample in partial),
+                           content_type='application/x-ndjson')
+    assert response.status_code == 400
+    assert response.get_json()['inserted'] == 0
+    assert 'mood is required' in response.get_json()['rejected'][0]['errors']
+
+    complete = dict(_sample('fay@example.com', 0), timestamp=now.isoformat())
+    assert client.post('/api/vitals/bulk', json=[complete]).get_json()['inserted'] == 1
+    assert client.get('/dashboard').status_code == 200
@@ -0,0 +1,92 @@
+import datetime
+import pytest
+from sqlalchemy import event
+from app.models import (db, recent_vitals_query, steps_leaderboard_query, explain_query,
+                        check_vitals_query_plans, generate_synthetic_vitals, backfill_daily_rollups)
+
+
+@pytest.fixture
+def vitals_db(flask_app):
+    generate_synthetic_vitals(10000, users=50, days=90)
+    backfill_daily_rollups()
+    # Give the planner real statistics, as a production database would have
+    db.session.execute(db.text('ANALYZE'))
+    return flask_app
+
+
+def _plan(query):
+    return '\n'.join(explain_query(query))
+
+
+def test_date_cutoff_query_uses_date_index(vitals_db):
+    plan = _plan(recent_vitals_query(days=7))
+    assert 'ix_vitals_data_date_id' in plan
+    assert 'SCAN vitals_data\n' not in plan + '\n'
+
+
+def test_per_user_query_uses_user_date_index(vitals_db):
+    plan = _plan(recent_vitals_query(days=7, user_id=3))
+    assert 'ix_vitals_data_user_date_id' in plan
+    assert 'SCAN vitals_data\n' not in plan + '\n'
+
+
+def test_leaderboard_query_uses_rollup_index(vitals_db):
+    plan = _plan(steps_leaderboard_query(days=30))
+    assert 'ix_daily_rollup_day_steps' in plan
+    assert 'SCAN daily_vitals_rollups\n' not in plan + '\n'
+
+
+def test_plan_check_reports_no_regressions(vitals_db):
+    for label, plan, problems in check_vitals_query_plans(days=7, user_id=3):
+        assert problems == [], (label, plan)
+
+
+def test_plan_check_flags_dropped_index(vitals_db):
+    db.session.execute(db.text('DROP INDEX ix_vitals_data_date_id'))
+    results = {label: problems for label, _, problems in check_vitals_query_plans(days=7, user_id=3)}
+    assert results['recent vitals, all users']
+
+
+def _recent_vitals_per_row_lookup(days=7, user_id=None):
+    """get_recent_vitals as it was before the joined query: one User lookup per row"""
+    from app.models import VitalsData, User
+    cutoff_date = (datetime.datetime.now() - datetime.timedelta(days=days)).date()
+    query = VitalsData.query.filter(VitalsData.date >= cutoff_date)
+    if user_id:
+        query = query.filter_by(user_id=user_id)
+    vitals_list = [v.to_dict() for v in query.order_by(VitalsData.date).all()]
+    for vital in vitals_list:
+        if vital['user_id']:
+            user = User.query.get(vital['user_id'])
+            if user:
+                vital['name'] = user.name
+                vital['email'] = user.email
+                vital['phone'] = user.phone
+    return vitals_list
+
+
+def test_joined_recent_vitals_match_per_row_lookup(flask_app):
+    from app.models import User, VitalsData, get_recent_vitals
+    db.session.add_all([User(id=1, username='ana', name='Ana', email='ana@example.com', phone='555-0100'),
+                        User(id=2, username='raj', name='Raj', email='raj@example.com')])
+    today = datetime.date.today()
+    for i, user_id in enumerate([1, 2, 1, None, 99, 2]):
+        db.session.add(VitalsData(user_id=user_id, heart_rate=60 + i, sleep_hours=7.5, steps=4000 + i,
+                                  mood=3, date=today - datetime.timedelta(days=i)))
+    # Outside the 7-day window
+    db.session.add(VitalsData(user_id=1, heart_rate=80, steps=1, mood=1, date=today - datetime.timedelta(days=30)))
+    db.session.commit()
+
+    statements = []
+    listen = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listen)
+    try:
+        joined = get_recent_vitals(days=7)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listen)
+
+    assert len(statements) == 1
+    key = lambda vital: vital['id']
+    assert sorted(joined, key=key) == sorted(_recent_vitals_per_row_lookup(days=7), key=key)
+    assert sorted(get_recent_vitals(days=7, user_id=2), key=key) == \
+        sorted(_recent_vitals_per_row_lookup(days=7, user_id=2), key=key)
@@ -1,10 +1,18 @@
 import os
-import requests
+from app.nutrition_cache import cached_lookup
+from app.resilience import provider, CircuitOpenError
 
 USDA_API_KEY = os.getenv("USDA_API_KEY")
 
 def get_usda_nutrition(food_name):
-    """Query USDA FoodData Central for nutrition info by food name."""
+    """
+    Query USDA FoodData Central for nutrition info by food name (cached).
+    Returns None when USDA has no match; transient errors (timeouts, HTTP
+    errors, CircuitOpenError while the circuit is open) are raised.
+    """
+    return cached_lookup("usda", food_name, _fetch_usda_nutrition)
+
+def _fetch_usda_nutrition(food_name):
     search_url = "https://api.nal.usda.gov/fdc/v1/foods/search"
     params = {
         "api_key": USDA_API_KEY,
@@ -12,25 +20,27 @@ def get_usda_nutrition(food_name):
         "pageSize": 1
     }
     try:
-        resp = requests.get(search_url, params=params)
+        resp = provider("usda").get(search_url, params=params)
         resp.raise_for_status()
         results = resp.json()
-        if results.get("foods"):
-            food = results["foods"][0]
-            # Extract common nutrients
-            nutrients = {n["nutrientName"]: n["value"] for n in food.get("foodNutrients", [])}
-            return {
-                "food_item": food.get("description", food_name),
-                "calories": nutrients.get("Energy", 0),
-                "protein": nutrients.get("Protein", 0),
-                "fat": nutrients.get("Total lipid (fat)", 0),
-                "carbohydrates": nutrients.get("Carbohydrate, by difference", 0),
-                "fiber": nutrients.get("Fiber, total dietary", 0),
-                "sugar": nutrients.get("Sugars, total including NLEA", 0)
-            }
-        else:
-            print(f"[USDA] No foods found for: {food_name}")
-            return None
+    except CircuitOpenError:
+        raise
     except Exception as e:
+        # Not a lookup result, so it is raised rather than cached as a miss
         print(f"[USDA] Error fetching data for {food_name}: {e}")
-        return None
+        raise
+    if results.get("foods"):
+        food = results["foods"][0]
+        # Extract common nutrients
+        nutrients = {n["nutrientName"]: n["value"] for n in food.get("foodNutrients", [])}
+        return {
+            "food_item": food.get("description", food_name),
+            "calories": nutrients.get("Energy", 0),
+            "protein": nutrients.get("Protein", 0),
+            "fat": nutrients.get("Total lipid (fat)", 0),
+            "carbohydrates": nutrients.get("Carbohydrate, by difference", 0),
+            "fiber": nutrients.get("Fiber, total dietary", 0),
+            "sugar": nutrients.get("Sugars, total including NLEA", 0)
+        }
+    print(f"[USDA] No foods found for: {food_name}")
+    return None
@@ -0,0 +1,90 @@
+from operator import itemgetter
+import numpy as np
+from scipy import stats
+
+# Column order of the vitals matrix
+METRICS = ['heart_rate', 'sleep_hours', 'steps', 'mood']
+
+_row_values = itemgetter(*METRICS)
+
+# Same guard scipy.stats.linregress uses against division by zero when |r| == 1
+_TINY = 1.0e-20
+
+
+def vitals_matrix(recent_vitals):
+    """
+    Pack vitals dicts into a column-contiguous (n_rows, 4) float array in
+    METRICS order. Returns None if any row lacks a metric or holds a
+    non-numeric or non-finite value; callers then use the DataFrame path.
+    """
+    try:
+        raw = np.array(list(map(_row_values, recent_vitals)))
+    except (KeyError, TypeError):
+        return None
+    if raw.ndim != 2 or raw.dtype.kind not in 'iuf':
+        return None
+    values = np.asarray(raw, dtype=float, order='F')
+    if not np.isfinite(values).all():
+        return None
+    return values
+
+
+def vitals_stats(values):
+    """
+    Per-column statistics of a (n_rows, 4) vitals matrix in one vectorized pass.
+
+    Regression is against the row index, as in analyze_trends; slope, r and
+    the two-sided p-value follow scipy.stats.linregress. Needs n_rows >= 3.
+
+    Returns:
+        dict: arrays of length 4 (slope, r_value, p_value, mean, std, cv, min,
+        max, latest, recent_change, recent_pct_change) and the 4x4 'corr' matrix.
+        cv and recent_pct_change are NaN where their denominator is not positive.
+    """
+    n = values.shape[0]
+    x = np.arange(n, dtype=float)
+    x_dev = x - x.mean()
+
+    mean = values.mean(axis=0)
+    std = values.std(axis=0)
+    deviations = values - mean
+
+    ssxm = np.dot(x_dev, x_dev) / n
+    ssxym = np.dot(x_dev, deviations) / n
+    ssym = std ** 2
+    slope = ssxym / ssxm
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_value = np.clip(ssxym / np.sqrt(ssxm * ssym), -1.0, 1.0)
+        dof = n - 2
+        t = r_value * np.sqrt(dof / ((1.0 - r_value + _TINY) * (1.0 + r_value + _TINY)))
+        # A constant column has no trend
+        p_value = np.where(ssym == 0, 1.0, 2 * stats.t.sf(np.abs(t), dof))
+        r_value = np.where(ssym == 0, 0.0, r_value)
+
+        cv = np.where(mean > 0, (std / mean) * 100, np.nan)
+
+        # Latest entry against the mean of the three before it
+        prior_mean = values[-4:-1].mean(axis=0)
+        recent_change = values[-1] - prior_mean
+        recent_pct_change = np.where(prior_mean > 0, (recent_change / prior_mean) * 100, np.nan)
+
+        # Pearson correlation matrix; constant columns give NaN, as DataFrame.corr does
+        scale = np.sqrt(np.einsum('ij,ij->j', deviations, deviations))
+        corr = np.dot(deviations.T, deviations) / np.outer(scale, scale)
+    np.clip(corr, -1.0, 1.0, out=corr)
+
+    return {
+        'slope': slope,
+        'r_value': r_value,
+        'p_value': p_value,
+        'mean': mean,
+        'std': std,
+        'cv': cv,
+        'min': values.min(axis=0),
+        'max': values.max(axis=0),
+        'latest': values[-1],
+        'recent_change': recent_change,
+        'recent_pct_change': recent_pct_change,
+        'corr': corr
+    }
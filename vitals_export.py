@@ -0,0 +1,56 @@
+import io
+import csv
+import json
+import base64
+import datetime
+
+# Column order of the CSV export; user contact fields are never exported
+EXPORT_FIELDS = ['id', 'user_id', 'date', 'timestamp',
+                 'heart_rate', 'sleep_hours', 'steps', 'mood', 'stress_level']
+
+# Rows buffered per chunk sent to the client
+EXPORT_CHUNK_ROWS = 500
+
+
+def stream_csv(vitals):
+    """Yield CSV text in chunks for an iterable of vitals dicts"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    for count, vital in enumerate(vitals, start=1):
+        writer.writerow(vital)
+        if count % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_ndjson(vitals):
+    """Yield NDJSON text in chunks for an iterable of vitals dicts"""
+    lines = []
+    for vital in vitals:
+        lines.append(json.dumps(vital))
+        if len(lines) >= EXPORT_CHUNK_ROWS:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def encode_cursor(key):
+    """Opaque page cursor for a (date, id) keyset position"""
+    day, vitals_id = key
+    raw = f"{day.isoformat()}:{vitals_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError for a malformed cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        day, vitals_id = base64.urlsafe_b64decode(padded).decode('utf-8').split(':')
+        return datetime.date.fromisoformat(day), int(vitals_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import datetime
+from sqlalchemy import and_, or_, func
+from sqlalchemy.exc import IntegrityError
+from app.models import db, User, VitalsData, DailyVitalsRollup, merge_daily_rollup, update_latest_snapshot
+from app.alerts import build_alerts, publish_vitals_alerts
+from app.forms import VITALS_RANGES
+
+# Largest number of samples accepted in one ingestion request
+VITALS_INGEST_MAX_ROWS = int(os.getenv("VITALS_INGEST_MAX_ROWS", "50000"))
+
+# Stored column types for each validated metric
+_METRIC_TYPES = {'heart_rate': int, 'sleep_hours': float, 'steps': int, 'mood': int}
+
+
+def parse_ingest_payload(body, content_type='', defaults=None):
+    """
+    Turn a JSON or NDJSON request body into a list of sample dicts.
+
+    JSON bodies may be a list of samples or an object with a "samples" list;
+    other top-level keys of that object (email, name, phone) become defaults
+    for every sample. NDJSON bodies carry one sample per line.
+    """
+    defaults = dict(defaults or {})
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+
+    if 'ndjson' in content_type or 'jsonlines' in content_type:
+        samples = []
+        for number, line in enumerate(body.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                samples.append(json.loads(line))
+            except ValueError:
+                raise ValueError(f"Line {number} is not valid JSON")
+    else:
+        try:
+            payload = json.loads(body) if body.strip() else []
+        except ValueError:
+            raise ValueError("Request body is not valid JSON")
+        if isinstance(payload, dict):
+            samples = payload.get('samples', [])
+            defaults.update({key: value for key, value in payload.items() if key != 'samples'})
+        else:
+            samples = payload
+        if not isinstance(samples, list):
+            raise ValueError("Expected a list of samples")
+
+    return [{**defaults, **sample} if isinstance(sample, dict) else sample for sample in samples]
+
+
+def _parse_timestamp(value):
+    """ISO-8601 string or epoch seconds -> naive local datetime (as save_vitals stores)"""
+    if isinstance(value, bool):
+        raise ValueError
+    if isinstance(value, (int, float)):
+        return datetime.datetime.fromtimestamp(value)
+    timestamp = datetime.datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone().replace(tzinfo=None)
+    return timestamp
+
+
+def validate_sample(sample):
+    """
+    Check one sample against the VitalsForm ranges.
+
+    Returns:
+        tuple: (cleaned dict or None, list of error messages)
+    """
+    if not isinstance(sample, dict):
+        return None, ["Sample must be an object"]
+
+    errors = []
+    email = sample.get('email')
+    if not isinstance(email, str) or '@' not in email:
+        errors.append("email is required")
+
+    try:
+        timestamp = _parse_timestamp(sample.get('timestamp'))
+    except (TypeError, ValueError, OverflowError, OSError):
+        timestamp = None
+        errors.append("timestamp must be ISO-8601 or epoch seconds")
+
+    # Every metric is required, as on VitalsForm; the dashboard and the
+    # anomaly model expect complete rows
+    cleaned = {}
+    for metric, (low, high) in VITALS_RANGES.items():
+        value = sample.get(metric)
+        if value is None:
+            errors.append(f"{metric} is required")
+        elif isinstance(value, bool) or not isinstance(value, (int, float)):
+            errors.append(f"{metric} must be a number")
+        elif not low <= value <= high:
+            errors.append(f"{metric} should be between {low}-{high}")
+        else:
+            cleaned[metric] = _METRIC_TYPES[metric](value)
+
+    stress_level = sample.get('stress_level')
+    if stress_level is not None and (isinstance(stress_level, bool) or not isinstance(stress_level, int)):
+        errors.append("stress_level must be an integer")
+
+    if errors:
+        return None, errors
+
+    cleaned.update({
+        'email': email.strip(),
+        'name': sample.get('name'),
+        'phone': sample.get('phone'),
+        'stress_level': stress_level,
+        'timestamp': timestamp
+    })
+    return cleaned, []
+
+
+def _resolve_users(samples):
+    """
+    Map email -> User for the batch with one query, creating missing users.
+
+    Returns:
+        tuple: (users by email, conflicts) - conflicts maps each email whose new
+        account would reuse a username that is already taken to an error message
+    """
+    emails = {sample['email'] for sample in samples}
+    users = {user.email: user for user in User.query.filter(User.email.in_(emails)).all()}
+
+    # Same temporary account save_vitals creates for unknown emails, from the
+    # first sample of each email
+    new_accounts = {}
+    for sample in samples:
+        if sample['email'] not in users and sample['email'] not in new_accounts:
+            new_accounts[sample['email']] = (sample['email'].split('@')[0], sample)
+    taken = set()
+    if new_accounts:
+        usernames = {username for username, _ in new_accounts.values()}
+        taken = {username for (username,) in
+                 db.session.query(User.username).filter(User.username.in_(usernames))}
+
+    conflicts = {}
+    for email, (username, sample) in new_accounts.items():
+        if username in taken:
+            conflicts[email] = f"username '{username}' is already taken by another account"
+            continue
+        taken.add(username)
+        user = User(
+            username=username,
+            email=email,
+            name=sample.get('name') or 'Anonymous',
+            phone=sample.get('phone')
+        )
+        user.set_password('temporary')
+        db.session.add(user)
+        users[email] = user
+    db.session.flush()
+    return users, conflicts
+
+
+def _fold_rollups(rows):
+    """Fold the inserted rows into their daily rollups, one upsert per user and day"""
+    deltas = {}
+    for row in sorted(rows, key=lambda r: r['timestamp']):
+        key = (row['user_id'], row['date'])
+        delta = deltas.get(key)
+        if delta is None:
+            delta = deltas[key] = DailyVitalsRollup(user_key=key[0], day=key[1])
+        delta.add_sample(row, row['timestamp'])
+    for delta in deltas.values():
+        merge_daily_rollup(delta)
+
+
+def _write_batch(samples):
+    """
+    Insert the samples in one transaction.
+
+    Returns:
+        tuple: (inserted rows, users by email, account conflicts by email)
+    """
+    users, conflicts = _resolve_users(samples)
+    samples = [sample for sample in samples if sample['email'] not in conflicts]
+    if not samples:
+        db.session.commit()
+        return [], users, conflicts
+    rows = [{
+        'user_id': users[sample['email']].id,
+        'heart_rate': sample.get('heart_rate'),
+        'sleep_hours': sample.get('sleep_hours'),
+        'steps': sample.get('steps'),
+        'mood': sample.get('mood'),
+        'stress_level': sample.get('stress_level'),
+        'date': sample['timestamp'].date(),
+        'timestamp': sample['timestamp']
+    } for sample in samples]
+
+    # Skip samples already stored under the (user, timestamp) key
+    timestamps = [row['timestamp'] for row in rows]
+    existing = {
+        tuple(key) for key in
+        db.session.query(VitalsData.user_id, VitalsData.timestamp)
+        .filter(VitalsData.user_id.in_({row['user_id'] for row in rows}),
+                VitalsData.timestamp.between(min(timestamps), max(timestamps)))
+    }
+    rows = [row for row in rows if (row['user_id'], row['timestamp']) not in existing]
+
+    if rows:
+        db.session.execute(VitalsData.__table__.insert(), rows)
+        _fold_rollups(rows)
+    db.session.commit()
+    return rows, users, conflicts
+
+
+def _publish_latest(rows, users):
+    """Evaluate alerts once per user, for the newest sample of the batch"""
+    latest = {}
+    for row in rows:
+        if row['user_id'] not in latest or row['timestamp'] > latest[row['user_id']]:
+            latest[row['user_id']] = row['timestamp']
+
+    # Backfilled history must not replace a newer stored entry
+    newest = dict(
+        db.session.query(VitalsData.user_id, func.max(VitalsData.timestamp))
+        .filter(VitalsData.user_id.in_(latest))
+        .group_by(VitalsData.user_id)
+        .all()
+    )
+    keys = [(user_id, ts) for user_id, ts in latest.items() if newest.get(user_id) == ts]
+    if not keys:
+        return
+
+    users_by_id = {user.id: user for user in users.values()}
+    entries = VitalsData.query.filter(
+        or_(*[and_(VitalsData.user_id == user_id, VitalsData.timestamp == ts) for user_id, ts in keys])
+    ).all()
+    for vitals in entries:
+        result = vitals.to_dict()
+        user = users_by_id.get(vitals.user_id)
+        if user:
+            result['name'] = user.name
+            result['email'] = user.email
+            result['phone'] = user.phone
+        alerts = build_alerts(result)
+        update_latest_snapshot(result, alerts)
+        publish_vitals_alerts(result, alerts)
+
+
+def ingest_vitals(samples):
+    """
+    Validate and store a batch of vitals samples.
+
+    Valid samples are written with a single executemany insert in one
+    transaction; samples whose (user, timestamp) is already stored are
+    skipped, so re-sending a batch is safe. Rollups and alerts are updated
+    once for the whole batch.
+
+    Returns:
+        dict: counts, per-sample errors and throughput
+    """
+    start = time.perf_counter()
+    valid = {}
+    rejected = []
+    for index, sample in enumerate(samples):
+        cleaned, errors = validate_sample(sample)
+        if errors:
+            rejected.append({'index': index, 'errors': errors})
+        else:
+            # A sample repeated within the batch keeps its last occurrence
+            valid[(cleaned['email'], cleaned['timestamp'])] = (index, cleaned)
+
+    rows = []
+    conflicts = {}
+    if valid:
+        for attempt in range(2):
+            try:
+                rows, users, conflicts = _write_batch([cleaned for _, cleaned in valid.values()])
+                break
+            except IntegrityError:
+                # A concurrent batch stored some of the same samples or users;
+                # re-check and retry once
+                db.session.rollback()
+                if attempt:
+                    raise
+        if rows:
+            _publish_latest(rows, users)
+
+    # Samples whose new account collided with an existing username
+    conflicted = [(index, conflicts[cleaned['email']]) for index, cleaned in valid.values()
+                  if cleaned['email'] in conflicts]
+    rejected.extend({'index': index, 'errors': [error]} for index, error in conflicted)
+    rejected.sort(key=lambda entry: entry['index'])
+
+    elapsed = time.perf_counter() - start
+    report = {
+        'received': len(samples),
+        'inserted': len(rows),
+        'duplicates': len(valid) - len(conflicted) - len(rows),
+        'rejected': rejected,
+        'elapsed_ms': round(elapsed * 1000, 1),
+        'rows_per_second': round(len(rows) / elapsed, 1) if elapsed > 0 else None
+    }
+    print(f"Ingested {report['inserted']}/{report['received']} vitals samples "
+          f"({report['duplicates']} duplicates, {len(rejected)} rejected) "
+          f"in {report['elapsed_ms']} ms, {report['rows_per_second']} rows/s")
+    return report